@@ -7,15 +7,15 @@ import bs4
 import asyncio
 
 # Add project root to sys.path to handle module resolution
+# (the repo root, so the persistent index in agents/herramientas/vectorial can be imported)
 import sys
-project_root = os.path.abspath(os.path.dirname(__file__))
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # LangChain Imports based on provided documentation
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS  # Using a simple local vector store
 from langchain_ollama.embeddings import OllamaEmbeddings
 from langchain_ollama.chat_models import ChatOllama
 from langchain.prompts import ChatPromptTemplate
@@ -23,6 +23,16 @@ from langchain.tools import tool
 from langgraph.prebuilt import create_react_agent
 from langchain_core.messages import HumanMessage
 
+# Índice persistente en disco (mmap) en lugar de FAISS en memoria: se embebe una vez y se reutiliza
+from agents.herramientas.vectorial.store import IndexMismatch, VectorStore
+
+SOURCE_URL = "https://lilianweng.github.io/posts/2023-06-23-agent/"
+EMBED_MODEL = "gemma3:4b"
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indices", "rag_agent_poc")
+# Si cambia el troceado o la fuente, el manifiesto no coincide y el índice se reconstruye
+CHUNKER = {"splitter": "RecursiveCharacterTextSplitter", "chunk_size": 1000, "chunk_overlap": 200,
+           "source": SOURCE_URL}
+
 def print_step(step, step_name):
     """Helper function to print agent steps clearly."""
     print(f"\n--- {step_name} ---")
@@ -30,17 +40,16 @@ def print_step(step, step_name):
         for message in step["messages"]:
             message.pretty_print()
 
-async def main():
+async def build_index(embeddings):
     """
-    Main asynchronous function to build and run the RAG agent proof of concept.
+    Carga y divide el post, lo embebe y guarda el índice en INDEX_PATH.
+    Solo se ejecuta la primera vez o si el índice guardado no es compatible.
     """
-    print("--- Iniciando Prueba de Concepto: Agente RAG con Ollama y LangChain ---")
-
     # --- PASO 2: Indexing Pipeline (Carga y División) ---
     print("\n[Paso 2.1] Cargando documento desde la web...")
     try:
         loader = WebBaseLoader(
-            web_paths=("https://lilianweng.github.io/posts/2023-06-23-agent/",),
+            web_paths=(SOURCE_URL,),
             bs_kwargs=dict(
                 parse_only=bs4.SoupStrainer(
                     class_=("post-content", "post-title", "post-header")
@@ -51,29 +60,49 @@ async def main():
         print(f"Documento cargado. {len(docs[0].page_content)} caracteres encontrados.")
 
         print("\n[Paso 2.2] Dividiendo documento en chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNKER["chunk_size"],
+                                                       chunk_overlap=CHUNKER["chunk_overlap"])
         splits = text_splitter.split_documents(docs)
         print(f"Documento dividido en {len(splits)} chunks.")
     except Exception as e:
         print(f"ERROR durante la carga o división de documentos: {e}")
-        return
+        return None
 
-    # --- PASO 3: Configuración del Vector Store (Almacenamiento y Recuperación) ---
-    print("\n[Paso 3.1] Inicializando embeddings con Ollama (gemma3:4b)...")
+    print(f"\n[Paso 3.2] Embebiendo los chunks con Ollama ({EMBED_MODEL}) y guardando el índice...")
     try:
-        # Using a model suitable for embeddings. If gemma3:4b is not ideal,
-        # Ollama will still attempt to use it. A dedicated embedding model is better in production.
-        embeddings = OllamaEmbeddings(model="gemma3:4b")
-
-        print("\n[Paso 3.2] Creando y poblando Vector Store local (FAISS)...")
-        # FAISS is a good local, file-based vector store that doesn't require a separate server.
-        vector_store = FAISS.from_documents(splits, embeddings)
-        retriever = vector_store.as_retriever(k=2) # Retrieve top 2 relevant chunks
-        print("Vector Store creado y poblado en memoria.")
+        records = [{"id": f"{SOURCE_URL}#{i}", "text": doc.page_content,
+                    "source": doc.metadata.get("source", SOURCE_URL)}
+                   for i, doc in enumerate(splits)]
+        vectors = await embeddings.aembed_documents([r["text"] for r in records])
+        vector_store = VectorStore.from_embeddings(EMBED_MODEL, CHUNKER, records, vectors)
+        vector_store.save(INDEX_PATH)
+        print(f"Índice guardado en {INDEX_PATH}; los próximos arranques lo cargan sin re-embeber.")
+        return vector_store
     except Exception as e:
         print(f"ERROR durante la inicialización del Vector Store o Embeddings: {e}")
-        print("Por favor, asegúrate de que el servidor de Ollama esté en ejecución y el modelo 'gemma3:4b' esté disponible.")
-        return
+        print(f"Por favor, asegúrate de que el servidor de Ollama esté en ejecución y el modelo '{EMBED_MODEL}' esté disponible.")
+        return None
+
+async def main():
+    """
+    Main asynchronous function to build and run the RAG agent proof of concept.
+    """
+    print("--- Iniciando Prueba de Concepto: Agente RAG con Ollama y LangChain ---")
+
+    # Using a model suitable for embeddings. If gemma3:4b is not ideal,
+    # Ollama will still attempt to use it. A dedicated embedding model is better in production.
+    embeddings = OllamaEmbeddings(model=EMBED_MODEL)
+
+    # --- PASO 3: Vector Store persistente (se carga si ya existe) ---
+    print(f"\n[Paso 3.1] Abriendo el índice guardado en {INDEX_PATH}...")
+    try:
+        vector_store = VectorStore.load(INDEX_PATH, embedding_model=EMBED_MODEL, chunker=CHUNKER)
+        print(f"Índice cargado: {len(vector_store)} chunks, sin volver a embeber el documento.")
+    except (FileNotFoundError, IndexMismatch) as e:
+        print(f"No se puede usar el índice ({e}): se construye.")
+        vector_store = await build_index(embeddings)
+        if vector_store is None:
+            return
 
     # --- PASO 4: Implementación de la Herramienta de Recuperación ---
     print("\n[Paso 4] Definiendo la herramienta de recuperación de contexto (RAG)...")
@@ -83,10 +112,10 @@ async def main():
         Recupera fragmentos de información de un post sobre agentes LLM para ayudar a responder una pregunta.
         """
         print(f"\n   [Herramienta 'retrieve_context' invocada con query: '{query}']")
-        retrieved_docs = retriever.invoke(query)
+        results = vector_store.search(embeddings.embed_query(query), k=2)  # Retrieve top 2 relevant chunks
         serialized = "\n\n".join(
-            (f"Source: {doc.metadata.get('source', 'N/A')}\nContent: {doc.page_content}")
-            for doc in retrieved_docs
+            (f"Source: {record.get('source', 'N/A')}\nContent: {record['text']}")
+            for _, record in results
         )
         print("   [Herramienta 'retrieve_context' finalizada. Documentos recuperados.]")
         return serialized
@@ -2,10 +2,6 @@ import os
 import sys
 import yaml
 import argparse
-import threading
-import queue
-import requests
-import json
 from dotenv import load_dotenv
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -16,10 +12,7 @@ from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_ollama import ChatOllama
 from langchain_deepseek import ChatDeepSeek
 
-# --- Control de streaming global ---
-stop_event = threading.Event()
-current_stream_thread = None
-streaming_lock = threading.Lock()
+from core.engine import ChatStream, get_runner, invoke, print_stream
 
 def load_model_configs():
     config_path = os.path.join(project_root, "config", "models.yaml")
@@ -66,80 +59,6 @@ def load_llm(model_identifier: str, all_configs: dict):
         print(f"ERROR al cargar modelo: {e}")
         return None
 
-def stream_with_cancel(llm, messages, output_queue, stop_event):
-    """
-    Función que corre en thread separado. Si stop_event se setea,
-    simplemente dejamos de procesar chunks y salimos.
-    """
-    try:
-        # Para Ollama, usamos la API nativa con requests para poder cerrar la conexión
-        if isinstance(llm, ChatOllama):
-            # Extraer config del modelo
-            model_name = llm.model
-            base_url = getattr(llm, 'base_url', "http://localhost:11434")
-            
-            # Convertir mensajes LangChain a formato Ollama
-            ollama_messages = []
-            for msg in messages:
-                if isinstance(msg, SystemMessage):
-                    ollama_messages.append({"role": "system", "content": msg.content})
-                elif isinstance(msg, HumanMessage):
-                    ollama_messages.append({"role": "user", "content": msg.content})
-                elif isinstance(msg, AIMessage):
-                    ollama_messages.append({"role": "assistant", "content": msg.content})
-            
-            # Hacer request streaming con requests
-            url = f"{base_url}/api/chat"
-            payload = {
-                "model": model_name,
-                "messages": ollama_messages,
-                "stream": True,
-                "options": {
-                    "temperature": getattr(llm, 'temperature', 0.7),
-                }
-            }
-            
-            response = requests.post(url, json=payload, stream=True)
-            
-            full_content = ""
-            for line in response.iter_lines():
-                if stop_event.is_set():
-                    response.close()  # ¡Cerrar conexión HTTP real!
-                    output_queue.put(("cancelled", full_content))
-                    return
-                
-                if line:
-                    try:
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            chunk_content = data["message"]["content"]
-                            full_content += chunk_content
-                            output_queue.put(("chunk", chunk_content))
-                        
-                        if data.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
-            
-            output_queue.put(("done", full_content))
-            
-        else:
-            # Para otros modelos (DeepSeek, OpenAI, etc.), usar LangChain nativo
-            # pero con chequeo frecuente de stop_event
-            full_content = ""
-            for chunk in llm.stream(messages):
-                if stop_event.is_set():
-                    output_queue.put(("cancelled", full_content))
-                    return
-                content = chunk.content or ""
-                full_content += content
-                output_queue.put(("chunk", content))
-            
-            output_queue.put(("done", full_content))
-            
-    except Exception as e:
-        output_queue.put(("error", str(e)))
-
 def run_one_shot(llm, message: str, system_prompt: str = None, stream: bool = False):
     print("--- Modo One-Shot ---")
     messages = []
@@ -149,50 +68,33 @@ def run_one_shot(llm, message: str, system_prompt: str = None, stream: bool = Fa
 
     print(f"Enviando: '{message}'")
     
+    runner = get_runner()
     if not stream:
         try:
-            response = llm.invoke(messages)
-            print(f"\n--- Respuesta ---\n{response.content}")
+            content, cancelled = runner.run(invoke(llm, messages))
+            if cancelled:
+                print("\n🛑 Generación cancelada.")
+            else:
+                print(f"\n--- Respuesta ---\n{content}")
         except Exception as e:
             print(f"\n❌ Error: {e}")
         return
 
-    # Streaming con cancelación
+    # Streaming con cancelación (Ctrl+C cancela la tarea asyncio y cierra la conexión)
     print("\n--- Respuesta (streaming) ---")
     print("Agente: ", end="", flush=True)
     
-    global stop_event, current_stream_thread
-    stop_event.clear()
-    output_queue = queue.Queue()
-    
-    # Iniciar thread de streaming
-    thread = threading.Thread(target=stream_with_cancel, args=(llm, messages, output_queue, stop_event))
-    thread.start()
-    current_stream_thread = thread
-    
-    full_content = ""
+    chat_stream = ChatStream(llm, messages)
     try:
-        while thread.is_alive() or not output_queue.empty():
-            try:
-                status, data = output_queue.get(timeout=0.1)
-                if status == "chunk":
-                    print(data, end="", flush=True)
-                    full_content += data
-                elif status in ("done", "cancelled"):
-                    if status == "cancelled":
-                        print("\n\n🛑 Generación cancelada.")
-                    break
-                elif status == "error":
-                    print(f"\n❌ Error: {data}")
-                    break
-            except queue.Empty:
-                continue
-    except KeyboardInterrupt:
-        print("\n🛑 Deteniendo...")
-        stop_event.set()
-        thread.join(timeout=2.0)
+        _, cancelled = runner.run(print_stream(chat_stream))
+        if cancelled:
+            print("\n\n🛑 Generación cancelada.")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
     
     print()
+    if chat_stream.final:
+        print(f"⏱️  {chat_stream.timings.summary()}")
 
 def run_chat_mode(llm, initial_model_identifier: str, all_configs: dict, stream: bool = False):
     print("--- Modo Chat Interactivo ---")
@@ -201,6 +103,7 @@ def run_chat_mode(llm, initial_model_identifier: str, all_configs: dict, stream:
     
     current_model_identifier = initial_model_identifier
     history = []
+    runner = get_runner()
     
     while True:
         try:
@@ -253,59 +156,29 @@ def run_chat_mode(llm, initial_model_identifier: str, all_configs: dict, stream:
         # Preparar mensajes
         messages_for_llm = list(history) + [HumanMessage(content=user_input)]
         
+        print("Agente: ", end="", flush=True)
+        
         if not stream:
             # Modo no-streaming (invoke)
-            print("Agente: ", end="", flush=True)
             try:
-                response = llm.invoke(messages_for_llm)
-                print(response.content)
-                history.append(HumanMessage(content=user_input))
-                history.append(AIMessage(content=response.content))
+                full_content, cancelled = runner.run(invoke(llm, messages_for_llm))
+                if cancelled:
+                    print("\n🛑 Cancelado.")
+                else:
+                    print(full_content)
             except Exception as e:
                 print(f"\n❌ Error: {e}")
-            continue
-
-        # === STREAMING CON CANCELACIÓN REAL ===
-        print("Agente: ", end="", flush=True)
-        
-        global stop_event, current_stream_thread
-        stop_event.clear()
-        output_queue = queue.Queue()
-        
-        # Iniciar thread de streaming
-        thread = threading.Thread(target=stream_with_cancel, args=(llm, messages_for_llm, output_queue, stop_event))
-        thread.start()
-        current_stream_thread = thread
-        
-        full_content = ""
-        cancelled = False
-        
-        try:
-            while thread.is_alive() or not output_queue.empty():
-                try:
-                    status, data = output_queue.get(timeout=0.1)
-                    
-                    if status == "chunk":
-                        print(data, end="", flush=True)
-                        full_content += data
-                    elif status == "done":
-                        break
-                    elif status == "cancelled":
-                        cancelled = True
-                        print("\n🛑 Cancelado.")
-                        break
-                    elif status == "error":
-                        print(f"\n❌ Error: {data}")
-                        break
-                        
-                except queue.Empty:
-                    continue
-                    
-        except KeyboardInterrupt:
-            print("\n🛑 Deteniendo generación...")
-            stop_event.set()
-            thread.join(timeout=2.0)
-            cancelled = True
+                continue
+        else:
+            # === STREAMING CON CANCELACIÓN REAL ===
+            chat_stream = ChatStream(llm, messages_for_llm)
+            try:
+                full_content, cancelled = runner.run(print_stream(chat_stream))
+                if cancelled:
+                    print("\n🛑 Generación detenida.")
+            except Exception as e:
+                print(f"\n❌ Error: {e}")
+                continue
         
         # Solo guardar en historial si no fue cancelado
         if not cancelled and full_content.strip():
@@ -345,6 +218,7 @@ def main():
         run_one_shot(llm, args.message, args.system_prompt, args.stream)
     else:
         run_chat_mode(llm, args.model, model_configs, args.stream)
+    get_runner().close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/cliente.py
+# Cliente ligero para llamadas one-shot: mismos argumentos que `general.py -sc -m ...`, pero
+# si hay un demonio (`general.py --daemon`) le reenvía la petición por el socket unix y pinta
+# la respuesta sin importar LangChain ni leer models.yaml. Sin demonio, o con opciones que el
+# demonio no entiende, se ejecuta general.py en este mismo proceso.
+import argparse
+import os
+import socket
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.daemon_protocol import decode, default_socket_path, encode
+
+GENERAL = os.path.join(project_root, "agents", "general.py")
+
+
+def parse_args(argv: list[str]):
+    """Argumentos si la petición la puede atender el demonio; None si hay que ir a general.py."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('-sc', '--headless', action='store_true')
+    parser.add_argument('-m', '--message', type=str)
+    parser.add_argument('-p', '--system_prompt', type=str, default=None)
+    parser.add_argument('--pin', action='append', default=[])
+    parser.add_argument('--model', type=str, default=None)
+    parser.add_argument('-s', '--stream', action='store_true')
+    parser.add_argument('--priority', choices=("interactive", "normal", "batch"), default='normal')
+    parser.add_argument('--socket', type=str, default=default_socket_path())
+    try:
+        args, unknown = parser.parse_known_args(argv)
+    except SystemExit:
+        return None
+    if unknown or not args.headless or not args.message:
+        return None
+    return args
+
+
+def connect(path: str) -> socket.socket | None:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def ask(sock: socket.socket, args, out=sys.stdout) -> int:
+    """Envía la petición y pinta la respuesta como run_one_shot. Devuelve el código de salida."""
+    request = {"message": args.message, "model": args.model, "system_prompt": args.system_prompt,
+               "pin": [os.path.abspath(path) for path in args.pin], "priority": args.priority}
+    print("--- Modo One-Shot ---", file=out)
+    print(f"Enviando: '{args.message}'", file=out)
+    print("\n--- Respuesta ---", file=out)
+    chunks = []
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall(encode(request))
+        try:
+            for line in replies:
+                reply = decode(line)
+                if reply["type"] == "chunk":
+                    chunks.append(reply["text"])
+                    if args.stream:
+                        out.write(reply["text"])
+                        out.flush()
+                elif reply["type"] == "error":
+                    print(f"\n❌ Error: {reply['message']}", file=out)
+                    return 1
+                elif reply["type"] == "done":
+                    break
+            else:
+                print("\n❌ Error: el demonio cerró la conexión", file=out)
+                return 1
+        except KeyboardInterrupt:
+            # Cerrar el socket hace que el demonio cancele la generación
+            print("\n🛑 Interrumpido por usuario.", file=out)
+            return 130
+    print(("" if args.stream else "".join(chunks)), file=out)
+    return 0
+
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    sock = connect(args.socket) if args else None
+    if sock is None:
+        # Sin demonio: ejecución normal en este proceso
+        os.execv(sys.executable, [sys.executable, GENERAL, *argv])
+    sys.exit(ask(sock, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@ import os
 import sys
 import yaml
 import argparse
+import asyncio
+import contextlib
+import uuid
 from dotenv import load_dotenv
 
 # --- Setup sys.path ---
@@ -10,9 +13,22 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # --- LangChain Imports ---
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_ollama.chat_models import ChatOllama
-from langchain_deepseek.chat_models import ChatDeepSeek
+# Los proveedores (langchain_ollama, langchain_deepseek, ...) se importan bajo demanda
+# desde core.providers, así cada invocación solo paga el import del que usa.
+
+# Lo que solo usa un modo (lote, servidor, demonio, routing, niveles, coalescencia) se importa
+# dentro de su rama: una llamada one-shot no paga el import del servidor HTTP ni del demonio.
+from core.context_window import ContextSizer
+from core.daemon_protocol import default_socket_path
+from core.engine import ChatStream, continue_messages, get_runner, print_scheduled
+from core.history import ConversationHistory, make_summarizer
+from core.metrics import MetricsRecorder, TurnMetrics, describe_llm
+from core.model_pool import ModelPool
+from core.prompt import PromptAssembler
+from core.providers import create_llm
+from core.render import StreamRenderer, mark_sinks, open_sinks
+from core.response_cache import DEFAULT_CACHE_PATH, REPLAY_MODES, ResponseCache
+from core.scheduler import DEFAULT_MAX_QUEUE, PRIORITIES, PriorityScheduler
 
 # --- Configuration Loading ---
 def load_model_configs():
@@ -30,9 +46,12 @@ def get_model_id_from_alias(alias: str, all_configs: dict) -> str | None:
             return model.get('id')
     return None
 
-def load_llm(model_identifier: str, all_configs: dict):
+def get_model_info(model_identifier: str, all_configs: dict) -> dict | None:
     model_id = get_model_id_from_alias(model_identifier, all_configs) or model_identifier
-    model_info = next((m for m in all_configs.get('models', []) if m.get('id') == model_id), None)
+    return next((m for m in all_configs.get('models', []) if m.get('id') == model_id), None)
+
+def load_llm(model_identifier: str, all_configs: dict):
+    model_info = get_model_info(model_identifier, all_configs)
 
     if not model_info:
         print(f"ERROR: Modelo '{model_identifier}' no encontrado.")
@@ -41,137 +60,419 @@ def load_llm(model_identifier: str, all_configs: dict):
     provider = model_info.get('provider')
     config = model_info.get('config', {})
 
-    print(f"\nCargando modelo: {model_info.get('name', model_id)} (Proveedor: {provider})")
+    print(f"\nCargando modelo: {model_info.get('name', model_info.get('id'))} (Proveedor: {provider})")
 
     try:
-        if provider == 'ollama':
-            return ChatOllama(**config)
-        elif provider == 'deepseek':
-            deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-            if not deepseek_api_key:
-                print("\nERROR: DEEPSEEK_API_KEY no encontrada.")
-                return None
-            config['api_key'] = deepseek_api_key
-            return ChatDeepSeek(**config)
-        else:
-            print(f"ERROR: Proveedor '{provider}' no soportado.")
-            return None
+        return create_llm(provider, config)
     except Exception as e:
         print(f"ERROR: {e}")
         return None
 
-# --- Lógica de Ejecución Síncrona (Robusta para CLI) ---
+# --- Lógica de Ejecución (motor asyncio; Ctrl+C cancela la tarea en curso) ---
+
+def _render_text(text: str, sinks=()):
+    # Respuesta completa (sin streaming): misma salida y mismos sinks que el modo streaming
+    renderer = StreamRenderer(sinks=sinks)
+    renderer.feed(text + "\n")
+    renderer.close()
+
+def run_one_shot(llm, message: str, assembler: PromptAssembler = None, stream: bool = False,
+                 metrics: MetricsRecorder = None, sinks=(), context: ContextSizer = None,
+                 cache: ResponseCache = None, model_info: dict = None, scheduler: PriorityScheduler = None,
+                 priority: str = "normal"):
+    from core.batch import provider_concurrency
 
-def run_one_shot(llm, message: str, system_prompt: str = None, stream: bool = False):
     print("--- Modo One-Shot ---")
-    messages = []
-    if system_prompt:
-        messages.append(SystemMessage(content=system_prompt))
-    messages.append(HumanMessage(content=message))
+    messages = (assembler or PromptAssembler()).build([], message)
 
     print(f"Enviando: '{message}'")
     print("\n--- Respuesta ---")
     
+    runner = get_runner()
+    # La petición pasa por el planificador como las del servidor y el demonio (--priority)
+    scheduler = scheduler or PriorityScheduler()
+    model_id = model_info['id'] if model_info else getattr(llm, "model", "modelo")
+    scheduler.register(model_id, provider_concurrency(model_info or {}))
+
+    def make_stream(prefix: str = ""):
+        # Con prefijo (tras una expulsión) se continúa la respuesta ya pintada
+        request_messages = continue_messages(messages, prefix)
+        options = context.options_for(request_messages) if context else None
+        if cache and model_info:
+            return cache.stream(model_id, model_info, llm, request_messages, options)
+        return ChatStream(llm, request_messages, options)
+
+    streams = []
+    mark_sinks(sinks, "user", text=message)
     try:
         if stream:
-            # Iteración síncrona directa: Python chequea señales entre chunks
-            for chunk in llm.stream(messages):
-                print(chunk.content, end="", flush=True)
+            _, cancelled = runner.run(print_scheduled(scheduler, model_id, make_stream, priority, sinks,
+                                                      on_stream=streams.append))
             print()
         else:
-            response = llm.invoke(messages)
-            print(response.content)
-    except KeyboardInterrupt:
-        print("\n\n🛑 Interrumpido por usuario.")
+            content, cancelled = runner.run(scheduler.run_stream(model_id, make_stream, priority=priority,
+                                                                 on_stream=streams.append))
+            if not cancelled:
+                _render_text(content, sinks)
+        if cancelled:
+            mark_sinks(sinks, "cancelled")
+            print("\n🛑 Interrumpido por usuario.")
+        if metrics and streams:
+            metrics.record(TurnMetrics.from_stream(streams[-1], *describe_llm(llm), cancelled=cancelled))
     except Exception as e:
         print(f"\n❌ Error: {e}")
 
-def run_chat_mode(llm, initial_model_identifier: str, all_configs: dict, stream: bool = False):
+def run_batch_mode(batch_path: str, default_model: str, all_configs: dict, output_path: str = None,
+                   concurrency: int = 4, resume: bool = False, metrics: MetricsRecorder = None,
+                   cache: ResponseCache = None, coalescer: "SingleFlight" = None, priority: str = "normal"):
+    from core.batch import BatchRunner, pending_jobs, read_jobs
+
+    try:
+        jobs = read_jobs(batch_path)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    pending = pending_jobs(jobs, output_path, resume)
+    print(f"Lote: {len(jobs)} peticiones, {len(jobs) - len(pending)} ya resueltas, concurrencia {concurrency}",
+          file=sys.stderr)
+
+    def resolve_model(identifier):
+        model_info = get_model_info(identifier, all_configs)
+        if not model_info:
+            raise ValueError(f"Modelo '{identifier}' no encontrado")
+        # Los mensajes de carga van a stderr para no mezclarse con la salida JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            llm = load_llm(identifier, all_configs)
+        if not llm:
+            raise ValueError(f"No se pudo cargar '{identifier}'")
+        return model_info['id'], model_info, llm
+
+    sink = open(output_path, 'a', encoding='utf-8') if output_path else sys.stdout
+    try:
+        # Todos los trabajos se encolan a la vez en el planificador: la cola no tiene tope
+        scheduler = PriorityScheduler.from_config(all_configs, max_waiting=float("inf"))
+        batch = BatchRunner(resolve_model, sink, concurrency=concurrency, metrics=metrics, cache=cache,
+                            coalescer=coalescer, scheduler=scheduler, priority=priority)
+        _, cancelled = get_runner().run(batch.run(pending, default_model))
+        status = "🛑 Interrumpido (reanudar con --resume)" if cancelled else "✅ Terminado"
+        print(f"{status}: {batch.completed} ok, {batch.failed} con error", file=sys.stderr)
+        print(scheduler.format_stats(), file=sys.stderr)
+        if coalescer:
+            print(coalescer.format_stats(), file=sys.stderr)
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+def _resident_models(all_configs: dict, default_model: str):
+    # Procesos de larga vida (servidor, demonio): clientes calientes y el modelo por defecto precargado
+    pool = ModelPool(lambda model_id: load_llm(model_id, all_configs))
+
+    def resolve_model(identifier):
+        model_info = get_model_info(identifier, all_configs)
+        if not model_info:
+            return None
+        llm = pool.get(model_info['id'])
+        return (model_info['id'], model_info, llm) if llm else None
+
+    default_info = get_model_info(default_model, all_configs)
+    if default_info:
+        sizer = ContextSizer.from_model_info(default_info)
+        pool.preload(default_info['id'], {"num_ctx": sizer.initial} if sizer else None)
+    return resolve_model
+
+def run_resident_mode(all_configs: dict, default_model: str, serve_http: bool = False, socket_path: str = None,
+                      host: str = None, port: int = None, max_queue: int = DEFAULT_MAX_QUEUE,
+                      metrics: MetricsRecorder = None, cache: ResponseCache = None, coalescer: "SingleFlight" = None):
+    # Servidor HTTP y/o demonio en un único proceso: mismos clientes calientes y un solo planificador,
+    # así las peticiones interactivas adelantan (o expulsan) a las de lote vengan por donde vengan
+    from core.daemon import AgentDaemon
+    from core.server import DEFAULT_HOST, DEFAULT_PORT, ChatServer
+
+    host, port = host or DEFAULT_HOST, port or DEFAULT_PORT
+    resolve_model = _resident_models(all_configs, default_model)
+    scheduler = PriorityScheduler.from_config(all_configs, max_queue)
+    services, reports = [], [scheduler] + ([coalescer] if coalescer else [])
+    if serve_http:
+        server = ChatServer(resolve_model, all_configs.get('models', []), default_model, metrics=metrics,
+                            scheduler=scheduler, coalescer=coalescer)
+        services.append(server.serve_forever(host, port))
+        print(f"--- Modo Servidor --- http://{host}:{port}/v1 (compatible con OpenAI)")
+    if socket_path:
+        # agents/cliente.py le reenvía las llamadas one-shot sin pagar el arranque de Python + LangChain
+        daemon = AgentDaemon(resolve_model, default_model, metrics, cache, scheduler=scheduler, coalescer=coalescer)
+        services.append(daemon.serve_forever(socket_path))
+        reports.append(daemon)
+        print(f"--- Modo Demonio --- {socket_path}")
+    print("Ctrl+C para parar.")
+
+    async def serve_all():
+        # Si uno no arranca (p. ej. socket ocupado) se paran todos
+        async with asyncio.TaskGroup() as group:
+            for service in services:
+                group.create_task(service)
+
+    try:
+        get_runner().run(serve_all())
+    except ExceptionGroup as e:
+        print(f"ERROR: {e.exceptions[0]}")
+        return
+    print()
+    for report in reports:
+        print(report.format_stats())
+
+def run_chat_mode(llm, initial_model_identifier: str, all_configs: dict, stream: bool = False,
+                  metrics: MetricsRecorder = None, sinks=(), assembler: PromptAssembler = None,
+                  tier_mode: str = None, priority: str = "normal"):
+    from core.batch import provider_concurrency
+    from core.endpoints import endpoint_pool_for
+    from core.routing import RoutedStream, RoutingPolicy
+    from core.tier_router import TierRouter
+
     print("--- Modo Chat Interactivo ---")
     print(f"Streaming: {'✅ Activado' if stream else '❌ Desactivado'}")
-    print("Comandos: /model [alias], /stream, /exit")
+    print("Comandos: /model [alias] [prefetch], /stream, /stats, /routing, /tier, /exit")
     print("Tip: Ctrl+C detiene la generación actual inmediatamente.")
     
     current_model_info = next((m for m in all_configs.get('models', []) if m.get('id') == initial_model_identifier or m.get('alias') == initial_model_identifier), None)
     current_model_name = current_model_info['name'] if current_model_info else initial_model_identifier
     print(f"Modelo actual: {current_model_name}")
 
-    history = [] 
+    # Historial con presupuesto de tokens por modelo (config/models.yaml -> history)
+    history = ConversationHistory.from_model_info(current_model_info)
+    # System prompt y contexto fijado primero, historial solo por el final: prefijo estable para la caché
+    assembler = assembler or PromptAssembler()
+    # Con varios hosts de Ollama, la sesión vuelve siempre al mismo (su KV cache tiene nuestro prefijo)
+    session = uuid.uuid4().hex
+    runner = get_runner()
+    metrics = metrics or MetricsRecorder()
+    last_turn = None
+    # Cada turno pide hueco al planificador con --priority, como el servidor y el demonio
+    scheduler = PriorityScheduler.from_config(all_configs)
 
-    while True:
-        try:
-            # 1. Entrada de usuario (Manejo de Ctrl+C en espera)
+    # Pool de clientes ya construidos; el modelo inicial se precarga mientras el usuario escribe
+    pool = ModelPool(lambda model_id: load_llm(model_id, all_configs))
+    # num_ctx por petición (config/models.yaml -> context), uno por modelo porque cada uno tiene su KV cache
+    sizers = {}
+    sizer = None
+    if current_model_info:
+        sizer = sizers.setdefault(current_model_info['id'], ContextSizer.from_model_info(current_model_info))
+        pool.put(current_model_info['id'], llm)
+        pool.preload(current_model_info['id'], {"num_ctx": sizer.initial} if sizer else None)
+    current_model_id = current_model_info['id'] if current_model_info else initial_model_identifier
+
+    def stream_factory(model_id, messages, tier=None):
+        # El ChatStream de un modelo se construye solo cuando el routing lo lanza
+        def factory():
+            model_llm = pool.get(model_id)
+            if model_llm is None:
+                return None
+            if tier is not None:
+                model_llm = tier_router.apply(model_llm, tier)
+            model_sizer = sizers.setdefault(model_id, ContextSizer.from_model_info(get_model_info(model_id, all_configs)))
+            options = model_sizer.options_for(messages) if model_sizer else None
+            return ChatStream(model_llm, messages, options, session=session)
+        return factory
+
+    # Failover y hedging (config/models.yaml -> routing) cuando el modelo activo es el primario
+    policy = RoutingPolicy.from_config(all_configs)
+    routing = policy is not None
+    if policy:
+        # Los clientes de respaldo se construyen ya; los que no cargan se quitan de la cadena
+        policy.fallbacks = [fallback_id for fallback_id in policy.fallbacks if pool.get(fallback_id)]
+        print(f"🔀 Routing: {' → '.join(policy.chain)} (/routing para activar/desactivar)")
+
+    # Nivel de tarea por petición (config/models.yaml -> tier_routing): "auto", "off" o un nivel fijo
+    tier_router = TierRouter.from_config(all_configs, pool.get)
+    tier_mode = (tier_mode or "auto") if tier_router else None
+    if tier_mode and tier_mode not in ("auto", "off") and not tier_router.get_tier(tier_mode):
+        print(f"⚠️  Nivel '{tier_mode}' no definido; se usa 'auto'.")
+        tier_mode = "auto"
+    if tier_router:
+        print(f"🧭 Niveles: {', '.join(t.name for t in tier_router.tiers)} (modo {tier_mode}; /tier para cambiarlo)")
+
+    try:
+        while True:
             try:
-                user_input = input("\nTú: ").strip()
-            except KeyboardInterrupt:
-                print("\n(Entrada cancelada. Usa /exit para salir)")
-                continue
-
-            if not user_input:
-                continue
-
-            # 2. Comandos
-            if user_input.lower() == '/exit':
-                break
-            if user_input.lower() == '/help':
-                print("Comandos: /exit, /stream, /model [alias]")
-                continue
-            if user_input.lower() == '/stream':
-                stream = not stream
-                print(f"🔄 Streaming: {'Activado' if stream else 'Desactivado'}")
-                continue
+                # 1. Entrada de usuario (Manejo de Ctrl+C en espera)
+                try:
+                    user_input = input("\nTú: ").strip()
+                except KeyboardInterrupt:
+                    print("\n(Entrada cancelada. Usa /exit para salir)")
+                    continue
+
+                if not user_input:
+                    continue
+
+                # 2. Comandos
+                if user_input.lower() == '/exit':
+                    break
+                if user_input.lower() == '/help':
+                    print("Comandos: /exit, /stream, /stats, /model [alias] [prefetch]")
+                    print("  /stats                   - TTFT, tokens/s y tiempos del servidor (p50/p95)")
+                    print("  /model [alias] prefetch  - Precarga el modelo en segundo plano sin cambiar")
+                    print("  /routing                 - Activa/desactiva el failover y hedging de models.yaml")
+                    print("  /tier [auto|off|nivel]   - Nivel de tarea automático, desactivado o fijo")
+                    continue
+                if user_input.lower().split()[0] == '/tier':
+                    if not tier_router:
+                        print("ℹ️  No hay bloque 'tier_routing' en config/models.yaml.")
+                        continue
+                    args = user_input.split()[1:]
+                    if args and args[0] not in ("auto", "off") and not tier_router.get_tier(args[0]):
+                        print(f"❌ Nivel '{args[0]}' no definido ({', '.join(t.name for t in tier_router.tiers)}).")
+                        continue
+                    if args:
+                        tier_mode = args[0]
+                    print(f"🧭 Niveles: modo {tier_mode}")
+                    continue
+                if user_input.lower() == '/routing':
+                    if not policy:
+                        print("ℹ️  No hay bloque 'routing' en config/models.yaml.")
+                        continue
+                    routing = not routing
+                    print(f"🔀 Routing: {'Activado' if routing else 'Desactivado'}")
+                    continue
+                if user_input.lower() == '/stream':
+                    stream = not stream
+                    print(f"🔄 Streaming: {'Activado' if stream else 'Desactivado'}")
+                    continue
+                if user_input.lower() == '/stats':
+                    print(metrics.format_stats())
+                    if sizer:
+                        print(sizer.format_stats())
+                    if endpoint_pool_for(llm):
+                        print(endpoint_pool_for(llm).format_stats())
+                    print(f"Prefijo estable en el último turno: ~{assembler.stable_prefix_tokens} tokens")
+                    continue
             
-            # Cambio de modelo
-            new_model_id = None
-            if user_input.lower().startswith('/model '):
-                new_model_id = user_input.split(' ', 1)[1].strip()
-            elif user_input.startswith('/'):
-                potential_alias = user_input.lower()[1:]
-                if get_model_id_from_alias(potential_alias, all_configs):
-                    new_model_id = potential_alias
-
-            if new_model_id:
-                new_llm = load_llm(new_model_id, all_configs)
-                if new_llm:
+                # Cambio de modelo
+                new_model_id = None
+                prefetch_only = False
+                if user_input.lower().startswith('/model '):
+                    args = user_input.split()[1:]
+                    new_model_id = args[0] if args else None
+                    prefetch_only = len(args) > 1 and args[1].lower() == 'prefetch'
+                elif user_input.startswith('/'):
+                    potential_alias = user_input.lower()[1:]
+                    if get_model_id_from_alias(potential_alias, all_configs):
+                        new_model_id = potential_alias
+
+                if new_model_id:
+                    new_model_info = get_model_info(new_model_id, all_configs)
+                    if not new_model_info:
+                        print(f"❌ Modelo '{new_model_id}' no encontrado.")
+                        continue
+                    new_llm = pool.get(new_model_info['id'])
+                    if not new_llm:
+                        continue
+                    unavailable = pool.check_available(new_llm)
+                    if unavailable:
+                        print(f"❌ {unavailable}")
+                        continue
+                    # Los pesos se cargan en segundo plano mientras el usuario escribe
+                    new_sizer = sizers.setdefault(new_model_info['id'], ContextSizer.from_model_info(new_model_info))
+                    pool.preload(new_model_info['id'], {"num_ctx": new_sizer.initial} if new_sizer else None)
+                    if prefetch_only:
+                        print(f"⏳ Precargando {new_model_info.get('name', new_model_id)} en segundo plano.")
+                        continue
                     llm = new_llm
-                    print(f"✅ Modelo cambiado.")
-                    history = []
-                continue
+                    sizer = new_sizer
+                    current_model_id = new_model_info['id']
+                    print(f"✅ Modelo cambiado (se conserva el historial).")
+                    if tier_mode and tier_mode != "off":
+                        # Elegir modelo a mano fija el modelo: los niveles dejan de decidir
+                        tier_mode = "off"
+                        print("🧭 Niveles desactivados (/tier auto para volver a activarlos).")
+                    history.apply_model_info(new_model_info)
+                    continue
 
-            # 3. Inferencia
-            messages_to_send = history + [HumanMessage(content=user_input)]
+                # 3. Inferencia
+                # Los fallos de las tareas de fondo se muestran aquí, sin pisar lo que el usuario escribía
+                compaction_error = history.take_compaction_error()
+                if compaction_error:
+                    print(f"⚠️  No se pudo resumir el historial: {compaction_error}")
+                for error in pool.take_errors():
+                    print(f"⚠️  {error}")
+                # El resumen pendiente usa el mismo modelo: se corta para no competir con este turno
+                history.cancel_compaction()
+                messages_to_send = assembler.build(history.messages(), user_input)
+
+                turn_model_id, tier = current_model_id, None
+                if tier_mode and tier_mode != "off":
+                    decision, cancelled = runner.run(
+                        tier_router.aroute(user_input, None if tier_mode == "auto" else tier_mode))
+                    if cancelled:
+                        print("\n🛑 Cancelado.")
+                        continue
+                    tier_model_info = get_model_info(decision.tier.model, all_configs)
+                    if tier_model_info and pool.get(tier_model_info['id']):
+                        turn_model_id, tier = tier_model_info['id'], decision.tier
+                        print(f"🧭 {decision.summary()}")
+                    else:
+                        print(f"⚠️  Nivel {decision.tier.name}: modelo '{decision.tier.model}' no disponible, "
+                              f"se usa {current_model_id}.")
             
-            print("Agente: ", end="", flush=True)
-            full_response = ""
+                print("Agente: ", end="", flush=True)
+                mark_sinks(sinks, "user", text=user_input)
             
-            try:
+                def make_stream(prefix: str = ""):
+                    # Con prefijo (tras una expulsión) se continúa la respuesta ya pintada
+                    request_messages = continue_messages(messages_to_send, prefix)
+                    if routing and turn_model_id == policy.primary:
+                        return RoutedStream([(model_id, stream_factory(model_id, request_messages, tier))
+                                             for model_id in policy.chain], policy)
+                    return stream_factory(turn_model_id, request_messages, tier)()
+
+                scheduler.register(turn_model_id, provider_concurrency(get_model_info(turn_model_id, all_configs) or {}))
+                streams = []
                 if stream:
-                    # USO DE .stream() SÍNCRONO
-                    # flush=True es vital para ver el texto aparecer inmediatamente
-                    for chunk in llm.stream(messages_to_send):
-                        content = chunk.content
-                        print(content, end="", flush=True)
-                        full_response += content
+                    # Pintado por frames (~30 fps o por línea) desde un hilo escritor
+                    full_response, cancelled = runner.run(print_scheduled(scheduler, turn_model_id, make_stream,
+                                                                          priority, sinks, on_stream=streams.append))
                     print() # Salto de línea al terminar
                 else:
-                    response = llm.invoke(messages_to_send)
-                    print(response.content)
-                    full_response = response.content
-                
+                    full_response, cancelled = runner.run(scheduler.run_stream(turn_model_id, make_stream,
+                                                                               priority=priority,
+                                                                               on_stream=streams.append))
+                    if not cancelled:
+                        _render_text(full_response, sinks)
+                if not streams:
+                    # Cancelado mientras esperaba hueco: no llegó a generarse nada
+                    mark_sinks(sinks, "cancelled")
+                    print("\n\n🛑 Generación detenida por usuario.")
+                    continue
+                chat_stream = streams[-1]
+                # Con el turno anterior y lo que creció el prompt se deduce cuánto sirvió la KV cache de Ollama
+                last_turn = TurnMetrics.from_stream(chat_stream, *describe_llm(chat_stream.llm or llm),
+                                                    cancelled=cancelled, previous=last_turn,
+                                                    prompt_growth=assembler.grown_tokens)
+                metrics.record(last_turn)
+                answered_by = getattr(chat_stream, "model_id", None) or turn_model_id
+                if sizers.get(answered_by):
+                    sizers[answered_by].observe(chat_stream.final)
+                if getattr(chat_stream, "events", None):
+                    print(f"↪ {'; '.join(chat_stream.events)}")
+            
+                if cancelled:
+                    mark_sinks(sinks, "cancelled")
+                    print("\n\n🛑 Generación detenida por usuario.")
+                    # Opcional: Guardar respuesta parcial si se desea (chat_stream.content)
+                    continue
+            
                 # Solo guardamos si terminó exitosamente
-                history.append(HumanMessage(content=user_input))
-                history.append(AIMessage(content=full_response))
-
-            except KeyboardInterrupt:
-                print("\n\n🛑 Generación detenida por usuario.")
-                # Opcional: Guardar respuesta parcial si se desea
-                # history.append(HumanMessage(content=user_input))
-                # history.append(AIMessage(content=full_response))
+                history.add_turn(user_input, full_response)
+                # Plegado de turnos antiguos en segundo plano mientras el usuario escribe
+                history.compact_in_background(make_summarizer(llm))
             
-        except Exception as e:
-            print(f"\n❌ ERROR: {e}")
-            if "Connection refused" in str(e):
-                print("💡 Verifica que 'ollama serve' esté corriendo.")
+            except Exception as e:
+                print(f"\n❌ ERROR: {e}")
+                if "Connection refused" in str(e):
+                    print("💡 Verifica que 'ollama serve' esté corriendo.")
+    finally:
+        # El log de decisiones de los niveles (tier_routing.log) queda abierto hasta aquí
+        if tier_router:
+            tier_router.close()
 
 def main():
     load_dotenv()
@@ -182,19 +483,121 @@ def main():
     parser.add_argument('-sc', '--headless', action='store_true')
     parser.add_argument('-m', '--message', type=str)
     parser.add_argument('-p', '--system_prompt', type=str, default=None)
+    parser.add_argument('--pin', action='append', default=[], help="Archivo de contexto fijado tras el system prompt (repetible)")
     parser.add_argument('--model', type=str, default=default_model_id)
     parser.add_argument('-s', '--stream', action='store_true')
+    parser.add_argument('--batch', type=str, help="JSONL de peticiones (prompt, system_prompt, model) para modo lote")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Archivo JSONL de resultados del lote (por defecto stdout)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Peticiones simultáneas máximas del lote")
+    parser.add_argument('--resume', action='store_true', help="Omitir los índices ya resueltos en --output")
+    parser.add_argument('--metrics', type=str, default=None, help="Archivo JSONL donde volcar la telemetría de cada turno")
+    parser.add_argument('--transcript', type=str, default=None, help="Archivo donde ir guardando la conversación")
+    parser.add_argument('--events', type=str, default=None, help="Archivo JSONL con los frames de salida y marcas de turno")
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default=None, metavar='RUTA',
+                        help=f"Caché SQLite de respuestas para one-shot y lote (por defecto {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--cache-max-mb', type=int, default=256, help="Tamaño máximo de la caché de respuestas")
+    parser.add_argument('--cache-any-temperature', action='store_true', help="Cachear también con temperature > 0")
+    parser.add_argument('--cache-replay', choices=REPLAY_MODES, default='instant',
+                        help="Reproducir los aciertos al instante o al ritmo original del streaming")
+    parser.add_argument('--serve', action='store_true', help="Servidor HTTP compatible con OpenAI (/v1/chat/completions, /v1/models)")
+    parser.add_argument('--host', type=str, default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Peticiones que pueden esperar turno en el servidor antes de responder 429")
+    parser.add_argument('--daemon', action='store_true', help="Demonio residente para agents/cliente.py (combinable con --serve)")
+    parser.add_argument('--priority', choices=PRIORITIES, default='normal',
+                        help="Prioridad en el planificador (bloque scheduler de models.yaml) del chat, el one-shot, "
+                             "los trabajos del lote sin campo 'priority' y las peticiones al demonio (agents/cliente.py)")
+    parser.add_argument('--socket', type=str, default=default_socket_path(), help="Socket unix del demonio")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="Unir peticiones idénticas simultáneas en una sola generación (servidor, demonio y lote)")
+    parser.add_argument('--coalesce-any-temperature', action='store_true', help="Unirlas también con temperature > 0")
+    parser.add_argument('--tier', type=str, default=None, metavar='auto|NIVEL',
+                        help="Elegir el modelo por nivel de tarea (tier_routing de models.yaml)")
 
     args = parser.parse_args()
-    llm = load_llm(args.model, model_configs)
+    metrics = MetricsRecorder(args.metrics)
+    cache = None
+    if args.cache:
+        cache = ResponseCache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024,
+                              allow_nondeterministic=args.cache_any_temperature, replay=args.cache_replay)
+    coalescer = None
+    if args.coalesce:
+        from core.coalesce import SingleFlight
+        coalescer = SingleFlight(args.coalesce_any_temperature)
+
+    if args.serve or args.daemon:
+        run_resident_mode(model_configs, args.model, args.serve, args.socket if args.daemon else None,
+                          args.host, args.port, args.max_queue, metrics, cache, coalescer)
+        get_runner().close()
+        metrics.close()
+        if cache:
+            print(cache.format_stats(), file=sys.stderr)
+            cache.close()
+        return
+
+    if args.batch:
+        if args.resume and not args.output:
+            parser.error("--resume requiere -o/--output")
+        run_batch_mode(args.batch, args.model, model_configs, args.output, args.concurrency, args.resume, metrics,
+                       cache, coalescer, args.priority)
+        get_runner().close()
+        metrics.close()
+        if cache:
+            print(cache.format_stats(), file=sys.stderr)
+            cache.close()
+        return
+
+    model_id, tier, tier_router = args.model, None, None
+    if args.tier and args.headless:
+        from core.tier_router import TierRouter
+        tier_router = TierRouter.from_config(model_configs, lambda m: load_llm(m, model_configs))
+        if not tier_router:
+            parser.error("--tier requiere el bloque 'tier_routing' en config/models.yaml")
+        if not args.message: parser.error("Headless requiere -m")
+        try:
+            decision, cancelled = get_runner().run(
+                tier_router.aroute(args.message, None if args.tier == 'auto' else args.tier))
+        except ValueError as e:
+            parser.error(str(e))
+        if cancelled:
+            sys.exit(130)
+        print(f"🧭 {decision.summary()}", file=sys.stderr)
+        model_id, tier = decision.tier.model, decision.tier
+        tier_router.close()  # apply() no escribe en el log
+
+    llm = load_llm(model_id, model_configs)
     
     if not llm: sys.exit(1)
+    if tier:
+        llm = tier_router.apply(llm, tier)
+
+    try:
+        assembler = PromptAssembler.from_files(args.system_prompt, args.pin)
+    except OSError as e:
+        parser.error(f"No se pudo leer el contexto fijado: {e}")
 
+    sinks = open_sinks(args.transcript, args.events)
     if args.headless:
         if not args.message: parser.error("Headless requiere -m")
-        run_one_shot(llm, args.message, args.system_prompt, stream=args.stream)
+        model_info = get_model_info(model_id, model_configs)
+        if tier and model_info:
+            # La clave de la caché debe distinguir los parámetros que fija el nivel
+            model_info = {**model_info, "config": {**model_info.get("config", {}), **tier.params()}}
+        context = ContextSizer.from_model_info(model_info)
+        run_one_shot(llm, args.message, assembler, stream=args.stream, metrics=metrics, sinks=sinks,
+                     context=context, cache=cache, model_info=model_info,
+                     scheduler=PriorityScheduler.from_config(model_configs), priority=args.priority)
     else:
-        run_chat_mode(llm, args.model, model_configs, stream=args.stream)
+        run_chat_mode(llm, args.model, model_configs, stream=args.stream, metrics=metrics, sinks=sinks,
+                      assembler=assembler, tier_mode=args.tier, priority=args.priority)
+    get_runner().close()
+    metrics.close()
+    for sink in sinks:
+        sink.close()
+    if cache:
+        print(cache.format_stats(), file=sys.stderr)
+        cache.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,2 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/__init__.py
+# Herramientas de los agentes, cada una en su carpeta (ver DocINICIAL/PLan.md).
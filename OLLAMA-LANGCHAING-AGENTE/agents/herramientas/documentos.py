@@ -0,0 +1,16 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/documentos.py
+# Recorrido de las carpetas de documentos, común al índice vectorial y al archivo SQLite:
+# las dos herramientas ven los mismos archivos con las mismas reglas.
+import os
+
+EXTENSIONS = (".md", ".txt")
+
+
+def list_files(root: str, extensions=EXTENSIONS):
+    """(ruta relativa, ruta completa) de cada documento bajo root, en orden estable."""
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                path = os.path.join(folder, name)
+                yield os.path.relpath(path, root), path
@@ -0,0 +1,2 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/sqlite_store/__init__.py
+# Herramienta RAG estructurada: chunks de Markdown en SQLite con búsqueda FTS5/BM25 (`python -m agents.herramientas.sqlite_store`).
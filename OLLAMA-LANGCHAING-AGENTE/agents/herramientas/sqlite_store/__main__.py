@@ -0,0 +1,44 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/sqlite_store/__main__.py
+# Archivar los Markdown en SQLite y buscarlos por palabras clave:
+#   python -m agents.herramientas.sqlite_store ingestar DocINICIAL --db indices/chunks.sqlite
+#   python -m agents.herramientas.sqlite_store buscar "session rollback" --db indices/chunks.sqlite
+import argparse
+import time
+
+from agents.herramientas.sqlite_store.store import DEFAULT_DB_PATH, ChunkStore
+from agents.herramientas.vectorial.chunker import ChunkerSettings
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Chunks de Markdown en SQLite con búsqueda FTS5 (BM25)")
+    parser.add_argument("comando", choices=("ingestar", "buscar"))
+    parser.add_argument("objetivo", help="Carpeta de documentos (ingestar) o consulta (buscar)")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Archivo SQLite o URL de SQLAlchemy (sqlite:///...)")
+    parser.add_argument("--chunk-size", type=int, default=ChunkerSettings.chunk_size)
+    parser.add_argument("--overlap", type=int, default=ChunkerSettings.overlap)
+    parser.add_argument("--podar", action="store_true", help="Borrar los documentos que ya no están en la carpeta")
+    parser.add_argument("--diferido", action="store_true",
+                        help="Reconstruir los índices al final aunque la base no esté vacía (cargas grandes)")
+    parser.add_argument("-k", type=int, default=5, help="Resultados de la búsqueda")
+    parser.add_argument("--fts", action="store_true", help="Pasar la consulta tal cual con la sintaxis de FTS5")
+    args = parser.parse_args(argv)
+
+    store = ChunkStore(args.db, ChunkerSettings(args.chunk_size, args.overlap))
+    try:
+        if args.comando == "ingestar":
+            stats = store.ingest_folder(args.objetivo, deferred=True if args.diferido else None, prune=args.podar)
+            print(stats.format())
+            print(f"✅ {args.db}: " + ", ".join(f"{count} {table}" for table, count in store.counts().items()))
+            return
+        start = time.perf_counter()
+        results = store.search(args.objetivo, args.k, raw=args.fts)
+        print(f"🔎 {len(results)} resultados en {(time.perf_counter() - start) * 1000:.1f} ms")
+        for result in results:
+            heading = f" § {result['heading']}" if result["heading"] else ""
+            print(f"\n--- {result['path']}{heading} ({result['score']:.2f}) ---\n{result['snippet']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
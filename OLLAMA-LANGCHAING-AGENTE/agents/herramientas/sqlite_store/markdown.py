@@ -0,0 +1,64 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/sqlite_store/markdown.py
+import re
+from dataclasses import dataclass
+
+import yaml
+
+HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE = re.compile(r"^[ \t]*(```|~~~)")
+
+
+@dataclass
+class Section:
+    """Trozo de un documento bajo un encabezado; `path` es la ruta de títulos ("A > B > C")."""
+    level: int
+    title: str
+    path: str
+    text: str
+    line: int
+
+
+def split_front_matter(text: str) -> tuple[dict, str]:
+    """Metadatos YAML de cabecera (--- ... ---) y el resto del documento."""
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---", 4)
+    if end == -1:
+        return {}, text
+    try:
+        data = yaml.safe_load(text[4:end])
+    except yaml.YAMLError:
+        return {}, text
+    if not isinstance(data, dict):
+        return {}, text
+    return data, text[text.find("\n", end + 1) + 1 or len(text):]
+
+
+def split_sections(text: str) -> list[Section]:
+    """
+    Divide el Markdown por encabezados ATX (# ... ######), sin contar los que hay dentro de
+    bloques de código. El texto previo al primer encabezado es una sección de nivel 0.
+    """
+    sections, lines = [], []
+    titles: list[str] = []  # pila de títulos abiertos, uno por nivel
+    level, title, start, in_fence = 0, "", 1, False
+
+    def close():
+        body = "\n".join(lines).strip()
+        if body or level:
+            sections.append(Section(level, title, " > ".join(t for t in titles if t), body, start))
+
+    for number, line in enumerate(text.split("\n"), 1):
+        if FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        close()
+        level, title, start, lines = len(match.group(1)), match.group(2), number, []
+        del titles[level - 1:]
+        titles.extend([""] * (level - 1 - len(titles)))
+        titles.append(title)
+    close()
+    return sections
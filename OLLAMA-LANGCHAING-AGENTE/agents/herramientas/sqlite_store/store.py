@@ -0,0 +1,288 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/sqlite_store/store.py
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from sqlalchemy import (Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, create_engine,
+                        event, text)
+
+from agents.herramientas.documentos import EXTENSIONS, list_files
+from agents.herramientas.sqlite_store.markdown import split_front_matter, split_sections
+from agents.herramientas.vectorial.chunker import ChunkerSettings, split_text
+
+DEFAULT_DB_PATH = os.path.join("indices", "chunks.sqlite")
+# Filas acumuladas antes de cada executemany (todas van en la misma transacción)
+FLUSH_ROWS = 20_000
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # con WAL no se pierde integridad, solo la última transacción ante un corte
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MiB
+)
+
+metadata = MetaData()
+documents = Table(
+    "documents", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("path", Text, nullable=False, unique=True),
+    Column("title", Text),
+    Column("sha256", String(64), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("chunker", Text, nullable=False),
+    Column("ingested_at", Float, nullable=False),
+)
+sections = Table(
+    "sections", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False),
+    Column("position", Integer, nullable=False),
+    Column("level", Integer, nullable=False),
+    Column("title", Text, nullable=False),
+    Column("path", Text, nullable=False),
+    Column("line", Integer, nullable=False),
+)
+chunks = Table(
+    "chunks", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False),
+    Column("section_id", Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False),
+    Column("position", Integer, nullable=False),
+    Column("text", Text, nullable=False),
+)
+document_metadata = Table(
+    "metadata", metadata,
+    Column("document_id", Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True),
+    Column("key", Text, primary_key=True),
+    Column("value", Text, nullable=False),
+)
+# Índices secundarios: en una carga masiva se crean al final, más rápido que mantenerlos fila a fila
+SECONDARY_INDEXES = (
+    Index("ix_sections_document", sections.c.document_id),
+    Index("ix_chunks_document", chunks.c.document_id),
+    Index("ix_chunks_section", chunks.c.section_id),
+)
+
+# El índice FTS5 es de contenido externo: no duplica el texto, lo lee de esta vista (chunk + ruta de títulos)
+FTS_DDL = (
+    "CREATE VIEW IF NOT EXISTS chunks_content AS "
+    "SELECT c.id AS id, c.document_id AS document_id, c.text AS text, s.path AS heading "
+    "FROM chunks c JOIN sections s ON s.id = c.section_id",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, heading, content='chunks_content', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+)
+FTS_REBUILD = text("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+FTS_INSERT = text("INSERT INTO chunks_fts(rowid, text, heading) "
+                  "SELECT id, text, heading FROM chunks_content WHERE document_id = :document_id")
+FTS_DELETE = text("INSERT INTO chunks_fts(chunks_fts, rowid, text, heading) "
+                  "SELECT 'delete', id, text, heading FROM chunks_content WHERE document_id = :document_id")
+
+# Sentencias de búsqueda fijas: SQLAlchemy las compila una vez y sqlite3 reutiliza la sentencia
+# preparada de cada conexión del pool. BM25 da el doble de peso a los títulos que al texto.
+# El snippet se calcula solo para los k mejores (en la subconsulta se calcularía para cada coincidencia).
+SEARCH = text(
+    "SELECT c.id, d.path, s.path AS heading, c.text, f.score, "
+    "snippet(chunks_fts, 0, '[', ']', '…', 16) AS snippet "
+    "FROM (SELECT rowid, bm25(chunks_fts, 1.0, 2.0) AS score FROM chunks_fts "
+    "WHERE chunks_fts MATCH :query ORDER BY score LIMIT :k) f "
+    "JOIN chunks_fts ON chunks_fts.rowid = f.rowid AND chunks_fts MATCH :query "
+    "JOIN chunks c ON c.id = f.rowid JOIN sections s ON s.id = c.section_id "
+    "JOIN documents d ON d.id = c.document_id ORDER BY f.score")
+DOCUMENT_METADATA = text("SELECT m.key, m.value FROM metadata m JOIN documents d ON d.id = m.document_id "
+                         "WHERE d.path = :path")
+
+_WORD = re.compile(r"\w+")
+
+
+def match_query(query: str, any_term: bool = False) -> str:
+    """Consulta FTS5 a partir de texto libre: cada palabra entre comillas (sin sintaxis que pueda fallar)."""
+    return (" OR " if any_term else " ").join(f'"{word}"' for word in _WORD.findall(query))
+
+
+@dataclass
+class IngestStats:
+    documents: int = 0
+    skipped: int = 0  # sin cambios desde la ingesta anterior
+    removed: int = 0
+    sections: int = 0
+    chunks: int = 0
+    deferred: bool = False
+    seconds: float = 0.0
+
+    def format(self) -> str:
+        rate = f", {self.chunks / self.seconds:.0f} chunks/s" if self.seconds else ""
+        mode = ", índices al final" if self.deferred else ""
+        return (f"📚 {self.documents} documentos ({self.skipped} sin cambios, {self.removed} borrados), "
+                f"{self.sections} secciones, {self.chunks} chunks en {self.seconds:.2f}s{rate}{mode}")
+
+
+class ChunkStore:
+    """
+    Archivador estructurado de la iteración 2 (DocINICIAL/PLan.md): documentos, secciones por
+    encabezado, chunks y metadatos en SQLite (vía SQLAlchemy), con un índice FTS5 para buscar por
+    palabras clave ordenando por BM25. La ingesta va en una sola transacción con executemany por
+    bloques; en las cargas masivas el índice FTS y los índices secundarios se construyen al final.
+    """
+
+    def __init__(self, url: str = DEFAULT_DB_PATH, settings: ChunkerSettings = ChunkerSettings()):
+        if not url.startswith("sqlite:"):
+            os.makedirs(os.path.dirname(os.path.abspath(url)), exist_ok=True)
+            url = f"sqlite:///{url}"
+        self.settings = settings
+        self.engine = create_engine(url)
+        event.listen(self.engine, "connect", _on_connect)
+        event.listen(self.engine, "begin", _on_begin)
+        with self._write() as conn:
+            metadata.create_all(conn)
+            for statement in FTS_DDL:
+                conn.exec_driver_sql(statement)
+
+    @contextmanager
+    def _write(self):
+        # BEGIN IMMEDIATE: toma el bloqueo de escritura al empezar (los ids se reservan con max(id))
+        with self.engine.connect() as conn:
+            conn.execution_options(immediate=True)
+            with conn.begin():
+                yield conn
+
+    def ingest(self, documents_iter, deferred: bool | None = None, prune: bool = False) -> IngestStats:
+        """
+        Guarda los (ruta, texto) de un iterable. Un documento con el mismo sha256 y troceado se
+        omite; uno modificado se sustituye. deferred=None decide solo: índices al final si la base
+        estaba vacía. Con prune=True se borran los documentos que no venían en el iterable.
+        """
+        stats = IngestStats()
+        start = time.perf_counter()
+        chunker = json.dumps(self.settings.as_dict(), sort_keys=True)
+        with self._write() as conn:
+            known = {path: (id_, sha, chunker_) for id_, path, sha, chunker_ in
+                     conn.exec_driver_sql("SELECT id, path, sha256, chunker FROM documents")}
+            stats.deferred = not known if deferred is None else deferred
+            if stats.deferred:
+                for index in SECONDARY_INDEXES:
+                    index.drop(conn, checkfirst=True)
+            next_id = {table.name: conn.exec_driver_sql(f"SELECT coalesce(max(id), 0) + 1 FROM {table.name}").scalar()
+                       for table in (documents, sections, chunks)}
+            rows = {documents: [], sections: [], chunks: [], document_metadata: []}
+            inserted, seen = [], set()
+
+            def flush():
+                for table, batch in rows.items():
+                    if batch:
+                        conn.execute(table.insert(), batch)  # executemany
+                        batch.clear()
+
+            for path, content in documents_iter:
+                seen.add(path)
+                sha = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                previous = known.get(path)
+                if previous and previous[1:] == (sha, chunker):
+                    stats.skipped += 1
+                    continue
+                if previous:
+                    self._delete(conn, previous[0], stats.deferred)
+                front, body = split_front_matter(content)
+                parts = split_sections(body)
+                document_id = next_id["documents"]
+                next_id["documents"] += 1
+                title = str(front.get("title") or next((s.title for s in parts if s.level), "") or os.path.basename(path))
+                rows[documents].append({"id": document_id, "path": path, "title": title, "sha256": sha,
+                                        "size": len(content), "chunker": chunker, "ingested_at": time.time()})
+                rows[document_metadata].extend({"document_id": document_id, "key": str(key), "value": _as_text(value)}
+                                               for key, value in front.items())
+                for position, section in enumerate(parts):
+                    section_id = next_id["sections"]
+                    next_id["sections"] += 1
+                    rows[sections].append({"id": section_id, "document_id": document_id, "position": position,
+                                           "level": section.level, "title": section.title,
+                                           "path": section.path, "line": section.line})
+                    for chunk_position, chunk in enumerate(split_text(section.text, self.settings)):
+                        rows[chunks].append({"id": next_id["chunks"], "document_id": document_id,
+                                             "section_id": section_id, "position": chunk_position, "text": chunk})
+                        next_id["chunks"] += 1
+                        stats.chunks += 1
+                    stats.sections += 1
+                stats.documents += 1
+                inserted.append(document_id)
+                if len(rows[chunks]) >= FLUSH_ROWS:
+                    flush()
+            flush()
+
+            if prune:
+                for path in set(known) - seen:
+                    self._delete(conn, known[path][0], stats.deferred)
+                    stats.removed += 1
+            if stats.deferred:
+                for index in SECONDARY_INDEXES:
+                    index.create(conn)
+                conn.execute(FTS_REBUILD)
+            else:
+                for document_id in inserted:
+                    conn.execute(FTS_INSERT, {"document_id": document_id})
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def ingest_folder(self, root: str, extensions=EXTENSIONS, **kwargs) -> IngestStats:
+        def read():
+            for source, path in list_files(root, extensions):
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    yield source, f.read()
+        return self.ingest(read(), **kwargs)
+
+    @staticmethod
+    def _delete(conn, document_id: int, deferred: bool):
+        # Con contenido externo hay que quitar las filas del índice FTS antes de borrar el contenido
+        # (en modo diferido el índice se reconstruye entero al final)
+        if not deferred:
+            conn.execute(FTS_DELETE, {"document_id": document_id})
+        conn.execute(documents.delete().where(documents.c.id == document_id))  # secciones y chunks en cascada
+
+    def search(self, query: str, k: int = 5, raw: bool = False, any_term: bool = False) -> list[dict]:
+        """
+        Los k chunks con mejor BM25 para la consulta (menor puntuación = más relevante). Se piden
+        todas las palabras y, si ningún chunk las tiene todas, cualquiera de ellas (una pregunta en
+        lenguaje natural trae palabras que no aparecen). Con raw=True la consulta se pasa tal cual
+        con la sintaxis de FTS5 (frases, NEAR, prefijo*...).
+        """
+        match = query if raw else match_query(query, any_term)
+        if not match:
+            return []
+        with self.engine.connect() as conn:
+            rows = conn.execute(SEARCH, {"query": match, "k": k}).all()
+            if not rows and not (raw or any_term) and " " in match:
+                rows = conn.execute(SEARCH, {"query": match_query(query, any_term=True), "k": k}).all()
+        return [dict(row._mapping) for row in rows]
+
+    def document_metadata(self, path: str) -> dict:
+        with self.engine.connect() as conn:
+            return {key: json.loads(value) for key, value in conn.execute(DOCUMENT_METADATA, {"path": path})}
+
+    def counts(self) -> dict:
+        with self.engine.connect() as conn:
+            return {table: conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+                    for table in ("documents", "sections", "chunks", "metadata")}
+
+    def close(self):
+        self.engine.dispose()
+
+
+def _as_text(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    # sqlite3 abre transacciones por su cuenta; se desactiva para que el BEGIN lo emita _on_begin
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _on_begin(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get("immediate") else "BEGIN")
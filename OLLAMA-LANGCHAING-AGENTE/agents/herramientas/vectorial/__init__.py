@@ -0,0 +1,2 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/__init__.py
+# Herramienta RAG vectorial: índice de embeddings persistente en disco (`python -m agents.herramientas.vectorial`).
@@ -0,0 +1,131 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/__main__.py
+# Construir el índice una vez y consultarlo en cada arranque sin volver a embeber:
+#   python -m agents.herramientas.vectorial construir DocINICIAL --indice indices/docs
+#   python -m agents.herramientas.vectorial buscar "¿qué es cognee?" --indice indices/docs
+#   python -m agents.herramientas.vectorial actualizar DocINICIAL --indice indices/docs   # solo lo que cambió
+#   python -m agents.herramientas.vectorial afinar DocINICIAL   # lote y concurrencia para este equipo
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+from agents.herramientas.vectorial.chunker import ChunkerSettings
+from agents.herramientas.vectorial.embedding_cache import DEFAULT_EMBEDDING_CACHE, EmbeddingCache
+from agents.herramientas.vectorial.ingest import chunk_corpus, ingest, read_corpus, watch
+from agents.herramientas.vectorial.pipeline import load_tuning, save_tuning, tune
+from agents.herramientas.vectorial.store import IndexMismatch, VectorStore
+from core.ollama_client import DEFAULT_BASE_URL, get_ollama_client
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_CONCURRENCY = 2
+
+
+def build(root: str, index_path: str, model: str, base_url: str, settings: ChunkerSettings,
+          cache: EmbeddingCache | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+          concurrency: int = DEFAULT_CONCURRENCY, full: bool = True):
+    """Ingesta completa (construir) o solo de lo que cambió desde la anterior (actualizar)."""
+    report = ingest(root, index_path, model, base_url, settings, cache, batch_size, concurrency, full=full)
+    print_report(report, index_path, batch_size, concurrency, cache)
+    return report
+
+
+def print_report(report, index_path: str, batch_size: int, concurrency: int, cache: EmbeddingCache | None = None):
+    print(report.format())
+    if report.saved:
+        manifest = VectorStore.read_manifest(index_path)
+        print(f"✅ Índice guardado en {index_path} ({manifest.count} vectores de {manifest.dimension} "
+              f"dimensiones, lotes de {batch_size}, {concurrency} en paralelo)")
+    if report.embedded:
+        print(report.meter.format())
+        if cache:
+            print(cache.format_stats())
+
+
+def search(query: str, index_path: str, model: str, base_url: str, k: int = 4):
+    start = time.perf_counter()
+    store = VectorStore.load(index_path, embedding_model=model)
+    loaded = time.perf_counter() - start
+    query_vector = get_ollama_client(base_url).embed(model, [query])[0]
+    results = store.search(query_vector, k)
+    print(f"🔎 {len(store)} vectores (carga {loaded * 1000:.0f} ms, total {(time.perf_counter() - start) * 1000:.0f} ms)")
+    for score, record in results:
+        print(f"\n--- {record['source']} ({score:.3f}) ---\n{record['text']}")
+    return results
+
+
+def autotune(root: str, model: str, base_url: str, settings: ChunkerSettings, sample_size: int = 512) -> dict:
+    sample = [r["text"] for r in itertools.islice(chunk_corpus(read_corpus(root), settings), sample_size)]
+    client = get_ollama_client(base_url)
+
+    async def run():
+        try:
+            return await tune(client, model, sample)
+        finally:
+            await client.aclose()
+    result = asyncio.run(run())
+    for trial in result["trials"]:
+        print(f"  lote {trial['batch_size']:>4}  concurrencia {trial['concurrency']:>2}  "
+              f"{trial['chunks_per_s']:8.1f} chunks/s  {trial['tokens_per_s']:9.0f} tokens/s")
+    save_tuning(model, base_url, result)
+    print(f"✅ Mejor: lote {result['batch_size']}, concurrencia {result['concurrency']} "
+          f"({result['chunks_per_s']:.1f} chunks/s); `construir` lo usará por defecto")
+    return result
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Índice vectorial persistente sobre Ollama /api/embed")
+    parser.add_argument("comando", choices=("construir", "actualizar", "buscar", "afinar"))
+    parser.add_argument("objetivo", help="Carpeta de documentos (construir, actualizar, afinar) o consulta (buscar)")
+    parser.add_argument("--indice", default=os.path.join("indices", "docs"), help="Carpeta del índice")
+    parser.add_argument("--modelo", default=DEFAULT_EMBED_MODEL, help="Modelo de embeddings de Ollama")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--chunk-size", type=int, default=ChunkerSettings.chunk_size)
+    parser.add_argument("--overlap", type=int, default=ChunkerSettings.overlap)
+    parser.add_argument("-k", type=int, default=4, help="Resultados de la búsqueda")
+    parser.add_argument("--cache-dir", default=DEFAULT_EMBEDDING_CACHE,
+                        help="Caché de embeddings compartida por todas las ingestas")
+    parser.add_argument("--sin-cache", action="store_true", help="Embeber todo sin consultar la caché")
+    parser.add_argument("--lote", type=int, default=None, help="Textos por petición a /api/embed (por defecto, lo de `afinar`)")
+    parser.add_argument("--concurrencia", type=int, default=None, help="Peticiones de embeddings en vuelo")
+    parser.add_argument("--muestra", type=int, default=512, help="Chunks que usa `afinar` en cada prueba")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="Con `actualizar`, seguir comprobando la carpeta y aplicar los cambios")
+    parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre comprobaciones de --vigilar")
+    args = parser.parse_args(argv)
+
+    settings = ChunkerSettings(args.chunk_size, args.overlap)
+    if args.comando == "afinar":
+        autotune(args.objetivo, args.modelo, args.base_url, settings, args.muestra)
+        return
+
+    tuning = load_tuning(args.modelo, args.base_url) or {}
+    batch_size = args.lote or tuning.get("batch_size", DEFAULT_BATCH_SIZE)
+    concurrency = args.concurrencia or tuning.get("concurrency", DEFAULT_CONCURRENCY)
+    cache = None if args.sin_cache or args.comando == "buscar" else EmbeddingCache(args.cache_dir)
+    try:
+        if args.comando == "actualizar" and args.vigilar:
+            print(f"👀 Vigilando {args.objetivo} cada {args.intervalo:g}s (Ctrl+C para salir)")
+            watch(args.objetivo, args.indice, args.modelo, args.intervalo,
+                  on_report=lambda report: print_report(report, args.indice, batch_size, concurrency, cache),
+                  base_url=args.base_url, settings=settings, cache=cache,
+                  batch_size=batch_size, concurrency=concurrency)
+        elif args.comando in ("construir", "actualizar"):
+            build(args.objetivo, args.indice, args.modelo, args.base_url, settings, cache, batch_size, concurrency,
+                  full=args.comando == "construir")
+        else:
+            search(args.objetivo, args.indice, args.modelo, args.base_url, args.k)
+    except (IndexMismatch, FileNotFoundError) as e:
+        print(f"❌ {e}. Reconstruye con `construir`.", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia detenida")
+    finally:
+        if cache:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
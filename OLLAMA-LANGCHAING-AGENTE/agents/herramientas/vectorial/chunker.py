@@ -0,0 +1,52 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/chunker.py
+from dataclasses import asdict, dataclass
+
+# De mayor a menor: se corta por el separador más grande que deje trozos de menos de chunk_size
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+@dataclass(frozen=True)
+class ChunkerSettings:
+    """Parámetros del troceado; van al manifiesto del índice porque cambiarlos cambia los chunks."""
+    chunk_size: int = 1000
+    overlap: int = 200
+    name: str = "recursive"
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def split_text(text: str, settings: ChunkerSettings = ChunkerSettings()) -> list[str]:
+    """
+    Trocea como RecursiveCharacterTextSplitter: párrafos, después líneas, frases y palabras,
+    juntando piezas hasta chunk_size caracteres y repitiendo al menos `overlap` del final
+    del chunk anterior al principio del siguiente.
+    """
+    pieces = _pieces(text.strip(), settings.chunk_size, 0)
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) > settings.chunk_size:
+            chunks.append("".join(current).strip())
+            # Solapamiento: se conservan las últimas piezas que quepan en `overlap`
+            while current and (size > settings.overlap or size + len(piece) > settings.chunk_size):
+                size -= len(current.pop(0))
+        current.append(piece)
+        size += len(piece)
+    if current:
+        chunks.append("".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def _pieces(text: str, chunk_size: int, level: int) -> list[str]:
+    if len(text) <= chunk_size:
+        return [text] if text else []
+    if level == len(SEPARATORS):
+        return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    separator = SEPARATORS[level]
+    parts = text.split(separator)
+    pieces = []
+    for i, part in enumerate(parts):
+        # El separador se queda al final de su pieza para no perder saltos de línea
+        part = part + separator if i < len(parts) - 1 else part
+        pieces.extend(_pieces(part, chunk_size, level + 1))
+    return pieces
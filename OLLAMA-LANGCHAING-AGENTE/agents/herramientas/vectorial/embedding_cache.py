@@ -0,0 +1,164 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+DEFAULT_EMBEDDING_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "tron", "embeddings")
+INDEX = "index.sqlite"
+DTYPES = ("float16", "float32")
+# Parámetros por consulta que admite SQLite como mínimo
+_SQL_BATCH = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Forma canónica del chunk: NFC y espacios colapsados (mismo texto con otro formato, misma clave)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings direccionada por contenido: la clave es (modelo, hash del texto normalizado),
+    así un chunk repetido en varios documentos o en varias ingestas se embebe una sola vez.
+    Los vectores van en un archivo binario por (modelo, dimensión), fila tras fila (float16 por
+    defecto, la mitad de disco que float32 y de sobra para similitud coseno), y SQLite guarda el
+    índice clave -> fila. Lo comparten todas las ingestas: la transacción de SQLite serializa a
+    los procesos que escriben a la vez.
+    """
+
+    def __init__(self, path: str = DEFAULT_EMBEDDING_CACHE, dtype: str = "float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Tipo '{dtype}' no válido ({', '.join(DTYPES)})")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, INDEX), check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS arrays (model TEXT NOT NULL, dim INTEGER NOT NULL, dtype TEXT NOT NULL, "
+            "file TEXT NOT NULL, rows INTEGER NOT NULL, PRIMARY KEY (model, dim))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, key TEXT NOT NULL, dim INTEGER NOT NULL, "
+            "row INTEGER NOT NULL, PRIMARY KEY (model, key))")
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: list[str]) -> list[np.ndarray | None]:
+        """Vector (float32) de cada texto, o None si no está en la caché."""
+        keys = [text_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, dim, row FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    (model, *batch)).fetchall()
+                found.update((key, (dim, row)) for key, dim, row in rows)
+            arrays = {dim: self._array(model, dim) for dim in {dim for dim, _ in found.values()}}
+        result = []
+        for key in keys:
+            if key in found:
+                dim, row = found[key]
+                result.append(np.asarray(arrays[dim][row], dtype=np.float32))
+            else:
+                result.append(None)
+        hits = sum(vector is not None for vector in result)
+        self.stats["hits"] += hits
+        self.stats["misses"] += len(result) - hits
+        return result
+
+    def put_many(self, model: str, texts: list[str], vectors):
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        if not len(texts):
+            return
+        keys = list(dict.fromkeys(text_key(text) for text in texts))
+        first_row = {}
+        for text, vector in zip(texts, vectors):
+            first_row.setdefault(text_key(text), vector)
+        dim = vectors.shape[1]
+        with self._lock:
+            # BEGIN IMMEDIATE: otro proceso no puede reservar las mismas filas hasta el commit
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = set()
+                for start in range(0, len(keys), _SQL_BATCH):
+                    batch = keys[start:start + _SQL_BATCH]
+                    known.update(key for (key,) in self._conn.execute(
+                        f"SELECT key FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                        (model, *batch)))
+                new = [key for key in keys if key not in known]
+                if new:
+                    file, rows = self._reserve(model, dim, len(new))
+                    with open(os.path.join(self.path, file), "r+b") as f:
+                        f.seek(rows * dim * self.dtype.itemsize)
+                        f.write(np.stack([first_row[key] for key in new]).astype(self.dtype).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO embeddings (model, key, dim, row) VALUES (?, ?, ?, ?)",
+                        [(model, key, dim, rows + i) for i, key in enumerate(new)])
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        self.stats["stored"] += len(new)
+
+    def embed(self, model: str, texts: list[str], embed_fn) -> np.ndarray:
+        """
+        Embeddings de todos los textos llamando a embed_fn(textos) solo con los que faltan
+        (y cada texto repetido una sola vez).
+        """
+        vectors = self.get_many(model, texts)
+        missing = list(dict.fromkeys(normalize_text(t) for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            computed = np.asarray(embed_fn(missing), dtype=np.float32)
+            self.put_many(model, missing, computed)
+            by_text = dict(zip(missing, computed))
+            vectors = [v if v is not None else by_text[normalize_text(t)] for t, v in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def _reserve(self, model: str, dim: int, count: int) -> tuple[str, int]:
+        row = self._conn.execute("SELECT file, rows, dtype FROM arrays WHERE model = ? AND dim = ?",
+                                 (model, dim)).fetchone()
+        if row is None:
+            file = f"vectors-{hashlib.sha256(model.encode('utf-8')).hexdigest()[:12]}-{dim}.{self.dtype.name}"
+            open(os.path.join(self.path, file), "ab").close()
+            self._conn.execute("INSERT INTO arrays (model, dim, dtype, file, rows) VALUES (?, ?, ?, ?, ?)",
+                               (model, dim, self.dtype.name, file, count))
+            return file, 0
+        file, rows, dtype = row
+        if dtype != self.dtype.name:
+            raise ValueError(f"La caché de '{model}' está en {dtype}, no en {self.dtype.name}")
+        self._conn.execute("UPDATE arrays SET rows = ? WHERE model = ? AND dim = ?", (rows + count, model, dim))
+        return file, rows
+
+    def _array(self, model: str, dim: int) -> np.ndarray:
+        file, rows, dtype = self._conn.execute(
+            "SELECT file, rows, dtype FROM arrays WHERE model = ? AND dim = ?", (model, dim)).fetchone()
+        return np.memmap(os.path.join(self.path, file), dtype=dtype, mode="r", shape=(rows, dim))
+
+    @property
+    def hit_rate(self) -> float | None:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else None
+
+    def format_stats(self) -> str:
+        s = self.stats
+        rate = f"{self.hit_rate * 100:.0f}%" if self.hit_rate is not None else "-"
+        return f"Caché de embeddings: {s['hits']} aciertos, {s['misses']} fallos ({rate}), {s['stored']} nuevos"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,216 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/ingest.py
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from agents.herramientas.documentos import EXTENSIONS, list_files
+from agents.herramientas.vectorial.chunker import ChunkerSettings, split_text
+from agents.herramientas.vectorial.embedding_cache import EmbeddingCache
+from agents.herramientas.vectorial.pipeline import EmbeddingPipeline, ThroughputMeter
+from agents.herramientas.vectorial.store import VectorStore
+from core.ollama_client import DEFAULT_BASE_URL, get_ollama_client
+
+
+def read_document(path: str) -> tuple[str, str]:
+    """Texto (UTF-8, saltos de línea normalizados) y sha256 del contenido en bruto."""
+    with open(path, "rb") as f:
+        data = f.read()
+    text = data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    return text, hashlib.sha256(data).hexdigest()
+
+
+def read_corpus(root: str, extensions=EXTENSIONS):
+    """(ruta relativa, texto) de cada documento bajo root, según se piden."""
+    for source, path in list_files(root, extensions):
+        yield source, read_document(path)[0]
+
+
+def split_document(source: str, text: str, settings: ChunkerSettings) -> list[dict]:
+    return [{"id": f"{source}#{i}", "source": source, "text": chunk}
+            for i, chunk in enumerate(split_text(text, settings))]
+
+
+def chunk_corpus(documents, settings: ChunkerSettings):
+    for source, text in documents:
+        yield from split_document(source, text, settings)
+
+
+def snapshot(root: str, extensions=EXTENSIONS) -> dict[str, tuple[int, int]]:
+    """(mtime_ns, size) de cada documento: basta con stat para saber si algo cambió."""
+    result = {}
+    for source, path in list_files(root, extensions):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:  # borrado mientras se recorría
+            continue
+        result[source] = (stat.st_mtime_ns, stat.st_size)
+    return result
+
+
+@dataclass
+class IngestReport:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    touched: int = 0  # mismo contenido con otro mtime/tamaño: solo se actualiza el manifiesto
+    embedded: int = 0  # chunks nuevos enviados al pipeline (la caché de embeddings puede ahorrar más)
+    reused: int = 0  # chunks cuyo vector se copia del índice anterior
+    stale: int = 0  # chunks del índice anterior que desaparecen
+    saved: bool = False
+    meter: ThroughputMeter = field(default_factory=ThroughputMeter)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def needs_save(self) -> bool:
+        return self.has_changes or bool(self.touched)
+
+    def format(self) -> str:
+        line = (f"📥 Documentos: {self.added} nuevos, {self.changed} modificados, {self.removed} borrados, "
+                f"{self.unchanged} sin cambios ({self.touched} con otra fecha) | chunks: {self.embedded} embebidos, {self.reused} reutilizados, "
+                f"{self.stale} eliminados")
+        return line if self.saved else f"{line} (índice sin cambios)"
+
+
+def load_previous(index_path: str, model: str, settings: ChunkerSettings) -> VectorStore | None:
+    """Índice anterior si se puede actualizar; None (ingesta completa) si falta o es incompatible."""
+    manifest = VectorStore.read_manifest(index_path)
+    if manifest is None:
+        return None
+    problems = manifest.mismatches(embedding_model=model, chunker=settings.as_dict())
+    if problems:
+        print(f"⚠️ El índice de {index_path} no es compatible ({'; '.join(problems)}): se reconstruye entero")
+        return None
+    store = VectorStore.load(index_path)
+    if store.files is None:
+        print(f"⚠️ El índice de {index_path} no tiene manifiesto de archivos: se reconstruye entero")
+        return None
+    return store
+
+
+def ingest(root: str, index_path: str, model: str, base_url: str = DEFAULT_BASE_URL,
+           settings: ChunkerSettings = ChunkerSettings(), cache: EmbeddingCache | None = None,
+           batch_size: int = 32, concurrency: int = 2, full: bool = False) -> IngestReport:
+    """
+    Actualiza el índice con los cambios de root desde la última ingesta. Un documento con el mismo
+    mtime y tamaño no se vuelve a leer; uno con el mismo sha256 no se vuelve a trocear; de los
+    modificados solo se embeben los chunks cuyo texto no estaba ya en ese documento. Los chunks de
+    documentos borrados o que ya no salen al trocear desaparecen del índice. Con full=True (o sin
+    índice previo compatible) se embebe todo.
+    """
+    report = IngestReport()
+    previous = None if full else load_previous(index_path, model, settings)
+    old_files = previous.files if previous is not None else {}
+    old_rows = {record["id"]: row for row, record in enumerate(previous.records)} if previous is not None else {}
+
+    records: list[dict] = []
+    sources: list[int | None] = []  # fila del índice anterior o None si hay que embeberlo
+    files: dict[str, dict] = {}
+
+    def keep(source: str, entry: dict):
+        for chunk_id in entry["chunk_ids"]:
+            row = old_rows[chunk_id]
+            records.append(previous.records[row])
+            sources.append(row)
+        files[source] = entry
+        report.unchanged += 1
+        report.reused += len(entry["chunk_ids"])
+
+    def pending():
+        # Generador: el pipeline lo consume al ritmo al que embebe (contrapresión)
+        for source, path in list_files(root):
+            try:
+                stat = os.stat(path)
+                prev = old_files.get(source)
+                if prev and (prev["mtime_ns"], prev["size"]) == (stat.st_mtime_ns, stat.st_size):
+                    keep(source, prev)
+                    continue
+                text, digest = read_document(path)
+            except FileNotFoundError:  # borrado mientras se recorría
+                continue
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest}
+            if prev and prev["sha256"] == digest:
+                # Se guarda la fecha nueva: si no, cada ingesta volvería a leer y hashear el archivo
+                keep(source, {**prev, **entry})
+                report.touched += 1
+                continue
+
+            report.changed += prev is not None
+            report.added += prev is None
+            by_text = {previous.records[old_rows[c]]["text"]: old_rows[c] for c in prev["chunk_ids"]} if prev else {}
+            chunks = split_document(source, text, settings)
+            files[source] = {**entry, "chunk_ids": [chunk["id"] for chunk in chunks]}
+            for chunk in chunks:
+                row = by_text.get(chunk["text"])
+                records.append(chunk)
+                sources.append(row)
+                if row is None:
+                    report.embedded += 1
+                    yield chunk["text"]
+                else:
+                    report.reused += 1
+
+    pipeline = EmbeddingPipeline(get_ollama_client(base_url), model, batch_size, concurrency, cache)
+    embeddings = asyncio.run(_embed_all(pipeline, pending()))
+    report.meter = pipeline.meter
+    report.removed = len(set(old_files) - set(files))
+    report.stale = len(old_rows) - len({row for row in sources if row is not None})
+    if previous is not None and not report.needs_save:
+        return report
+
+    dimension = embeddings.shape[1] if len(embeddings) else (previous.manifest.dimension if previous else 0)
+    vectors = np.zeros((len(records), dimension), dtype=np.float32)
+    kept = [i for i, row in enumerate(sources) if row is not None]
+    if kept:
+        vectors[kept] = previous.vectors[[sources[i] for i in kept]]
+    new = [i for i, row in enumerate(sources) if row is None]
+    if new:
+        vectors[new] = embeddings
+    store = VectorStore.from_embeddings(model, settings.as_dict(), records, vectors, files)
+    store.save(index_path)
+    report.saved = True
+    return report
+
+
+async def _embed_all(pipeline: EmbeddingPipeline, texts) -> np.ndarray:
+    try:
+        return await pipeline.embed(texts)
+    finally:
+        await pipeline.client.aclose()
+
+
+def watch(root: str, index_path: str, model: str, interval: float = 5.0,
+          stop_event: threading.Event | None = None, on_report=None, on_error=None, **kwargs):
+    """
+    Modo vigilancia por sondeo: cada `interval` segundos compara mtime y tamaño de los documentos
+    (solo stat, sin leerlos) y lanza una ingesta incremental cuando algo cambió. Si una ingesta
+    falla (Ollama caído...) se avisa y se reintenta en la siguiente comprobación.
+    """
+    stop_event = stop_event or threading.Event()
+    last = None
+    while not stop_event.is_set():
+        current = snapshot(root)
+        if current != last:
+            try:
+                report = ingest(root, index_path, model, **kwargs)
+            except Exception as e:
+                if on_error:
+                    on_error(e)
+                else:
+                    print(f"❌ Error en la ingesta (se reintenta en {interval:g}s): {e}", file=sys.stderr)
+                stop_event.wait(interval)
+                continue
+            if on_report:
+                on_report(report)
+            else:
+                print(report.format())
+            last = current
+        stop_event.wait(interval)
@@ -0,0 +1,194 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/pipeline.py
+import asyncio
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from agents.herramientas.vectorial.embedding_cache import EmbeddingCache, normalize_text
+from core.endpoints import is_host_failure
+
+DEFAULT_TUNING_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tron", "embed_tuning.json")
+TUNE_BATCH_SIZES = (8, 16, 32, 64, 128, 256)
+TUNE_CONCURRENCY = (1, 2, 4, 8)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Red caída, 5xx o 429 (Ollama ocupado): se reintenta; el resto (modelo inexistente...) no."""
+    return is_host_failure(error) or getattr(error, "status_code", None) == 429
+
+
+class ThroughputMeter:
+    """Chunks y tokens por segundo de una ingesta (tokens según el prompt_eval_count de Ollama)."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.chunks = 0
+        self.cached = 0
+        self.tokens = 0
+        self.requests = 0
+        self.retries = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+    def format(self) -> str:
+        return (f"🧮 {self.chunks} chunks ({self.chunks_per_s:.1f}/s), {self.tokens} tokens "
+                f"({self.tokens_per_s:.0f}/s), {self.requests} peticiones, {self.retries} reintentos, "
+                f"{self.cached} de caché, {self.elapsed:.1f}s")
+
+
+class EmbeddingPipeline:
+    """
+    Etapa de embeddings de la ingesta: agrupa los chunks en lotes de `batch_size` para /api/embed
+    y mantiene como mucho `concurrency` peticiones en vuelo. El troceador se consume según hay
+    hueco en una cola acotada (contrapresión: no se trocea el corpus entero antes de embeber).
+    Los fallos de red, 5xx y 429 se reintentan con backoff exponencial; con `cache`, cada lote
+    solo pide a Ollama los textos que no estaban ya embebidos.
+    """
+
+    def __init__(self, client, model: str, batch_size: int = 32, concurrency: int = 2,
+                 cache: EmbeddingCache | None = None, max_retries: int = 4, backoff_s: float = 0.5,
+                 keep_alive: str | None = "10m"):
+        self.client = client  # OllamaClient
+        self.model = model
+        self.batch_size = max(batch_size, 1)
+        self.concurrency = max(concurrency, 1)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.keep_alive = keep_alive
+        self.meter = ThroughputMeter()
+
+    async def embed(self, texts) -> np.ndarray:
+        """Embeddings (float32) de los textos de un iterable, en el mismo orden."""
+        self.meter = ThroughputMeter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: dict[int, np.ndarray] = {}
+
+        async def produce():
+            batch, start = [], 0
+            for text in texts:
+                batch.append(text)
+                if len(batch) == self.batch_size:
+                    await queue.put((start, batch))
+                    start, batch = start + len(batch), []
+            if batch:
+                await queue.put((start, batch))
+
+        async def work():
+            while True:
+                start, batch = await queue.get()
+                try:
+                    results[start] = await self._embed_batch(batch)
+                finally:
+                    queue.task_done()
+
+        # Si un lote falla del todo el TaskGroup cancela el resto (y el troceador deja de avanzar)
+        try:
+            async with asyncio.TaskGroup() as group:
+                workers = [group.create_task(work()) for _ in range(self.concurrency)]
+                await produce()
+                await queue.join()
+                for worker in workers:
+                    worker.cancel()
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+        if not results:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate([results[start] for start in sorted(results)])
+
+    async def _embed_batch(self, batch: list[str]) -> np.ndarray:
+        vectors = self.cache.get_many(self.model, batch) if self.cache else [None] * len(batch)
+        self.meter.cached += sum(v is not None for v in vectors)
+        missing = list(dict.fromkeys(normalize_text(t) for t, v in zip(batch, vectors) if v is None))
+        if missing:
+            computed = np.asarray(await self._request(missing), dtype=np.float32)
+            if self.cache:
+                self.cache.put_many(self.model, missing, computed)
+            by_text = dict(zip(missing, computed))
+            vectors = [v if v is not None else by_text[normalize_text(t)] for t, v in zip(batch, vectors)]
+        self.meter.chunks += len(batch)
+        return np.stack(vectors)
+
+    async def _request(self, inputs: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                self.meter.requests += 1
+                response = await self.client.aembed(self.model, inputs, keep_alive=self.keep_alive)
+                self.meter.tokens += response.get("prompt_eval_count") or 0
+                return response["embeddings"]
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Backoff exponencial con jitter para no reintentar todos a la vez
+                await asyncio.sleep(self.backoff_s * 2 ** attempt * (0.5 + random.random()))
+                attempt += 1
+                self.meter.retries += 1
+
+
+async def tune(client, model: str, sample: list[str], batch_sizes=TUNE_BATCH_SIZES,
+               concurrencies=TUNE_CONCURRENCY, tolerance: float = 0.05) -> dict:
+    """
+    Busca el batch_size y la concurrencia con más chunks/s para este hardware embebiendo `sample`
+    (sin caché): primero el tamaño de lote con concurrencia 1 y luego la concurrencia con ese lote.
+    En cada eje se para en cuanto el rendimiento cae más de `tolerance` respecto al mejor.
+    """
+    await client.aembed(model, sample[:1], keep_alive="10m")  # carga el modelo fuera de la medida
+    trials = []
+
+    async def measure(batch_size, concurrency):
+        pipeline = EmbeddingPipeline(client, model, batch_size, concurrency)
+        await pipeline.embed(sample)
+        trial = {"batch_size": batch_size, "concurrency": concurrency,
+                 "chunks_per_s": pipeline.meter.chunks_per_s, "tokens_per_s": pipeline.meter.tokens_per_s}
+        trials.append(trial)
+        return trial
+
+    async def sweep(values, make_trial):
+        best = None
+        for value in values:
+            trial = await make_trial(value)
+            if best is None or trial["chunks_per_s"] > best["chunks_per_s"]:
+                best = trial
+            elif trial["chunks_per_s"] < best["chunks_per_s"] * (1 - tolerance):
+                break
+        return best
+
+    best = await sweep([b for b in batch_sizes if b <= max(len(sample), 1)] or [len(sample)],
+                       lambda b: measure(b, 1))
+    batch_size = best["batch_size"]
+    best = await sweep(concurrencies, lambda c: measure(batch_size, c))
+    return {**best, "model": model, "trials": trials}
+
+
+def load_tuning(model: str, base_url: str, path: str = DEFAULT_TUNING_PATH) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(f"{base_url}|{model}")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_tuning(model: str, base_url: str, result: dict, path: str = DEFAULT_TUNING_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        saved = {}
+    saved[f"{base_url}|{model}"] = {k: result[k] for k in ("batch_size", "concurrency", "chunks_per_s")}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2)
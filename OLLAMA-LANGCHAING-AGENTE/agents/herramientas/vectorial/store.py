@@ -0,0 +1,163 @@
+# OLLAMA-LANGCHAING-AGENTE/agents/herramientas/vectorial/store.py
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"
+RECORDS = "records.json"
+FILES = "files.json"
+
+
+class IndexMismatch(ValueError):
+    """El índice guardado se construyó con otro modelo de embeddings, dimensión, troceado o corpus."""
+
+
+def corpus_hash(records: list[dict]) -> str:
+    """Hash del contenido indexado, en orden: id y texto de cada chunk."""
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(record["id"].encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(record["text"].encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+@dataclass
+class IndexManifest:
+    """
+    Versión del índice: con qué se construyó y en qué carpeta de datos está.
+    Se escribe el último y con os.replace, así un lector ve el índice viejo o el nuevo, nunca uno a medias.
+    """
+    embedding_model: str
+    dimension: int
+    chunker: dict
+    corpus_hash: str
+    count: int
+    data_dir: str = ""
+    format_version: int = FORMAT_VERSION
+    created: float = field(default_factory=time.time)
+
+    def mismatches(self, embedding_model: str | None = None, dimension: int | None = None,
+                   chunker: dict | None = None, corpus: str | None = None) -> list[str]:
+        """Diferencias con lo esperado (solo se comprueba lo que se pasa)."""
+        expected = {"format_version": FORMAT_VERSION, "embedding_model": embedding_model,
+                    "dimension": dimension, "chunker": chunker, "corpus_hash": corpus}
+        return [f"{name}: índice {getattr(self, name)!r}, esperado {value!r}"
+                for name, value in expected.items() if value is not None and getattr(self, name) != value]
+
+
+class VectorStore:
+    """
+    Índice vectorial persistente (sustituye al FAISS.from_documents de OLD/rag_agent_poc.py, que
+    re-embebía todo el corpus en cada arranque). Los vectores se guardan normalizados en un .npy
+    que se carga con mmap: abrir el índice no lee la matriz, el sistema trae las páginas al buscar.
+    La búsqueda es por producto escalar (similitud coseno) sobre toda la matriz.
+    """
+
+    def __init__(self, manifest: IndexManifest, vectors: np.ndarray, records: list[dict], files: dict | None = None):
+        self.manifest = manifest
+        self.vectors = vectors
+        self.records = records  # {"id", "text", "source", ...} en el orden de las filas
+        self.files = files  # ruta -> {mtime_ns, size, sha256, chunk_ids} de la ingesta incremental
+
+    @classmethod
+    def from_embeddings(cls, embedding_model: str, chunker: dict, records: list[dict], embeddings,
+                        files: dict | None = None) -> "VectorStore":
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if len(records) != len(vectors):
+            raise ValueError(f"{len(records)} chunks pero {len(vectors)} embeddings")
+        dimension = vectors.shape[1] if vectors.ndim == 2 else 0
+        manifest = IndexManifest(embedding_model, dimension, dict(chunker), corpus_hash(records), len(records))
+        return cls(manifest, vectors, records, files)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def save(self, path: str):
+        """
+        Escribe una carpeta de datos nueva y después cambia el manifiesto de forma atómica.
+        Se conserva la versión anterior (un lector que ya leyó el manifiesto viejo aún no ha
+        abierto sus archivos); las más antiguas se borran.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = self.read_manifest(path)
+        data_dir = f"data-{uuid.uuid4().hex[:12]}"
+        target = os.path.join(path, data_dir)
+        os.makedirs(target)
+        np.save(os.path.join(target, VECTORS), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(os.path.join(target, RECORDS), "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False)
+        if self.files is not None:
+            with open(os.path.join(target, FILES), "w", encoding="utf-8") as f:
+                json.dump(self.files, f, ensure_ascii=False)
+
+        manifest = IndexManifest(**{**asdict(self.manifest), "data_dir": data_dir, "created": time.time()})
+        _write_atomic(os.path.join(path, MANIFEST), json.dumps(asdict(manifest), indent=2, ensure_ascii=False))
+        self.manifest = manifest
+        keep = {data_dir, previous.data_dir if previous else None}
+        for entry in os.listdir(path):
+            if entry.startswith("data-") and entry not in keep:
+                shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+    @staticmethod
+    def read_manifest(path: str) -> IndexManifest | None:
+        try:
+            with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+                return IndexManifest(**json.load(f))
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, path: str, embedding_model: str | None = None, dimension: int | None = None,
+             chunker: dict | None = None, corpus: str | None = None, mmap: bool = True) -> "VectorStore":
+        """Abre el índice; IndexMismatch si no es compatible con lo esperado (mejor reconstruir que mezclar)."""
+        manifest = cls.read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"No hay índice en {path}")
+        problems = manifest.mismatches(embedding_model, dimension, chunker, corpus)
+        if problems:
+            raise IndexMismatch(f"Índice incompatible en {path}: " + "; ".join(problems))
+        target = os.path.join(path, manifest.data_dir)
+        vectors = np.load(os.path.join(target, VECTORS), mmap_mode="r" if mmap else None)
+        with open(os.path.join(target, RECORDS), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        try:
+            with open(os.path.join(target, FILES), "r", encoding="utf-8") as f:
+                files = json.load(f)
+        except FileNotFoundError:
+            files = None
+        return cls(manifest, vectors, records, files)
+
+    def search(self, query_vector, k: int = 4) -> list[tuple[float, dict]]:
+        """Los k chunks más parecidos como (similitud, registro), de mayor a menor."""
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+        if query.shape[0] != self.manifest.dimension:
+            raise IndexMismatch(f"Consulta de dimensión {query.shape[0]}, índice de {self.manifest.dimension}")
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.records[i]) for i in top]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True) if vectors.size else 1.0
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _write_atomic(path: str, content: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
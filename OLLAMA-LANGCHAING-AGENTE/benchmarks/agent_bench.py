@@ -0,0 +1,188 @@
+# OLLAMA-LANGCHAING-AGENTE/benchmarks/agent_bench.py
+"""
+Benchmarks de latencia del propio agente contra el Ollama simulado (sin GPU ni red).
+
+Mide el overhead de agents/general.py y core/, no la velocidad del modelo:
+  startup    arranque en frío de la CLI (python agents/general.py --help)
+  render     coste por chunk de pintar el streaming (y con una terminal lenta)
+  cancel     tiempo desde Ctrl+C (cancelación de la tarea) hasta liberar el stream
+  history    coste y tamaño del prompt por turno en una sesión larga
+  batch      throughput del modo lote según la concurrencia
+
+Uso:
+    python benchmarks/agent_bench.py [--only render cancel] [--json resultados.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langchain_core.messages import HumanMessage
+from langchain_ollama.chat_models import ChatOllama
+
+from benchmarks.fake_ollama import FakeOllama
+from core.batch import BatchRunner
+from core.engine import ChatStream, EngineRunner, print_stream
+from core.history import ConversationHistory, estimate_tokens
+
+MODEL = "gemma3:4b"
+PROMPT = [HumanMessage(content="Explica el benchmark")]
+
+
+def bench_startup(runner, repeat: int = 5) -> dict:
+    script = os.path.join(project_root, "agents", "general.py")
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, "--help"], capture_output=True, check=True)
+        walls.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(walls) * 1000, "min_ms": min(walls) * 1000}
+
+
+class SlowTerminal(io.StringIO):
+    """Terminal lenta (p. ej. SSH o un pipe con lector lento): cada write cuesta `delay` segundos."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+async def print_per_chunk(chat_stream, out) -> str:
+    # Pintado ingenuo de referencia: un write+flush por chunk en el propio bucle de lectura
+    async for text in chat_stream:
+        out.write(text)
+        out.flush()
+    return chat_stream.content
+
+
+def bench_render(runner, chunks: int = 2000, terminal_delay: float = 0.0005) -> dict:
+    with FakeOllama(tokens_per_reply=chunks) as server:
+        llm = ChatOllama(model=MODEL, base_url=server.base_url)
+        runner.run(ChatStream(llm, PROMPT).collect())  # calentar la conexión
+
+        start = time.perf_counter()
+        runner.run(ChatStream(llm, PROMPT).collect())
+        baseline = time.perf_counter() - start
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            runner.run(print_stream(ChatStream(llm, PROMPT)))
+            rendered = time.perf_counter() - start
+
+        start = time.perf_counter()
+        runner.run(print_per_chunk(ChatStream(llm, PROMPT), SlowTerminal(terminal_delay)))
+        slow_per_chunk = time.perf_counter() - start
+
+        with contextlib.redirect_stdout(SlowTerminal(terminal_delay)):
+            start = time.perf_counter()
+            runner.run(print_stream(ChatStream(llm, PROMPT)))
+            slow_frames = time.perf_counter() - start
+    return {"chunks": chunks, "read_us_per_chunk": baseline / chunks * 1e6,
+            "render_overhead_us_per_chunk": max(rendered - baseline, 0) / chunks * 1e6,
+            "slow_terminal_per_chunk_ms": slow_per_chunk * 1000,
+            "slow_terminal_frames_ms": slow_frames * 1000}
+
+
+def bench_cancel(runner, rounds: int = 5) -> dict:
+    client_ms, server_ms = [], []
+    with FakeOllama(token_rate=100, tokens_per_reply=10_000) as server:
+        llm = ChatOllama(model=MODEL, base_url=server.base_url)
+
+        async def cancel_after(delay):
+            task = asyncio.ensure_future(ChatStream(llm, PROMPT).collect())
+            await asyncio.sleep(delay)
+            cancelled_at = time.perf_counter()
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            return cancelled_at, time.perf_counter()
+
+        for _ in range(rounds):
+            server.last_cancel_at = None
+            cancelled_at, released_at = runner.run(cancel_after(0.2))[0]
+            client_ms.append((released_at - cancelled_at) * 1000)
+            # El servidor detecta el cierre al escribir el siguiente token
+            deadline = time.perf_counter() + 1.0
+            while server.last_cancel_at is None and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            if server.last_cancel_at is not None:
+                server_ms.append((server.last_cancel_at - cancelled_at) * 1000)
+    return {"client_release_ms_p50": statistics.median(client_ms),
+            "server_notice_ms_p50": statistics.median(server_ms) if server_ms else None}
+
+
+def bench_history(runner, turns: int = 200, budget: int = 3000) -> dict:
+    history = ConversationHistory(token_budget=budget)
+    sent_tokens, build_us = [], []
+    for i in range(turns):
+        start = time.perf_counter()
+        messages = history.messages()
+        build_us.append((time.perf_counter() - start) * 1e6)
+        sent_tokens.append(sum(estimate_tokens(m.content) for m in messages))
+        history.add_turn(f"pregunta {i} " + "x" * 600, f"respuesta {i} " + "y" * 1200)
+    return {"turns": turns, "prompt_tokens_turn_10": sent_tokens[10],
+            "prompt_tokens_last": sent_tokens[-1], "build_us_last": build_us[-1]}
+
+
+def bench_batch(runner, jobs: int = 32, levels=(1, 4, 8)) -> dict:
+    results = {}
+    with FakeOllama(token_rate=400, tokens_per_reply=40, parallel=4) as server:
+        llm = ChatOllama(model=MODEL, base_url=server.base_url)
+        for concurrency in levels:
+            model_info = {"provider": "ollama", "max_concurrency": concurrency}
+            batch = BatchRunner(lambda _: ("fake", model_info, llm), io.StringIO(), concurrency=concurrency)
+            work = [{"index": i, "prompt": f"evaluación {i}"} for i in range(jobs)]
+            start = time.perf_counter()
+            runner.run(batch.run(work, "fake"))
+            results[f"c{concurrency}_jobs_per_s"] = jobs / (time.perf_counter() - start)
+    return results
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "render": bench_render,
+    "cancel": bench_cancel,
+    "history": bench_history,
+    "batch": bench_batch,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de overhead del agente")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), default=None)
+    parser.add_argument("--json", type=str, default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    runner = EngineRunner()
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            results[name] = BENCHMARKS[name](runner)
+            print(f"\n[{name}]")
+            for key, value in results[name].items():
+                shown = f"{value:.2f}" if isinstance(value, float) else value
+                print(f"    {key:<32} {shown}")
+    finally:
+        runner.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# OLLAMA-LANGCHAING-AGENTE/benchmarks/fake_ollama.py
+"""
+Servidor de Ollama simulado y determinista, para tests y benchmarks sin GPU ni red.
+
+Implementa /api/chat, /api/generate, /api/embed, /api/tags, /api/version y la API compatible
+con OpenAI (/v1/chat/completions, SSE con usage) con:
+  - token_rate: tokens por segundo generados (0 = sin esperas)
+  - first_token_delay: espera antes del primer token (simula prompt eval)
+  - load_delay: espera la primera vez que se usa cada modelo (simula carga de pesos)
+  - failure_rate: probabilidad de responder 500 (semilla fija => determinista)
+  - parallel: generaciones simultáneas como OLLAMA_NUM_PARALLEL (0 = sin límite)
+
+Uso como script:
+    python benchmarks/fake_ollama.py --port 11434 --token-rate 50 --load-delay 2
+Uso en código:
+    with FakeOllama(token_rate=0) as server:
+        client = OllamaClient(server.base_url)
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_tokens(prompt: str, count: int) -> list[str]:
+    """Tokens deterministas derivados del prompt."""
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return [f"{seed[i % len(seed)]}{i} " for i in range(count)]
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    """Vector determinista y normalizado a partir del hash del texto."""
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2**31 for v in struct.unpack("<8i", digest))
+        counter += 1
+    values = values[:dim]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class FakeOllama:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token_rate: float = 0.0,
+                 first_token_delay: float = 0.0, load_delay: float = 0.0, failure_rate: float = 0.0,
+                 parallel: int = 0, tokens_per_reply: int = 32, embedding_dim: int = 64,
+                 models: tuple[str, ...] = ("gemma3:4b",), seed: int = 0):
+        self.token_rate = token_rate
+        self.first_token_delay = first_token_delay
+        self.load_delay = load_delay
+        self.failure_rate = failure_rate
+        self.tokens_per_reply = tokens_per_reply
+        self.embedding_dim = embedding_dim
+        self.models = list(models)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._slots = threading.Semaphore(parallel) if parallel else None
+        self._loaded: set[str] = set()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "connections": 0, "cancelled": 0, "failures": 0, "loads": 0}
+        self.active: dict[str, int] = {}  # generaciones en curso por modelo
+        self.peak_active: dict[str, int] = {}  # máximo simultáneo visto por modelo
+        self.last_cancel_at: float | None = None  # perf_counter() al detectar la desconexión
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def track(self, model: str, delta: int):
+        with self._stats_lock:
+            self.active[model] = self.active.get(model, 0) + delta
+            self.peak_active[model] = max(self.peak_active.get(model, 0), self.active[model])
+
+    def should_fail(self) -> bool:
+        if not self.failure_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.failure_rate
+
+    def ensure_loaded(self, model: str) -> int:
+        """Simula la carga de pesos; devuelve load_duration en ns."""
+        with self._stats_lock:
+            first_use = model not in self._loaded
+            self._loaded.add(model)
+        if first_use and self.load_delay:
+            self.count("loads")
+            time.sleep(self.load_delay)
+            return int(self.load_delay * 1e9)
+        return 0
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                fake.count("connections")
+
+            # --- utilidades de respuesta ---
+            def send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def start_chunked(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def write_chunk(self, body: dict):
+                self.write_raw(json.dumps(body).encode("utf-8") + b"\n")
+
+            def write_event(self, body: dict | str):
+                data = body if isinstance(body, str) else json.dumps(body)
+                self.write_raw(f"data: {data}\n\n".encode("utf-8"))
+
+            def write_raw(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def end_chunked(self):
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def read_json(self) -> dict:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            # --- endpoints ---
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self.send_json(200, {"models": [{"name": m, "model": m} for m in fake.models]})
+                elif self.path == "/api/version":
+                    self.send_json(200, {"version": "0.0.0-fake"})
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                fake.count("requests")
+                body = self.read_json()
+                model = body.get("model")
+                if self.path not in ("/api/chat", "/api/generate", "/api/embed", "/v1/chat/completions"):
+                    self.send_json(404, {"error": "not found"})
+                    return
+                if model not in fake.models:
+                    self.send_json(404, {"error": f"model '{model}' not found"})
+                    return
+                if fake.should_fail():
+                    fake.count("failures")
+                    self.send_json(500, {"error": "fallo inyectado"})
+                    return
+                if self.path == "/api/embed":
+                    self.embed(body)
+                elif self.path == "/v1/chat/completions":
+                    self.openai_chat(body)
+                else:
+                    self.generate(body, chat=self.path == "/api/chat")
+
+            def embed(self, body: dict):
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                load_ns = fake.ensure_loaded(body["model"])
+                self.send_json(200, {
+                    "model": body["model"],
+                    "embeddings": [fake_embedding(text, fake.embedding_dim) for text in inputs],
+                    "load_duration": load_ns,
+                    "prompt_eval_count": sum(len(text.split()) for text in inputs),
+                })
+
+            def generate(self, body: dict, chat: bool):
+                if chat:
+                    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+                else:
+                    prompt = body.get("prompt", "")
+                stream = body.get("stream", True)
+                load_ns = fake.ensure_loaded(body["model"])
+
+                # Petición de precarga: sin mensajes/prompt no se generan tokens
+                if not prompt:
+                    self.send_json(200, {"model": body["model"], "done": True, "done_reason": "load",
+                                         "load_duration": load_ns})
+                    return
+
+                count = (body.get("options") or {}).get("num_predict") or fake.tokens_per_reply
+                tokens = fake_tokens(prompt, count)
+                if fake._slots:
+                    fake._slots.acquire()
+                fake.track(body["model"], 1)
+                try:
+                    self.emit(body, chat, tokens, prompt, stream, load_ns)
+                finally:
+                    fake.track(body["model"], -1)
+                    if fake._slots:
+                        fake._slots.release()
+
+            def emit(self, body, chat, tokens, prompt, stream, load_ns):
+                start = time.perf_counter()
+                if fake.first_token_delay:
+                    time.sleep(fake.first_token_delay)
+                prompt_eval_ns = int((time.perf_counter() - start) * 1e9)
+                interval = 1.0 / fake.token_rate if fake.token_rate else 0.0
+
+                def piece(text, done):
+                    base = {"model": body["model"], "done": done}
+                    if chat:
+                        base["message"] = {"role": "assistant", "content": text}
+                    else:
+                        base["response"] = text
+                    return base
+
+                def final_counters(eval_start):
+                    return {
+                        "done_reason": "stop",
+                        "total_duration": int((time.perf_counter() - start) * 1e9) + load_ns,
+                        "load_duration": load_ns,
+                        "prompt_eval_count": len(prompt.split()),
+                        "prompt_eval_duration": prompt_eval_ns,
+                        "eval_count": len(tokens),
+                        "eval_duration": int((time.perf_counter() - eval_start) * 1e9),
+                    }
+
+                if not stream:
+                    eval_start = time.perf_counter()
+                    time.sleep(interval * len(tokens))
+                    self.send_json(200, {**piece("".join(tokens), True), **final_counters(eval_start)})
+                    return
+
+                self.start_chunked()
+                eval_start = time.perf_counter()
+                try:
+                    for token in tokens:
+                        if interval:
+                            time.sleep(interval)
+                        self.write_chunk(piece(token, False))
+                    self.write_chunk({**piece("", True), **final_counters(eval_start)})
+                    self.end_chunked()
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente cerró la conexión: cancelación
+                    fake.last_cancel_at = time.perf_counter()
+                    fake.count("cancelled")
+                    self.close_connection = True
+
+            def openai_chat(self, body: dict):
+                prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+                fake.ensure_loaded(body["model"])
+                tokens = fake_tokens(prompt, body.get("max_tokens") or fake.tokens_per_reply)
+                usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                         "total_tokens": len(prompt.split()) + len(tokens)}
+                if fake._slots:
+                    fake._slots.acquire()
+                try:
+                    self.emit_openai(body, tokens, usage)
+                finally:
+                    if fake._slots:
+                        fake._slots.release()
+
+            def emit_openai(self, body, tokens, usage):
+                if fake.first_token_delay:
+                    time.sleep(fake.first_token_delay)
+                interval = 1.0 / fake.token_rate if fake.token_rate else 0.0
+                base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body["model"]}
+
+                if not body.get("stream"):
+                    time.sleep(interval * len(tokens))
+                    message = {"role": "assistant", "content": "".join(tokens)}
+                    self.send_json(200, {**base, "object": "chat.completion", "usage": usage,
+                                         "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+                    return
+
+                def event(delta: dict, finish_reason=None) -> dict:
+                    return {**base, "object": "chat.completion.chunk",
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    self.write_event(event({"role": "assistant", "content": ""}))
+                    for token in tokens:
+                        if interval:
+                            time.sleep(interval)
+                        self.write_event(event({"content": token}))
+                    self.write_event(event({}, "stop"))
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        self.write_event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+                    self.write_event("[DONE]")
+                    self.end_chunked()
+                except (BrokenPipeError, ConnectionResetError):
+                    fake.last_cancel_at = time.perf_counter()
+                    fake.count("cancelled")
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de Ollama simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.1)
+    parser.add_argument("--load-delay", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=0)
+    parser.add_argument("--models", nargs="*", default=["gemma3:4b"])
+    args = parser.parse_args()
+
+    server = FakeOllama(args.host, args.port, token_rate=args.token_rate,
+                        first_token_delay=args.first_token_delay, load_delay=args.load_delay,
+                        failure_rate=args.failure_rate, parallel=args.parallel, models=tuple(args.models))
+    print(f"Fake Ollama escuchando en {server.base_url} (Ctrl+C para salir)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
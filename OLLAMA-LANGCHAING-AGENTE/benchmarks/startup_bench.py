@@ -0,0 +1,94 @@
+# OLLAMA-LANGCHAING-AGENTE/benchmarks/startup_bench.py
+"""
+Benchmark de arranque en frío por proveedor.
+
+Para cada proveedor de config/models.yaml lanza un intérprete nuevo con
+`python -X importtime`, importa agents/general.py y carga el primer modelo de ese
+proveedor con load_llm (construir el cliente no contacta al servidor).
+Reporta el tiempo total de pared (mediana de N repeticiones) y los paquetes de
+primer nivel con mayor tiempo de import acumulado.
+
+Uso:
+    python benchmarks/startup_bench.py [--repeat 5] [--top 8] [--providers ollama deepseek]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import yaml
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SNIPPET = (
+    "import sys; sys.path.insert(0, {agents!r}); import general; {load}"
+)
+
+
+def models_by_provider() -> dict[str, str]:
+    with open(os.path.join(project_root, "config", "models.yaml"), "r") as f:
+        configs = yaml.safe_load(f)
+    first = {}
+    for model in configs.get("models", []):
+        first.setdefault(model.get("provider"), model.get("id"))
+    return first
+
+
+def run_once(model_id: str | None) -> tuple[float, dict[str, int]]:
+    load = (f"assert general.load_llm({model_id!r}, general.load_model_configs())"
+            if model_id else "pass")
+    code = SNIPPET.format(agents=os.path.join(project_root, "agents"), load=load)
+    # Clave ficticia: construir ChatDeepSeek no hace ninguna llamada a la API
+    env = {**os.environ, "DEEPSEEK_API_KEY": os.getenv("DEEPSEEK_API_KEY", "benchmark")}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "error")
+    return wall, parse_importtime(proc.stderr)
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Tiempo acumulado (µs) de cada paquete de primer nivel importado."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Formato: "| <sangría de 2 espacios por nivel>nombre"; el primer nivel no lleva sangría
+        name = name[1:]
+        if name and not name.startswith(" "):
+            top = name.split(".")[0]
+            packages[top] = packages.get(top, 0) + int(cumulative)
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío por proveedor")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--providers", nargs="*", default=None)
+    args = parser.parse_args()
+
+    models = models_by_provider()
+    targets = [(None, None)] + [(p, models[p]) for p in (args.providers or models) if p in models]
+    for provider, model_id in targets:
+        label = f"{provider} ({model_id})" if provider else "(sin proveedor)"
+        try:
+            runs = [run_once(model_id) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"\n{label}: ❌ {e}")
+            continue
+        walls = [wall for wall, _ in runs]
+        packages = runs[-1][1]
+        print(f"\n{label}: mediana {statistics.median(walls) * 1000:.0f} ms "
+              f"(min {min(walls) * 1000:.0f} ms, {args.repeat} ejecuciones)")
+        for name, micros in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {name:<28} {micros / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
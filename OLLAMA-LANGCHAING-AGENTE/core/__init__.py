@@ -0,0 +1,2 @@
+# OLLAMA-LANGCHAING-AGENTE/core/__init__.py
+# Kernel del agente: clientes HTTP, motor de streaming y utilidades compartidas.
@@ -0,0 +1,206 @@
+# OLLAMA-LANGCHAING-AGENTE/core/batch.py
+import asyncio
+import json
+import os
+import time
+from contextlib import aclosing
+
+from core.context_window import ContextSizer
+from core.engine import ChatStream, continue_messages
+from core.metrics import TurnMetrics, describe_llm
+from core.prompt import PromptAssembler
+from core.scheduler import PriorityScheduler
+
+
+def read_jobs(path: str) -> list[dict]:
+    """
+    Lee un JSONL de peticiones: {"prompt": ..., "system_prompt": ..., "model": ..., "priority": ...}.
+    Solo "prompt" es obligatorio. El índice de cada trabajo es su posición en el archivo.
+    """
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: JSON inválido ({e})")
+            if not isinstance(job, dict) or not job.get("prompt"):
+                raise ValueError(f"{path}:{line_number}: falta el campo 'prompt'")
+            job["index"] = len(jobs)
+            jobs.append(job)
+    return jobs
+
+
+def completed_indices(output_path: str | None) -> set[int]:
+    """Índices ya resueltos sin error en una salida previa (para reanudar)."""
+    done = set()
+    if not output_path or not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # línea truncada por una interrupción
+            if "error" not in result and "index" in result:
+                done.add(result["index"])
+    return done
+
+
+def pending_jobs(jobs: list[dict], output_path: str | None, resume: bool) -> list[dict]:
+    """Trabajos que faltan: con resume se omiten los ya resueltos sin error en output_path."""
+    skip = completed_indices(output_path) if resume else set()
+    return [job for job in jobs if job["index"] not in skip]
+
+
+def provider_concurrency(model_info: dict) -> int:
+    """
+    Límite de peticiones simultáneas por modelo: `max_concurrency` en models.yaml o,
+    para Ollama, el OLLAMA_NUM_PARALLEL del servidor.
+    """
+    if model_info.get("max_concurrency"):
+        return int(model_info["max_concurrency"])
+    if model_info.get("provider") == "ollama":
+        return int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+    return 4
+
+
+class RateLimiter:
+    """Espacia los inicios de petición para no superar `rpm` peticiones por minuto."""
+
+    def __init__(self, rpm: int | None):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class _Gated:
+    """
+    Stream que, ya con el hueco del modelo, espera una plaza global y el rate limit antes de
+    generar: un trabajo que espera a un modelo saturado no ocupa la plaza de otro proveedor.
+    Conserva `resumable` del stream que envuelve para que el planificador sepa si puede expulsarlo.
+    """
+
+    def __init__(self, stream, limit: asyncio.Semaphore, rate_limiter: RateLimiter, on_start):
+        self.stream = stream
+        self.limit = limit
+        self.rate_limiter = rate_limiter
+        self.on_start = on_start
+        self.resumable = getattr(stream, "resumable", False)
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def _generate(self):
+        async with self.limit:
+            await self.rate_limiter.wait()
+            self.on_start()
+            async with aclosing(aiter(self.stream)) as chunks:
+                async for text in chunks:
+                    yield text
+
+
+class BatchRunner:
+    """
+    Reparte los trabajos con un límite global de concurrencia y los huecos de cada modelo del
+    planificador de prioridades (core/scheduler.py), y escribe cada resultado como una línea
+    JSONL en orden de finalización. Cada trabajo usa su campo "priority" o la del lote; con
+    `preempt` en el planificador, uno de más prioridad puede expulsar a otro, que vuelve a la
+    cola y continúa desde lo ya generado.
+    """
+
+    def __init__(self, resolve_model, sink, concurrency: int = 4, metrics=None, cache=None, coalescer=None,
+                 scheduler: PriorityScheduler = None, priority: str = "normal"):
+        # resolve_model(identificador) -> (model_id, model_info, llm)
+        self.resolve_model = resolve_model
+        self.sink = sink
+        self.metrics = metrics  # MetricsRecorder opcional
+        self.cache = cache  # ResponseCache opcional
+        self.coalescer = coalescer  # SingleFlight opcional: los prompts repetidos generan una vez
+        # Todos los trabajos se encolan a la vez: sin tope de espera salvo el que traiga el planificador
+        self.scheduler = scheduler or PriorityScheduler(max_waiting=float("inf"))
+        self.priority = priority
+        self.global_limit = asyncio.Semaphore(concurrency)
+        self._models: dict[str, tuple] = {}
+        self.completed = 0
+        self.failed = 0
+
+    def _model_slot(self, identifier: str):
+        if identifier not in self._models:
+            try:
+                model_id, model_info, llm = self.resolve_model(identifier)
+            except Exception as e:
+                # Se recuerda el fallo: un modelo inválido no se vuelve a cargar (ni a avisar) en cada trabajo
+                self._models[identifier] = e
+                raise
+            self.scheduler.register(model_id, provider_concurrency(model_info))
+            self._models[identifier] = (
+                model_id, model_info, llm,
+                RateLimiter(model_info.get("rate_limit_rpm")),
+                ContextSizer.from_model_info(model_info),
+            )
+        slot = self._models[identifier]
+        if isinstance(slot, Exception):
+            raise slot
+        return slot
+
+    async def run(self, jobs: list[dict], default_model: str):
+        await asyncio.gather(*(self._run_job(job, job.get("model") or default_model) for job in jobs))
+
+    async def _run_job(self, job: dict, identifier: str):
+        result = {"index": job["index"], "model": identifier}
+        try:
+            model_id, model_info, llm, rate_limiter, sizer = self._model_slot(identifier)
+            result["model"] = model_id
+            messages = PromptAssembler(job.get("system_prompt")).build([], job["prompt"])
+            chat_stream, start = None, None
+
+            def mark_start():
+                nonlocal start
+                start = start or time.perf_counter()
+
+            def make_stream(prefix: str = ""):
+                # Con prefijo (tras una expulsión) se continúa la respuesta ya generada
+                nonlocal chat_stream
+                request_messages = continue_messages(messages, prefix)
+                options = sizer.options_for(request_messages) if sizer else None
+                if self.cache:
+                    source = self.cache.stream(model_id, model_info, llm, request_messages, options)
+                else:
+                    source = ChatStream(llm, request_messages, options)
+                chat_stream = source
+                if self.coalescer and not source.cached:
+                    chat_stream = self.coalescer.stream(model_id, model_info, llm, request_messages, options,
+                                                        make_source=lambda: source)
+                if chat_stream.cached or getattr(chat_stream, "coalesced", False):
+                    # Un acierto de caché o una generación compartida no consume hueco, cupo ni rate limit
+                    mark_start()
+                    return chat_stream
+                return _Gated(chat_stream, self.global_limit, rate_limiter, mark_start)
+
+            result["content"] = await self.scheduler.run_stream(model_id, make_stream,
+                                                                priority=job.get("priority") or self.priority)
+            if chat_stream.cached or getattr(chat_stream, "coalesced", False):
+                result["cached" if chat_stream.cached else "coalesced"] = True
+            result["elapsed_s"] = round(time.perf_counter() - start, 3)
+            if self.metrics:
+                self.metrics.record(TurnMetrics.from_stream(chat_stream, *describe_llm(llm)))
+            self.completed += 1
+        except Exception as e:
+            result["error"] = str(e)
+            self.failed += 1
+        self.sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.sink.flush()
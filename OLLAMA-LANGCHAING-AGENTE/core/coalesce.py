@@ -0,0 +1,207 @@
+# OLLAMA-LANGCHAING-AGENTE/core/coalesce.py
+import asyncio
+import time
+
+from core.engine import ChatStream, can_continue
+from core.ollama_client import RequestTimings
+from core.response_cache import cache_key
+from core.scheduler import SlotLost, current_lease
+
+# Atributos del llm que cambian la respuesta además del `config` de models.yaml
+_GENERATION_ATTRS = ("temperature", "num_predict", "max_tokens", "num_ctx")
+
+
+def coalesce_key(model_id: str, model_info: dict | None, llm, messages, options: dict | None = None) -> str:
+    config = dict((model_info or {}).get("config", {}))
+    config.update({attr: getattr(llm, attr) for attr in _GENERATION_ATTRS if getattr(llm, attr, None) is not None})
+    return cache_key(model_id, config, messages, options)
+
+
+class _Flight:
+    """Una generación en curso y los chunks que lleva, compartidos por todos sus suscriptores."""
+
+    def __init__(self, key: str, source, on_done, owner=None):
+        self.key = key
+        self.source = source
+        self.owner = owner  # el SharedStream cuyo hueco del planificador ocupa la generación
+        self.chunks: list[str] = []
+        self.done = False
+        self.aborted = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._on_done = on_done
+        self._task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    def attach(self):
+        self.subscribers += 1
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._produce())
+
+    def detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            # Nadie la espera ya: se cancela de verdad (y se cierra la conexión al backend)
+            self._task.cancel()
+
+    def abort(self):
+        """Cancela la generación aunque queden suscriptores: reciben SlotLost y piden su propio hueco."""
+        self.aborted = True
+        if self._task is not None and not self.done:
+            self._task.cancel()
+
+    async def wait(self):
+        await self._changed.wait()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _produce(self):
+        try:
+            async for text in self.source:
+                self.chunks.append(text)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, (Exception, asyncio.CancelledError)):
+                raise
+        finally:
+            self.done = True
+            self._on_done(self)
+            self._notify()
+
+
+class SharedStream:
+    """
+    Suscripción a una generación compartida, con la interfaz de ChatStream. Quien llega tarde
+    recibe primero el prefijo ya generado y después los chunks según llegan. Cancelarla solo
+    desengancha a este suscriptor; la generación se cancela cuando no queda ninguno.
+    Si el planificador expulsa al dueño del hueco, la generación se aborta: sin hueco no puede
+    seguir ocupando el modelo, y los demás suscriptores reciben SlotLost para volver a la cola
+    (PriorityScheduler.run_stream continúa desde lo que cada uno ya recibió).
+    """
+
+    cached = False
+
+    def __init__(self, single_flight: "SingleFlight", key: str, make_source, messages, options: dict | None,
+                 flight: _Flight | None = None, resumable: bool = False):
+        self._single_flight = single_flight
+        self._key = key
+        self._make_source = make_source
+        # Se unió a una generación que ya estaba en curso: no ocupa hueco en el modelo
+        self.coalesced = flight is not None
+        self.messages = messages
+        self.options = dict(options or {})
+        self.flight = flight
+        self.resumable = resumable  # el dueño del hueco se puede expulsar (ver engine.can_continue)
+        self.chunks: list[str] = []
+        self.chunk_times: list[float] = []
+        self.timings = RequestTimings()
+
+    @property
+    def llm(self):
+        return self.flight.source.llm if self.flight else None
+
+    @property
+    def final(self):
+        return self.flight.source.final if self.flight else None
+
+    @property
+    def usage(self):
+        return self.flight.source.usage if self.flight else None
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def collect(self) -> str:
+        async for _ in self:
+            pass
+        return self.content
+
+    async def _generate(self):
+        start = time.perf_counter()
+        if self.flight is not None and isinstance(self.flight.error, asyncio.CancelledError):
+            # La cancelaron antes de que llegáramos; nos enganchamos sin hueco, así que hay que pedir uno
+            raise SlotLost()
+        if self.flight is None:
+            self.flight = self._single_flight._join(self._key, self._make_source, self)
+        self.flight.attach()
+        try:
+            while True:
+                while len(self.chunks) < len(self.flight.chunks):
+                    text = self.flight.chunks[len(self.chunks)]
+                    elapsed = time.perf_counter() - start
+                    if self.timings.ttft_s is None:
+                        self.timings.ttft_s = elapsed
+                    self.chunk_times.append(elapsed)
+                    self.chunks.append(text)
+                    yield text
+                if self.flight.done:
+                    if self.flight.aborted:
+                        raise SlotLost()
+                    if self.flight.error is not None:
+                        raise self.flight.error
+                    return
+                await self.flight.wait()
+        finally:
+            lease = current_lease.get()
+            if self.flight.owner is self and lease is not None and lease.preempted:
+                self.flight.abort()
+            self.flight.detach()
+            self.timings.total_s = time.perf_counter() - start
+
+
+class SingleFlight:
+    """
+    Une las peticiones idénticas simultáneas (mismo modelo, configuración, opciones y mensajes)
+    en una sola generación. Solo con temperature == 0 salvo `allow_nondeterministic`: con
+    muestreo, dos peticiones iguales deberían poder dar respuestas distintas.
+    Una vez terminada la generación, la siguiente petición igual genera de nuevo (eso es cosa
+    de la caché de respuestas).
+    """
+
+    def __init__(self, allow_nondeterministic: bool = False):
+        self.allow_nondeterministic = allow_nondeterministic
+        self._flights: dict[str, _Flight] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "bypassed": 0}
+
+    def coalescable(self, llm) -> bool:
+        return self.allow_nondeterministic or getattr(llm, "temperature", None) == 0
+
+    def stream(self, model_id: str, model_info: dict | None, llm, messages, options: dict | None = None,
+               make_source=None):
+        """
+        Stream compartido para la petición. `make_source()` crea la generación real (por defecto
+        un ChatStream) y solo se llama si no hay ya una igual en curso.
+        """
+        make_source = make_source or (lambda: ChatStream(llm, messages, options))
+        if not self.coalescable(llm):
+            self.stats["bypassed"] += 1
+            return make_source()
+        key = coalesce_key(model_id, model_info, llm, messages, options)
+        # Con una generación igual ya en marcha se engancha a ella; si no, la crea al empezar a
+        # iterar (así quien espera hueco en el planificador todavía no cuenta como en curso)
+        flight = self._flights.get(key)
+        self.stats["coalesced" if flight else "leaders"] += 1
+        return SharedStream(self, key, make_source, messages, options, flight, can_continue(llm))
+
+    def _join(self, key: str, make_source, owner=None) -> _Flight:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key, make_source(), self._finished, owner)
+            self._flights[key] = flight
+        return flight
+
+    def _finished(self, flight: _Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (f"Coalescencia: {s['coalesced']} peticiones unidas a {s['leaders']} generaciones, "
+                f"{s['bypassed']} sin unir (temperature > 0)")
@@ -0,0 +1,90 @@
+# OLLAMA-LANGCHAING-AGENTE/core/context_window.py
+from core.history import estimate_tokens
+
+# Valores por defecto si el modelo no define su bloque `context` en models.yaml
+DEFAULT_BUCKETS = (2048, 4096, 8192)
+DEFAULT_EXPECTED_OUTPUT = 512
+DEFAULT_SHRINK_AFTER = 8
+
+
+class ContextSizer:
+    """
+    Elige el num_ctx de cada petición a Ollama entre un conjunto fijo de buckets.
+    Ollama reserva la KV cache según num_ctx y recarga el modelo cuando cambia, así que:
+      - se sube de bucket en cuanto prompt + salida esperada no caben;
+      - se baja solo tras `shrink_after` peticiones seguidas que caben en uno menor.
+    Lleva la cuenta de los cambios de bucket y del tiempo de recarga que provocan.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, expected_output: int = DEFAULT_EXPECTED_OUTPUT,
+                 shrink_after: int = DEFAULT_SHRINK_AFTER):
+        if not buckets:
+            raise ValueError("context.buckets no puede estar vacío")
+        self.buckets = sorted(int(b) for b in buckets)
+        self.expected_output = expected_output
+        self.shrink_after = shrink_after
+        self.current: int | None = None
+        self._smaller_streak = 0
+        self._changed = False  # la última elección cambió de bucket
+        self.stats = {"requests": 0, "changes": 0, "overflows": 0, "reload_s": 0.0, "by_bucket": {}}
+
+    @classmethod
+    def from_model_info(cls, model_info: dict | None):
+        """ContextSizer del bloque `context` del modelo, o None si no lo define."""
+        settings = (model_info or {}).get("context")
+        if not settings:
+            return None
+        return cls(buckets=settings.get("buckets", DEFAULT_BUCKETS),
+                   expected_output=settings.get("expected_output", DEFAULT_EXPECTED_OUTPUT),
+                   shrink_after=settings.get("shrink_after", DEFAULT_SHRINK_AFTER))
+
+    @property
+    def initial(self) -> int:
+        """Bucket con el que precargar el modelo (el que se usará si nada lo obliga a cambiar)."""
+        return self.current or self.buckets[0]
+
+    def needed_tokens(self, messages) -> int:
+        return sum(estimate_tokens(m.content) for m in messages) + self.expected_output
+
+    def choose(self, messages) -> int:
+        needed = self.needed_tokens(messages)
+        fitting = next((b for b in self.buckets if b >= needed), None)
+        if fitting is None:
+            # Ni el bucket mayor alcanza: Ollama truncará el principio del prompt
+            self.stats["overflows"] += 1
+            fitting = self.buckets[-1]
+
+        chosen = self.current or fitting
+        if fitting > chosen:
+            chosen = fitting
+            self._smaller_streak = 0
+        elif fitting < chosen:
+            self._smaller_streak += 1
+            if self._smaller_streak >= self.shrink_after:
+                chosen = fitting
+                self._smaller_streak = 0
+        else:
+            self._smaller_streak = 0
+
+        self._changed = self.current is not None and chosen != self.current
+        if self._changed:
+            self.stats["changes"] += 1
+        self.current = chosen
+        self.stats["requests"] += 1
+        self.stats["by_bucket"][chosen] = self.stats["by_bucket"].get(chosen, 0) + 1
+        return chosen
+
+    def options_for(self, messages) -> dict:
+        return {"num_ctx": self.choose(messages)}
+
+    def observe(self, final: dict | None):
+        """Suma el load_duration de Ollama cuando la petición anterior cambió de bucket."""
+        if self._changed and final and final.get("load_duration"):
+            self.stats["reload_s"] += final["load_duration"] / 1e9
+
+    def format_stats(self) -> str:
+        s = self.stats
+        buckets = ", ".join(f"{b}: {n}" for b, n in sorted(s["by_bucket"].items())) or "-"
+        return (f"Contexto: num_ctx {self.current or '-'} | cambios de bucket {s['changes']} "
+                f"en {s['requests']} peticiones (recarga {s['reload_s']:.2f} s) | "
+                f"desbordes {s['overflows']} | uso {buckets}")
@@ -0,0 +1,164 @@
+# OLLAMA-LANGCHAING-AGENTE/core/daemon.py
+import asyncio
+import os
+import socket
+
+from core.batch import provider_concurrency
+from core.context_window import ContextSizer
+from core.daemon_protocol import decode, encode
+from core.engine import ChatStream, continue_messages
+from core.metrics import TurnMetrics, describe_llm
+from core.prompt import PromptAssembler
+from core.scheduler import DEFAULT_MAX_QUEUE, PriorityScheduler
+from core.server import run_until_disconnect
+
+
+def socket_in_use(path: str) -> bool:
+    """True si hay un proceso escuchando en el socket (no solo un archivo huérfano)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+class AgentDaemon:
+    """
+    Demonio residente para las llamadas one-shot: mantiene cargados el registro de modelos,
+    los clientes HTTP y los ContextSizer, y responde por un socket unix (ver core/daemon_protocol.py).
+    Puede compartir el planificador de prioridades con el servidor HTTP (core/scheduler.py).
+    Si el planificador expulsa una petición, al volver a tener hueco continúa desde el último chunk enviado.
+    """
+
+    def __init__(self, resolve_model, default_model: str | None = None, metrics=None, cache=None,
+                 max_queue: int | None = None, scheduler: PriorityScheduler = None, coalescer=None):
+        # resolve_model(identificador) -> (model_id, model_info, llm) o None si no existe
+        self.resolve_model = resolve_model
+        self.default_model = default_model
+        self.metrics = metrics  # MetricsRecorder opcional
+        self.cache = cache  # ResponseCache opcional
+        if scheduler is not None and max_queue is not None:
+            raise ValueError("max_queue no se aplica a un planificador compartido; pásalo a PriorityScheduler")
+        self.scheduler = scheduler or PriorityScheduler(DEFAULT_MAX_QUEUE if max_queue is None else max_queue)
+        self.coalescer = coalescer  # SingleFlight opcional
+        self.stats = {"requests": 0, "cancelled": 0, "errors": 0}
+        self._sizers: dict[str, ContextSizer | None] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self.path: str | None = None
+
+    async def start(self, path: str):
+        if os.path.exists(path):
+            if socket_in_use(path):
+                raise RuntimeError(f"Ya hay un demonio escuchando en {path}")
+            os.unlink(path)  # socket de un demonio que no se cerró bien
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Solo el usuario que lo lanzó: el socket se crea ya sin permisos para el resto (con un chmod
+        # posterior quedaría un hueco en el que otro usuario podría conectarse y gastar su cuota)
+        umask = os.umask(0o077)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        finally:
+            os.umask(umask)
+        os.chmod(path, 0o600)
+        self.path = path
+        return self._server
+
+    async def serve_forever(self, path: str):
+        server = await self.start(path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return f"Demonio: {s['requests']} peticiones, {s['cancelled']} canceladas, {s['errors']} con error"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["requests"] += 1
+        try:
+            request = decode(await reader.readline())
+            if not isinstance(request, dict) or not request.get("message"):
+                raise ValueError("La petición necesita 'message'")
+            await self._answer(request, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats["cancelled"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            try:
+                writer.write(encode({"type": "error", "message": str(e)}))
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _answer(self, request: dict, reader, writer):
+        identifier = request.get("model") or self.default_model
+        resolved = self.resolve_model(identifier) if identifier else None
+        if resolved is None:
+            raise ValueError(f"Modelo '{identifier}' no encontrado")
+        model_id, model_info, llm = resolved
+        self.scheduler.register(model_id, provider_concurrency(model_info))
+        if model_id not in self._sizers:
+            self._sizers[model_id] = ContextSizer.from_model_info(model_info)
+        sizer = self._sizers[model_id]
+        priority = request.get("priority") or "normal"
+
+        messages = PromptAssembler.from_files(request.get("system_prompt"), request.get("pin") or []).build(
+            [], request["message"])
+
+        def make_stream(prefix: str = ""):
+            # Con prefijo (tras perder el hueco) se continúa la respuesta ya entregada
+            request_messages = continue_messages(messages, prefix)
+            options = sizer.options_for(request_messages) if sizer else None
+            source = (self.cache.stream(model_id, model_info, llm, request_messages, options) if self.cache
+                      else ChatStream(llm, request_messages, options))
+            if self.coalescer and not source.cached:
+                # Los fallos de caché idénticos y simultáneos comparten una sola generación
+                return self.coalescer.stream(model_id, model_info, llm, request_messages, options,
+                                             make_source=lambda: source)
+            return source
+
+        chat_stream = None
+
+        def started(stream):
+            nonlocal chat_stream
+            chat_stream = stream
+
+        def done() -> bytes:
+            return encode({"type": "done", "model": model_id, "cached": chat_stream.cached})
+
+        async def send(text):
+            writer.write(encode({"type": "chunk", "text": text}))
+            await writer.drain()
+
+        async def pump():
+            # Cola llena: QueueFull llega al cliente como mensaje de error. Si lo expulsan, vuelve
+            # a la cola y continúa desde el último chunk enviado
+            await self.scheduler.run_stream(model_id, make_stream, send, priority, on_stream=started)
+            writer.write(done())
+            await writer.drain()
+
+        cancelled = False
+        try:
+            cancelled = await run_until_disconnect(reader, pump())
+        finally:
+            if cancelled:
+                self.stats["cancelled"] += 1
+            if chat_stream is not None:
+                if sizer:
+                    sizer.observe(chat_stream.final)
+                if self.metrics:
+                    self.metrics.record(TurnMetrics.from_stream(chat_stream, *describe_llm(llm),
+                                                                cancelled=cancelled))
@@ -0,0 +1,30 @@
+# OLLAMA-LANGCHAING-AGENTE/core/daemon_protocol.py
+# Protocolo entre el demonio residente (core/daemon.py) y el cliente ligero (agents/cliente.py).
+# Solo biblioteca estándar: el cliente lo importa y debe arrancar en decenas de milisegundos.
+#
+# Por el socket unix viajan objetos JSON, uno por línea:
+#   cliente -> demonio  {"message": ..., "model": ..., "system_prompt": ..., "pin": [rutas absolutas],
+#                        "priority": "interactive" | "normal" | "batch"}
+#   demonio -> cliente  {"type": "chunk", "text": ...}      (tantos como chunks)
+#                       {"type": "done", "model": ..., "cached": ...}
+#                       {"type": "error", "message": ...}
+# Si el cliente cierra la conexión, el demonio cancela la generación.
+import json
+import os
+
+SOCKET_ENV = "TRON_SOCKET"
+
+
+def default_socket_path() -> str:
+    if os.getenv(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "tron")
+    return os.path.join(runtime_dir, "tron-agente.sock")
+
+
+def encode(message: dict) -> bytes:
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def decode(line: bytes) -> dict:
+    return json.loads(line.decode("utf-8"))
@@ -0,0 +1,181 @@
+# OLLAMA-LANGCHAING-AGENTE/core/endpoints.py
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import httpx
+
+from core.ollama_client import OllamaError, get_ollama_client
+
+DEFAULT_EJECT_AFTER = 3  # fallos seguidos antes de sacar un host de la rotación
+DEFAULT_EJECT_S = 30.0
+DEFAULT_HEALTH_CHECK_S = 10.0
+DEFAULT_MAX_SESSIONS = 1024  # afinidades recordadas; se olvidan primero las de uso más antiguo
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """Fallos atribuibles al host (red caída, 5xx), no a la petición (p. ej. modelo inexistente)."""
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True
+    # OllamaError y ollama.ResponseError (ruta de LangChain) llevan status_code
+    return (getattr(error, "status_code", None) or 0) >= 500
+
+
+@dataclass
+class Endpoint:
+    url: str
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class EndpointPool:
+    """
+    Varios servidores de Ollama que sirven el mismo modelo.
+      - Enrutado por menos peticiones en curso (least outstanding requests).
+      - Afinidad por sesión: un chat vuelve al mismo host mientras esté sano, para
+        que su KV cache siga teniendo el prefijo de la conversación.
+      - Expulsión pasiva tras `eject_after` fallos seguidos y health checks en segundo
+        plano que devuelven el host a la rotación en cuanto responde.
+    """
+
+    def __init__(self, base_urls, eject_after: int = DEFAULT_EJECT_AFTER, eject_s: float = DEFAULT_EJECT_S,
+                 health_check_s: float | None = DEFAULT_HEALTH_CHECK_S, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        urls = [url.rstrip("/") for url in base_urls]
+        if not urls:
+            raise ValueError("base_urls no puede estar vacío")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.eject_after = eject_after
+        self.eject_s = eject_s
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_check_s:
+            self._health_thread = threading.Thread(target=self._health_loop, args=(health_check_s,), daemon=True)
+            self._health_thread.start()
+
+    @property
+    def urls(self) -> list[str]:
+        return [e.url for e in self.endpoints]
+
+    def pick(self, session: str | None = None, exclude=()) -> str:
+        """Host para la siguiente petición (sin reservarlo; ver lease())."""
+        with self._lock:
+            return self._pick_locked(session, exclude).url
+
+    def _pick_locked(self, session, exclude) -> Endpoint:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.url not in exclude and e.available(now)]
+        if not candidates:
+            # Todos expulsados: mejor intentar el que antes vuelve que fallar sin probar
+            candidates = sorted((e for e in self.endpoints if e.url not in exclude),
+                                key=lambda e: e.ejected_until)[:1] or self.endpoints[:1]
+        sticky = self._sessions.get(session) if session else None
+        chosen = next((e for e in candidates if e.url == sticky), None)
+        if chosen is None:
+            # Empates: el que menos falla y luego el de menos peticiones totales (round-robin)
+            chosen = min(candidates, key=lambda e: (e.outstanding, e.consecutive_failures, e.requests))
+        if session:
+            self._sessions[session] = chosen.url
+            self._sessions.move_to_end(session)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return chosen
+
+    @contextmanager
+    def lease(self, session: str | None = None, exclude=()):
+        """Reserva un host durante una petición y registra si falló por culpa del host."""
+        url = self.checkout(session, exclude)
+        try:
+            yield url
+        except BaseException as e:
+            self.checkin(url, failed=is_host_failure(e))
+            raise
+        else:
+            self.checkin(url, failed=False)
+
+    def checkout(self, session: str | None = None, exclude=()) -> str:
+        """Reserva un host sin bloque `with` (p. ej. mientras dura el cuerpo de una respuesta HTTP)."""
+        with self._lock:
+            endpoint = self._pick_locked(session, exclude)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint.url
+
+    def checkin(self, url: str, failed: bool):
+        """Libera un host reservado con checkout()."""
+        endpoint = next(e for e in self.endpoints if e.url == url)
+        with self._lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_after:
+                    endpoint.ejected_until = time.monotonic() + self.eject_s
+                    # Las sesiones fijadas a este host se reasignan en su próxima petición
+                    for session, url in list(self._sessions.items()):
+                        if url == endpoint.url:
+                            del self._sessions[session]
+            else:
+                endpoint.consecutive_failures = 0
+
+    def check_health(self):
+        for endpoint in self.endpoints:
+            try:
+                get_ollama_client(endpoint.url).version()
+                healthy = True
+            except (httpx.HTTPError, OllamaError, ValueError):
+                healthy = False
+            with self._lock:
+                if healthy:
+                    endpoint.ejected_until = 0.0
+                    endpoint.consecutive_failures = 0
+                elif endpoint.available(time.monotonic()):
+                    endpoint.ejected_until = time.monotonic() + self.eject_s
+
+    def _health_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def format_stats(self) -> str:
+        now = time.monotonic()
+        with self._lock:
+            lines = [f"  {e.url:<32} en curso {e.outstanding:>2} | peticiones {e.requests:>4} | "
+                     f"fallos {e.failures:>3}{' | EXPULSADO' if not e.available(now) else ''}"
+                     for e in self.endpoints]
+        return "Endpoints de Ollama:\n" + "\n".join(lines)
+
+    def close(self):
+        self._stop.set()
+
+
+# --- Registro de pools compartidos (uno por lista de hosts y por proceso) ---
+_pools: dict[tuple, EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(base_urls, **settings) -> EndpointPool:
+    key = tuple(url.rstrip("/") for url in base_urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = EndpointPool(key, **settings)
+            _pools[key] = pool
+        return pool
+
+
+def endpoint_pool_for(llm) -> EndpointPool | None:
+    """Pool del llm si su config define varios `base_urls` (ver core/routed_ollama.py)."""
+    base_urls = getattr(llm, "base_urls", None)
+    if not base_urls:
+        return None
+    return get_endpoint_pool(base_urls, health_check_s=getattr(llm, "health_check_s", DEFAULT_HEALTH_CHECK_S))
@@ -0,0 +1,250 @@
+# OLLAMA-LANGCHAING-AGENTE/core/engine.py
+import asyncio
+import sys
+import time
+from contextlib import aclosing
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.endpoints import endpoint_pool_for, is_host_failure
+from core.ollama_client import RequestTimings, aclose_all_clients, get_ollama_client
+from core.openai_client import aclose_all_clients as aclose_all_openai_clients
+from core.openai_client import get_openai_client, openai_endpoint, request_params, usage_metadata
+from core.render import StreamRenderer
+
+
+def to_ollama_messages(messages) -> list[dict]:
+    """Convierte mensajes LangChain al formato de /api/chat (el mismo que /chat/completions de OpenAI)."""
+    roles = {SystemMessage: "system", HumanMessage: "user", AIMessage: "assistant"}
+    ollama_messages = []
+    for msg in messages:
+        role = next((r for cls, r in roles.items() if isinstance(msg, cls)), None)
+        if role:
+            ollama_messages.append({"role": role, "content": msg.content})
+    return ollama_messages
+
+
+def continue_messages(messages, prefix: str = "") -> list:
+    """
+    Mensajes para continuar una respuesta ya empezada: con el texto emitido como último mensaje
+    del asistente, Ollama sigue escribiéndolo en lugar de empezar otro (la KV cache tiene el resto).
+    Solo vale para /api/chat de Ollama (ver can_continue): los demás proveedores empiezan una respuesta nueva.
+    """
+    return [*messages, AIMessage(content=prefix)] if prefix else list(messages)
+
+
+def is_ollama(llm) -> bool:
+    # Sin importar langchain_ollama: si no está cargado, el llm no puede ser un ChatOllama.
+    module = sys.modules.get("langchain_ollama.chat_models")
+    return module is not None and isinstance(llm, module.ChatOllama)
+
+
+def can_continue(llm) -> bool:
+    """
+    Si una generación cortada se puede retomar con continue_messages. Solo la API nativa de
+    Ollama continúa el último mensaje del asistente; los compatibles con OpenAI (DeepSeek...) y
+    llm.astream() responden de nuevo, así que sus streams no se pueden expulsar.
+    """
+    return is_ollama(llm)
+
+
+class ChatStream:
+    """
+    Iterador asíncrono de los chunks de texto de una generación.
+    Para Ollama usa la API nativa y para los proveedores compatibles con OpenAI (DeepSeek,
+    OpenRouter...) el cliente SSE propio: en ambos cancelar cierra la conexión. El resto, llm.astream().
+    Tras consumirlo (o cancelarlo) quedan disponibles content, final, usage y timings.
+    `options` se añade a las opciones de Ollama de esta petición (p. ej. num_ctx).
+    `session` fija el host cuando el modelo tiene varios `base_urls` (afinidad de KV cache).
+    """
+
+    cached = False  # ReplayStream (core/response_cache.py) lo pone a True
+
+    def __init__(self, llm, messages, options: dict | None = None, session: str | None = None):
+        self.llm = llm
+        self.messages = messages
+        self.options = dict(options or {})
+        self.session = session
+        self.endpoint: str | None = None  # host que atendió la petición
+        self.chunks: list[str] = []
+        self.chunk_times: list[float] = []  # llegada de cada chunk, en s desde el inicio
+        self.final: dict | None = None  # último objeto de Ollama (done=True) con sus contadores
+        self.usage: dict | None = None  # usage con el formato de usage_metadata de LangChain (resto de proveedores)
+        self.timings = RequestTimings()
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def resumable(self) -> bool:
+        """Si el planificador puede expulsarla y continuarla desde lo emitido (ver can_continue)."""
+        return can_continue(self.llm)
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def _generate(self):
+        if is_ollama(self.llm):
+            source = self._ollama()
+        else:
+            endpoint = openai_endpoint(self.llm)
+            source = self._openai(*endpoint) if endpoint else self._langchain()
+        start = time.perf_counter()
+        try:
+            async with aclosing(source) as chunks:
+                async for text in chunks:
+                    if text:
+                        elapsed = time.perf_counter() - start
+                        if self.timings.ttft_s is None:
+                            self.timings.ttft_s = elapsed
+                        self.chunk_times.append(elapsed)
+                        self.chunks.append(text)
+                        yield text
+        finally:
+            if self.timings.total_s is None:
+                self.timings.total_s = time.perf_counter() - start
+
+    async def _ollama(self):
+        pool = endpoint_pool_for(self.llm)
+        if pool is None:
+            self.endpoint = getattr(self.llm, "base_url", None)
+            async with aclosing(self._ollama_from(self.endpoint)) as chunks:
+                async for text in chunks:
+                    yield text
+            return
+
+        tried = []
+        while True:
+            started = False
+            try:
+                with pool.lease(self.session, exclude=tried) as url:
+                    self.endpoint = url
+                    async with aclosing(self._ollama_from(url)) as chunks:
+                        async for text in chunks:
+                            started = True
+                            yield text
+                return
+            except Exception as e:
+                # Host caído antes del primer token: se reintenta en otro sin que se note
+                tried.append(self.endpoint)
+                if started or not is_host_failure(e) or len(tried) >= len(pool.urls):
+                    raise
+                self.timings = RequestTimings()
+
+    async def _ollama_from(self, base_url):
+        client = get_ollama_client(base_url)
+        options = {"temperature": getattr(self.llm, "temperature", 0.7)}
+        if getattr(self.llm, "num_ctx", None):
+            options["num_ctx"] = self.llm.num_ctx
+        if getattr(self.llm, "num_predict", None):
+            options["num_predict"] = self.llm.num_predict
+        options.update(self.options)
+        extra = {}
+        if getattr(self.llm, "keep_alive", None) is not None:
+            extra["keep_alive"] = self.llm.keep_alive
+        stream = client.achat_stream(self.llm.model, to_ollama_messages(self.messages),
+                                     options=options, timings=self.timings, **extra)
+        async with aclosing(stream) as events:
+            async for data in events:
+                if data.get("done"):
+                    self.final = data
+                yield data.get("message", {}).get("content", "")
+
+    async def _openai(self, base_url: str, api_key: str | None):
+        client = get_openai_client(base_url, api_key, getattr(self.llm, "default_headers", None))
+        self.endpoint = base_url
+        stream = client.achat_stream(self.llm.model_name, to_ollama_messages(self.messages),
+                                     timings=self.timings, **request_params(self.llm))
+        async with aclosing(stream) as events:
+            async for event in events:
+                if event.get("usage"):
+                    self.usage = usage_metadata(event["usage"])
+                for choice in event.get("choices") or []:
+                    yield (choice.get("delta") or {}).get("content") or ""
+
+    async def _langchain(self):
+        async for chunk in self.llm.astream(self.messages):
+            if getattr(chunk, "usage_metadata", None):
+                self.usage = dict(chunk.usage_metadata)
+            yield chunk.content or ""
+
+    async def collect(self) -> str:
+        async for _ in self:
+            pass
+        return self.content
+
+
+async def print_stream(chat_stream: ChatStream, sinks=()) -> str:
+    # Pintado por frames en otro hilo; también vuelca lo recibido si se cancela
+    renderer = StreamRenderer(sinks=sinks)
+    try:
+        async for text in chat_stream:
+            renderer.feed(text)
+    finally:
+        renderer.close()
+    return chat_stream.content
+
+
+async def print_scheduled(scheduler, model_id: str, make_stream, priority: str = "normal", sinks=(),
+                          on_stream=None) -> str:
+    """
+    Como print_stream, pero la generación espera su hueco en el planificador (core/scheduler.py)
+    y, si la expulsan, continúa desde lo ya pintado. Devuelve la respuesta completa.
+    """
+    renderer = StreamRenderer(sinks=sinks)
+
+    async def feed(text):
+        renderer.feed(text)
+
+    try:
+        return await scheduler.run_stream(model_id, make_stream, feed, priority, on_stream=on_stream)
+    finally:
+        renderer.close()
+
+
+async def invoke(llm, messages) -> str:
+    response = await llm.ainvoke(messages)
+    return response.content
+
+
+class EngineRunner:
+    """
+    Event loop persistente para todo el proceso (el pool async sobrevive entre turnos).
+    Ctrl+C durante run() se traduce en la cancelación de la tarea en curso.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+
+    def run(self, coro):
+        """Ejecuta la corrutina. Devuelve (resultado, cancelado)."""
+        task = self.loop.create_task(coro)
+        try:
+            return self.loop.run_until_complete(task), False
+        except KeyboardInterrupt:
+            if not task.done():
+                task.cancel()
+                try:
+                    self.loop.run_until_complete(task)
+                except (asyncio.CancelledError, KeyboardInterrupt):
+                    pass
+            return None, True
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.run_until_complete(aclose_all_clients())
+        self.loop.run_until_complete(aclose_all_openai_clients())
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
+
+
+_runner: EngineRunner | None = None
+
+
+def get_runner() -> EngineRunner:
+    global _runner
+    if _runner is None:
+        _runner = EngineRunner()
+    return _runner
@@ -0,0 +1,177 @@
+# OLLAMA-LANGCHAING-AGENTE/core/history.py
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# Valores por defecto si el modelo no define su bloque `history` en models.yaml
+DEFAULT_TOKEN_BUDGET = 4096
+DEFAULT_KEEP_RECENT_TURNS = 4
+# Al pasarse del presupuesto se recorta de golpe hasta esta fracción: el inicio del historial
+# (y con él el prefijo que Ollama tiene en su KV cache) no se mueve en cada turno
+TRIM_TO = 0.5
+
+SUMMARY_PROMPT = (
+    "Resume la siguiente conversación entre un usuario y un asistente en pocas frases, "
+    "conservando datos concretos, decisiones y preguntas pendientes. "
+    "Responde solo con el resumen.\n\n"
+    "Resumen previo:\n{summary}\n\nConversación:\n{transcript}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # Heurística barata (~4 caracteres por token) más el overhead de rol del mensaje.
+    return len(text) // 4 + 4
+
+
+def make_summarizer(llm):
+    """
+    Devuelve una función (resumen_previo, mensajes, cancelado) -> resumen | None que usa el propio llm.
+    Se genera en streaming para poder cortarla: si `cancelado` se activa (el usuario ya envió otro
+    turno al mismo modelo) se cierra la respuesta, Ollama deja de generar y se devuelve None.
+    """
+    def summarize(summary: str, messages, cancelled: threading.Event) -> str | None:
+        transcript = "\n".join(
+            f"{'Usuario' if isinstance(m, HumanMessage) else 'Asistente'}: {m.content}"
+            for m in messages
+        )
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(ninguno)", transcript=transcript)
+        parts = []
+        for chunk in llm.stream([HumanMessage(content=prompt)]):
+            if cancelled.is_set():
+                return None
+            parts.append(chunk.content)
+        return "".join(parts).strip()
+    return summarize
+
+
+class ConversationHistory:
+    """
+    Historial de chat con presupuesto de tokens.
+    Cada mensaje se cuenta una sola vez al añadirse. Cuando el historial supera el
+    presupuesto, los turnos antiguos se pliegan en un resumen rodante que se genera
+    en segundo plano (mientras el usuario escribe). Hasta que el resumen esté listo,
+    messages() recorta los turnos más antiguos para no pasarse del presupuesto.
+    Recorte y plegado van por bloques (hasta TRIM_TO del presupuesto; al menos
+    keep_recent_turns turnos por resumen) para que el prefijo enviado siga idéntico
+    durante varios turnos en lugar de cambiar en cada uno.
+    Si el resumen falla, el error queda en take_compaction_error() para que lo muestre quien llama.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 keep_recent_turns: int = DEFAULT_KEEP_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self._entries: list[tuple] = []  # (mensaje, tokens)
+        self._start = 0  # primera entrada que envía messages(); solo avanza por bloques
+        self._summary = ""
+        self._summary_tokens = 0
+        self._lock = threading.Lock()
+        self._generation = 0  # invalida compactaciones en curso tras clear()
+        self._compaction: threading.Thread | None = None
+        self._cancel_compaction = threading.Event()
+        self._compaction_error: Exception | None = None
+
+    @classmethod
+    def from_model_info(cls, model_info: dict | None):
+        settings = (model_info or {}).get("history", {})
+        return cls(token_budget=settings.get("token_budget", DEFAULT_TOKEN_BUDGET),
+                   keep_recent_turns=settings.get("keep_recent_turns", DEFAULT_KEEP_RECENT_TURNS))
+
+    def apply_model_info(self, model_info: dict | None):
+        """Adopta el presupuesto de otro modelo conservando los turnos (cambio de modelo en el chat)."""
+        settings = (model_info or {}).get("history", {})
+        with self._lock:
+            self.token_budget = settings.get("token_budget", DEFAULT_TOKEN_BUDGET)
+            self.keep_recent_turns = settings.get("keep_recent_turns", DEFAULT_KEEP_RECENT_TURNS)
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return self._summary_tokens + sum(tokens for _, tokens in self._entries)
+
+    def add_turn(self, user_text: str, ai_text: str):
+        with self._lock:
+            for message in (HumanMessage(content=user_text), AIMessage(content=ai_text)):
+                self._entries.append((message, estimate_tokens(message.content)))
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._start = 0
+            self._summary = ""
+            self._summary_tokens = 0
+            self._generation += 1
+
+    def messages(self, reserve_tokens: int = 0) -> list:
+        """Mensajes a enviar: resumen (si lo hay) + los turnos más recientes que caben."""
+        with self._lock:
+            budget = self.token_budget - reserve_tokens - self._summary_tokens
+            used = sum(tokens for _, tokens in self._entries[self._start:])
+            if used > budget:
+                # Se quitan turnos completos (usuario + asistente) de los más antiguos hasta TRIM_TO
+                while self._start < len(self._entries) and used > budget * TRIM_TO:
+                    used -= self._entries[self._start][1] + self._entries[self._start + 1][1]
+                    self._start += 2
+            kept = [message for message, _ in self._entries[self._start:]]
+            if self._summary:
+                kept.insert(0, SystemMessage(content=f"Resumen de la conversación previa: {self._summary}"))
+            return kept
+
+    def needs_compaction(self) -> bool:
+        with self._lock:
+            return self._needs_compaction_locked()
+
+    def _needs_compaction_locked(self) -> bool:
+        total = self._summary_tokens + sum(tokens for _, tokens in self._entries)
+        # Se pliegan al menos keep_recent_turns turnos de una vez: un resumen nuevo por turno
+        # cambiaría el prefijo en cada petición
+        foldable_turns = len(self._entries) // 2 - self.keep_recent_turns
+        return total > self.token_budget and foldable_turns >= max(self.keep_recent_turns, 1)
+
+    def compact_in_background(self, summarize) -> threading.Thread | None:
+        """Lanza el plegado de turnos antiguos en un hilo, si hace falta y no hay otro en curso."""
+        with self._lock:
+            if not self._needs_compaction_locked():
+                return None
+            if self._compaction is not None and self._compaction.is_alive():
+                return None
+            self._cancel_compaction = threading.Event()
+            self._compaction = threading.Thread(target=self._compact, args=(summarize, self._cancel_compaction),
+                                                daemon=True)
+            self._compaction.start()
+            return self._compaction
+
+    def cancel_compaction(self):
+        """Corta el resumen en curso (p. ej. para dejar el modelo libre al turno siguiente)."""
+        self._cancel_compaction.set()
+
+    def take_compaction_error(self) -> Exception | None:
+        """Último fallo del resumen en segundo plano (una sola vez)."""
+        with self._lock:
+            error, self._compaction_error = self._compaction_error, None
+            return error
+
+    def _compact(self, summarize, cancelled: threading.Event):
+        with self._lock:
+            generation = self._generation
+            fold_count = len(self._entries) - 2 * self.keep_recent_turns
+            to_fold = [message for message, _ in self._entries[:fold_count]]
+            previous_summary = self._summary
+        try:
+            new_summary = summarize(previous_summary, to_fold, cancelled)
+        except Exception as e:
+            with self._lock:
+                self._compaction_error = e
+            return
+        with self._lock:
+            if new_summary is None or cancelled.is_set() or generation != self._generation:
+                return
+            # Solo se añade al final, así que los primeros fold_count siguen siendo los plegados
+            del self._entries[:fold_count]
+            self._start = max(self._start - fold_count, 0)
+            self._summary = new_summary
+            self._summary_tokens = estimate_tokens(new_summary)
@@ -0,0 +1,58 @@
+# OLLAMA-LANGCHAING-AGENTE/core/http_trace.py
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class RequestTimings:
+    """
+    Tiempos de una petición, en segundos desde que se envía.
+    connect_s es None cuando la conexión se reutilizó del pool (keep-alive).
+    """
+    connect_s: float | None = None
+    headers_s: float | None = None
+    ttft_s: float | None = None
+    total_s: float | None = None
+
+    @property
+    def reused_connection(self) -> bool:
+        return self.connect_s is None
+
+    def summary(self) -> str:
+        def fmt(value):
+            return f"{value:.3f}s" if value is not None else "-"
+        connect = "reutilizada" if self.reused_connection else fmt(self.connect_s)
+        return f"conexión: {connect} | TTFT: {fmt(self.ttft_s)} | total: {fmt(self.total_s)}"
+
+
+class TraceRecorder:
+    """
+    Recibe los eventos de traza de httpcore (extensions={"trace": ...}) y rellena un RequestTimings.
+    Lo comparten los clientes de Ollama y de los proveedores compatibles con OpenAI.
+    """
+
+    def __init__(self, timings: RequestTimings):
+        self.timings = timings
+        self.start = time.perf_counter()
+        self._connect_started = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def __call__(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = time.perf_counter()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self._connect_started is not None:
+                self.timings.connect_s = time.perf_counter() - self._connect_started
+        elif event_name == "http11.receive_response_headers.complete":
+            self.timings.headers_s = self.elapsed()
+
+    async def atrace(self, event_name: str, info: dict):
+        # httpcore exige un callable asíncrono para los clientes async
+        self(event_name, info)
+
+    def first_token(self):
+        """Marca el TTFT la primera vez que llega texto generado."""
+        if self.timings.ttft_s is None:
+            self.timings.ttft_s = self.elapsed()
@@ -0,0 +1,44 @@
+# OLLAMA-LANGCHAING-AGENTE/core/loop_clients.py
+import asyncio
+import threading
+
+import httpx
+
+
+class LoopClients:
+    """
+    Un httpx.AsyncClient por event loop. Sus conexiones quedan ligadas al loop que las abrió,
+    así que el motor (loop propio) y un asyncio.run() en otro hilo no comparten pool, y cerrar
+    uno no rompe el del otro. Cada loop cierra el suyo con aclose() antes de terminar.
+    """
+
+    def __init__(self, **client_kwargs):
+        self._client_kwargs = client_kwargs
+        self._clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                # Un loop ya cerrado no puede esperar al aclose(): su cliente solo se suelta
+                for old in [old for old in self._clients if old.is_closed()]:
+                    del self._clients[old]
+                client = self._clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+            return client
+
+    async def aclose(self):
+        """Cierra el cliente del loop en curso; los de otros loops siguen funcionando."""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Cierre al salir: los loops parados aún pueden ejecutar el aclose(); los cerrados se descartan."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for loop, client in clients.items():
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(client.aclose())
@@ -0,0 +1,204 @@
+# OLLAMA-LANGCHAING-AGENTE/core/metrics.py
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+
+from core.engine import is_ollama
+
+NS = 1e9  # Ollama reporta las duraciones en nanosegundos
+# Margen sobre el crecimiento estimado del prompt para dar por reutilizado el turno anterior
+GROWTH_SLACK = 1.5
+
+
+@dataclass
+class TurnMetrics:
+    """
+    Telemetría de un turno: tiempos medidos en el cliente unidos a los contadores
+    del servidor (Ollama: *_count / *_duration; resto: usage_metadata).
+    """
+    model: str
+    provider: str | None = None
+    cancelled: bool = False
+    cached: bool = False  # reproducido desde la caché de respuestas
+    coalesced: bool = False  # enganchado a una generación idéntica en curso (core/coalesce.py)
+    timestamp: float = 0.0
+    # Cliente
+    connect_s: float | None = None
+    ttft_s: float | None = None
+    total_s: float | None = None
+    itl_mean_s: float | None = None  # latencia media entre chunks
+    itl_max_s: float | None = None
+    chunks: int = 0
+    num_ctx: int | None = None
+    # Servidor
+    prompt_tokens: int | None = None
+    output_tokens: int | None = None
+    cache_hit_tokens: int | None = None  # tokens de prompt servidos desde la caché de prefijo
+    prompt_total_tokens: int | None = None  # prompt completo: evaluados + reutilizados
+    load_s: float | None = None
+    prompt_eval_s: float | None = None
+    eval_s: float | None = None
+    tokens_per_s: float | None = None
+
+    @classmethod
+    def from_stream(cls, chat_stream, model: str, provider: str | None = None, cancelled: bool = False,
+                    previous: "TurnMetrics | None" = None, prompt_growth: int | None = None) -> "TurnMetrics":
+        """
+        `previous` (el turno anterior de la misma conversación) y `prompt_growth` (tokens estimados
+        desde donde el prompt se desvía del anterior, PromptAssembler.grown_tokens) permiten
+        deducir la caché de prefijo de Ollama, que no la reporta.
+        """
+        timings = chat_stream.timings
+        metrics = cls(model=model, provider=provider, cancelled=cancelled, timestamp=time.time(),
+                      cached=getattr(chat_stream, "cached", False),
+                      coalesced=getattr(chat_stream, "coalesced", False),
+                      connect_s=timings.connect_s, ttft_s=timings.ttft_s, total_s=timings.total_s,
+                      chunks=len(chat_stream.chunk_times),
+                      num_ctx=getattr(chat_stream, "options", {}).get("num_ctx"))
+
+        gaps = [b - a for a, b in zip(chat_stream.chunk_times, chat_stream.chunk_times[1:])]
+        if gaps:
+            metrics.itl_mean_s = sum(gaps) / len(gaps)
+            metrics.itl_max_s = max(gaps)
+
+        final = chat_stream.final
+        if final:
+            metrics.prompt_tokens = final.get("prompt_eval_count")
+            metrics.output_tokens = final.get("eval_count")
+            if metrics.prompt_tokens is not None:
+                metrics._infer_ollama_cache(previous, prompt_growth)
+            metrics.load_s = _seconds(final.get("load_duration"))
+            metrics.prompt_eval_s = _seconds(final.get("prompt_eval_duration"))
+            metrics.eval_s = _seconds(final.get("eval_duration"))
+            if metrics.output_tokens and metrics.eval_s:
+                metrics.tokens_per_s = metrics.output_tokens / metrics.eval_s
+        elif chat_stream.usage:
+            metrics.prompt_tokens = chat_stream.usage.get("input_tokens")
+            metrics.output_tokens = chat_stream.usage.get("output_tokens")
+            # DeepSeek: prompt_cache_hit_tokens, que LangChain expone como cache_read
+            metrics.cache_hit_tokens = (chat_stream.usage.get("input_token_details") or {}).get("cache_read")
+            metrics.prompt_total_tokens = metrics.prompt_tokens
+
+        # Sin contadores de duración del servidor, estimamos la velocidad de generación en el cliente
+        if metrics.tokens_per_s is None and metrics.output_tokens and metrics.total_s and metrics.ttft_s:
+            generation_s = metrics.total_s - metrics.ttft_s
+            if generation_s > 0:
+                metrics.tokens_per_s = metrics.output_tokens / generation_s
+        return metrics
+
+    def _infer_ollama_cache(self, previous, prompt_growth):
+        """
+        prompt_eval_count de Ollama cuenta solo lo evaluado, no el prompt entero. Si se evaluó
+        poco más de lo que creció el prompt, el prompt del turno anterior vino de la KV cache;
+        si se evaluó más que todo el prompt anterior, no se reutilizó nada. Si no, no se sabe.
+        """
+        evaluated = self.prompt_tokens
+        known = (previous is not None and previous.model == self.model
+                 and previous.prompt_total_tokens is not None and prompt_growth is not None)
+        if not known:
+            # Primer turno (o cadena rota): se toma lo evaluado como total para los siguientes
+            self.prompt_total_tokens = evaluated
+            return
+        if evaluated <= prompt_growth * GROWTH_SLACK:
+            self.cache_hit_tokens = previous.prompt_total_tokens
+        elif evaluated > previous.prompt_total_tokens:
+            self.cache_hit_tokens = 0
+        else:
+            return
+        self.prompt_total_tokens = self.cache_hit_tokens + evaluated
+
+
+def describe_llm(llm) -> tuple[str, str]:
+    """(modelo, proveedor) de un chat model de LangChain, para etiquetar las métricas."""
+    model = getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+    provider = "ollama" if is_ollama(llm) else type(llm).__name__
+    return model, provider
+
+
+def _seconds(nanoseconds):
+    return nanoseconds / NS if nanoseconds is not None else None
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Percentil con interpolación lineal (q entre 0 y 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+# Métricas que se agregan en /stats
+AGGREGATED = ("ttft_s", "total_s", "itl_mean_s", "tokens_per_s", "load_s", "prompt_eval_s", "eval_s")
+
+
+class MetricsRecorder:
+    """Acumula TurnMetrics en memoria y, opcionalmente, los vuelca a un JSONL."""
+
+    def __init__(self, sink_path: str | None = None):
+        self.turns: list[TurnMetrics] = []
+        self._sink = open(sink_path, "a", encoding="utf-8") if sink_path else None
+        self._lock = threading.Lock()
+
+    def record(self, metrics: TurnMetrics):
+        with self._lock:
+            self.turns.append(metrics)
+            if self._sink:
+                self._sink.write(json.dumps(asdict(metrics), ensure_ascii=False) + "\n")
+                self._sink.flush()
+
+    def aggregates(self) -> dict[str, dict]:
+        """p50/p95 de cada métrica sobre los turnos completos (no cancelados, ni de caché, ni compartidos)."""
+        with self._lock:
+            completed = [t for t in self.turns if not t.cancelled and not t.cached and not t.coalesced]
+        result = {}
+        for name in AGGREGATED:
+            values = [getattr(t, name) for t in completed if getattr(t, name) is not None]
+            if values:
+                result[name] = {"n": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+        return result
+
+    def format_stats(self) -> str:
+        if not self.turns:
+            return "Sin turnos registrados todavía."
+        last = self.turns[-1]
+        lines = [f"Turnos: {len(self.turns)} ({sum(t.cancelled for t in self.turns)} cancelados)",
+                 "Último turno:"]
+        for field in fields(TurnMetrics):
+            value = getattr(last, field.name)
+            if value is not None and field.name not in ("timestamp",):
+                lines.append(f"  {field.name:<16} {_fmt(value)}")
+        cache_line = self.format_cache()
+        if cache_line:
+            lines.append(cache_line)
+        aggregates = self.aggregates()
+        if aggregates:
+            lines.append("Agregados (turnos completos):")
+            lines.append(f"  {'métrica':<16} {'p50':>10} {'p95':>10}  n")
+            for name, agg in aggregates.items():
+                lines.append(f"  {name:<16} {_fmt(agg['p50']):>10} {_fmt(agg['p95']):>10}  {agg['n']}")
+        return "\n".join(lines)
+
+    def format_cache(self) -> str | None:
+        """Tokens de prompt reutilizados de la caché sobre el total, en los turnos en que se conocen ambos."""
+        with self._lock:
+            counted = [t for t in self.turns
+                       if t.cache_hit_tokens is not None and t.prompt_total_tokens is not None and not t.coalesced]
+        if not counted:
+            return None
+        hits = sum(t.cache_hit_tokens for t in counted)
+        total = sum(t.prompt_total_tokens for t in counted)
+        ratio = hits / total * 100 if total else 0.0
+        return f"Caché de prompt: {hits} de {total} tokens reutilizados ({ratio:.0f}%)"
+
+    def close(self):
+        if self._sink:
+            self._sink.close()
+            self._sink = None
+
+
+def _fmt(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
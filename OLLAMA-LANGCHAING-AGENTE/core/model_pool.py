@@ -0,0 +1,125 @@
+# OLLAMA-LANGCHAING-AGENTE/core/model_pool.py
+import threading
+import time
+
+from core.engine import is_ollama
+from core.ollama_client import get_ollama_client
+
+
+def normalize_model_name(name: str) -> str:
+    # Ollama lista "gemma3" como "gemma3:latest"
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelPool:
+    """
+    Pool de clientes ya instanciados por model_id, con precarga en segundo plano
+    de los pesos en Ollama y un sondeo de /api/tags cacheado para rechazar
+    modelos que no están instalados antes de que el usuario espere.
+    Las precargas fallidas se guardan para que las muestre quien llama (take_errors()).
+    """
+
+    def __init__(self, load_llm, tags_ttl: float = 60.0):
+        # load_llm(model_id) -> llm | None
+        self._load_llm = load_llm
+        self.tags_ttl = tags_ttl
+        self._llms: dict[str, object] = {}
+        self._tags: dict[str, tuple[float, set[str]]] = {}
+        self._preloads: dict[str, threading.Thread] = {}
+        self._errors: list[str] = []
+        self._lock = threading.Lock()
+
+    def get(self, model_id: str):
+        """Cliente del modelo; solo se construye la primera vez."""
+        with self._lock:
+            llm = self._llms.get(model_id)
+        if llm is None:
+            llm = self._load_llm(model_id)
+            if llm is not None:
+                with self._lock:
+                    llm = self._llms.setdefault(model_id, llm)
+        return llm
+
+    def put(self, model_id: str, llm):
+        with self._lock:
+            self._llms[model_id] = llm
+
+    def installed_models(self, base_url: str | None, refresh: bool = False) -> set[str] | None:
+        """Modelos instalados en el servidor (cacheado tags_ttl s). None si no responde."""
+        key = base_url or ""
+        cached = self._tags.get(key)
+        if cached and not refresh and time.monotonic() - cached[0] < self.tags_ttl:
+            return cached[1]
+        try:
+            names = {normalize_model_name(n) for n in get_ollama_client(base_url).tags()}
+        except Exception:
+            return None
+        self._tags[key] = (time.monotonic(), names)
+        return names
+
+    def check_available(self, llm) -> str | None:
+        """
+        Devuelve un mensaje de error si el modelo seguro no existe; None si está (o no se sabe).
+        Con varios `base_urls` se sondea cada host: el reparto puede mandar la petición a cualquiera.
+        """
+        if not is_ollama(llm):
+            return None
+        urls = getattr(llm, "base_urls", None) or [getattr(llm, "base_url", None)]
+        missing = [url for url in urls if self._missing_on(url, llm.model)]
+        if not missing:
+            return None
+        if len(urls) == 1:
+            return f"'{llm.model}' no está instalado en Ollama (ollama pull {llm.model})"
+        return f"'{llm.model}' no está instalado en {', '.join(missing)} (ollama pull {llm.model} en cada host)"
+
+    def _missing_on(self, base_url: str | None, model: str) -> bool:
+        installed = self.installed_models(base_url)
+        if installed is None or normalize_model_name(model) in installed:
+            return False  # está, o el host no responde y no se sabe
+        # Puede haberse instalado después del último sondeo
+        installed = self.installed_models(base_url, refresh=True)
+        return installed is not None and normalize_model_name(model) not in installed
+
+    def preload(self, model_id: str, options: dict | None = None) -> threading.Thread | None:
+        """
+        Carga los pesos del modelo en Ollama en segundo plano (petición de cero tokens).
+        `options` (p. ej. num_ctx) debe coincidir con el de la primera petición o Ollama recargará.
+        """
+        llm = self.get(model_id)
+        if llm is None or not is_ollama(llm):
+            return None
+        with self._lock:
+            running = self._preloads.get(model_id)
+            if running is not None and running.is_alive():
+                return running
+            thread = threading.Thread(target=self._preload, args=(llm, options), daemon=True)
+            self._preloads[model_id] = thread
+        thread.start()
+        return thread
+
+    def _preload(self, llm, options=None):
+        # Con varios base_urls cada host carga sus propios pesos, en paralelo
+        urls = getattr(llm, "base_urls", None) or [getattr(llm, "base_url", None)]
+        if len(urls) == 1:
+            self._preload_host(llm, urls[0], options)
+            return
+        threads = [threading.Thread(target=self._preload_host, args=(llm, url, options), daemon=True)
+                   for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _preload_host(self, llm, base_url, options=None):
+        try:
+            client = get_ollama_client(base_url)
+            client.load_model(llm.model, keep_alive=getattr(llm, "keep_alive", None), options=options)
+        except Exception as e:
+            with self._lock:
+                self._errors.append(f"Precarga de '{llm.model}' fallida ({base_url or 'host por defecto'}): {e}")
+
+    def take_errors(self) -> list[str]:
+        """Fallos de precarga desde la última llamada."""
+        with self._lock:
+            errors, self._errors = self._errors, []
+            return errors
@@ -0,0 +1,182 @@
+# OLLAMA-LANGCHAING-AGENTE/core/ollama_client.py
+import atexit
+import json
+import threading
+
+import httpx
+
+from core.http_trace import RequestTimings, TraceRecorder
+from core.loop_clients import LoopClients
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+class OllamaError(RuntimeError):
+    """Error devuelto por el servidor de Ollama (status HTTP != 2xx)."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    """
+    Cliente HTTP nativo de Ollama con pool de conexiones keep-alive.
+    Cancelar una petición cierra solo la conexión de esa respuesta; el pool sigue vivo.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, max_connections: int = 16,
+                 keepalive_expiry: float = 300.0, connect_timeout: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self._client_kwargs = dict(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            # Sin timeout de lectura: una generación larga puede tardar entre tokens.
+            timeout=httpx.Timeout(None, connect=connect_timeout),
+        )
+        self._client = httpx.Client(**self._client_kwargs)
+        # Los clientes async quedan ligados al event loop donde se crearon: uno por loop.
+        self._aclients = LoopClients(**self._client_kwargs)
+
+    def _async_client(self) -> httpx.AsyncClient:
+        return self._aclients.get()
+
+    def version(self, timeout: float = 2.0) -> str:
+        """Versión del servidor (/api/version); sirve de health check barato."""
+        response = self._client.get("/api/version", timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("version", "")
+
+    def tags(self) -> list[str]:
+        """Nombres de los modelos instalados en el servidor (/api/tags)."""
+        response = self._client.get("/api/tags", timeout=5.0)
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    def load_model(self, model: str, keep_alive: str | int | None = None,
+                   options: dict | None = None) -> dict:
+        """
+        Carga el modelo en memoria sin generar tokens (petición con `messages` vacío)
+        y lo mantiene residente durante `keep_alive`. Con `options={"num_ctx": n}` se
+        reserva ya la KV cache que usarán las peticiones, evitando una recarga.
+        """
+        payload = {"model": model, "messages": [], "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if options:
+            payload["options"] = options
+        response = self._client.post("/api/chat", json=payload)
+        if response.status_code >= 400:
+            raise OllamaError(f"Ollama {response.status_code}: {_error_text(response)}",
+                              status_code=response.status_code)
+        return response.json()
+
+    def embed(self, model: str, inputs: list[str], keep_alive: str | int | None = None) -> list[list[float]]:
+        """Embeddings de varios textos en una sola petición (/api/embed)."""
+        payload = {"model": model, "input": inputs}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        response = self._client.post("/api/embed", json=payload)
+        if response.status_code >= 400:
+            raise OllamaError(f"Ollama {response.status_code}: {_error_text(response)}",
+                              status_code=response.status_code)
+        return response.json()["embeddings"]
+
+    async def achat_stream(self, model: str, messages: list[dict], options: dict | None = None,
+                           timings: RequestTimings | None = None, **extra):
+        """
+        Generador asíncrono de los objetos JSON que Ollama envía por /api/chat. La cancelación
+        es la de asyncio: cancelar la tarea que consume el iterador cierra la respuesta en curso.
+        """
+        payload = {"model": model, "messages": messages, "stream": True, **extra}
+        if options:
+            payload["options"] = options
+        async for data in self._astream_ndjson("/api/chat", payload, timings):
+            yield data
+
+    async def aembed(self, model: str, inputs: list[str], keep_alive: str | int | None = None) -> dict:
+        """
+        Versión asíncrona de embed. Devuelve la respuesta entera de /api/embed: además de
+        `embeddings` trae `prompt_eval_count` (tokens procesados) para medir el rendimiento.
+        """
+        payload = {"model": model, "input": inputs}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        response = await self._async_client().post("/api/embed", json=payload)
+        if response.status_code >= 400:
+            raise OllamaError(f"Ollama {response.status_code}: {_error_text(response)}",
+                              status_code=response.status_code)
+        return response.json()
+
+    async def _astream_ndjson(self, path: str, payload: dict, timings):
+        recorder = TraceRecorder(timings if timings is not None else RequestTimings())
+        try:
+            async with self._async_client().stream("POST", path, json=payload,
+                                                   extensions={"trace": recorder.atrace}) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise OllamaError(f"Ollama {response.status_code}: {_error_text(response)}",
+                                      status_code=response.status_code)
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "error" in data:
+                        raise OllamaError(data["error"])
+                    if data.get("message", {}).get("content"):
+                        recorder.first_token()
+                    yield data
+        finally:
+            recorder.timings.total_s = recorder.elapsed()
+
+    def close(self):
+        self._client.close()
+        self._aclients.close()
+
+    async def aclose(self):
+        await self._aclients.aclose()
+
+
+def _error_text(response: httpx.Response) -> str:
+    try:
+        return response.json().get("error", response.text)
+    except ValueError:
+        return response.text
+
+
+# --- Registro de clientes compartidos (uno por base_url y por proceso) ---
+_clients: dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: str | None = None) -> OllamaClient:
+    key = (base_url or DEFAULT_BASE_URL).rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OllamaClient(key)
+            _clients[key] = client
+        return client
+
+
+async def aclose_all_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.aclose()
+
+
+@atexit.register
+def close_all_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
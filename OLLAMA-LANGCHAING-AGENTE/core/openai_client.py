@@ -0,0 +1,174 @@
+# OLLAMA-LANGCHAING-AGENTE/core/openai_client.py
+import json
+import sys
+import threading
+
+import httpx
+
+from core.http_trace import RequestTimings, TraceRecorder
+from core.loop_clients import LoopClients
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class OpenAIError(RuntimeError):
+    """Error devuelto por un proveedor compatible con OpenAI (status HTTP != 2xx o error en el stream)."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OpenAICompatClient:
+    """
+    Cliente nativo de /chat/completions para proveedores compatibles con OpenAI (DeepSeek,
+    OpenRouter, OpenAI...), con pool de conexiones keep-alive y SSE leído según llega.
+    Como en OllamaClient, cancelar la tarea que consume el stream cierra esa conexión al
+    instante: el proveedor deja de generar (y de facturar) y el hueco del pool se libera.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: str | None = None,
+                 headers: dict | None = None, max_connections: int = 16,
+                 keepalive_expiry: float = 300.0, connect_timeout: float = 10.0):
+        self.base_url = base_url.rstrip("/")
+        headers = dict(headers or {})
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        self._client_kwargs = dict(
+            base_url=self.base_url,
+            headers=headers,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            # Sin timeout de lectura: los modelos de razonamiento pueden tardar en el primer token
+            timeout=httpx.Timeout(None, connect=connect_timeout),
+        )
+        # Los clientes async quedan ligados al event loop donde se crearon: uno por loop.
+        self._aclients = LoopClients(**self._client_kwargs)
+
+    def _async_client(self) -> httpx.AsyncClient:
+        return self._aclients.get()
+
+    async def achat_stream(self, model: str, messages: list[dict], timings: RequestTimings | None = None,
+                           **params):
+        """
+        Objetos JSON de cada evento SSE de /chat/completions (chat.completion.chunk).
+        Se pide `include_usage`: el último evento trae el usage, sin choices.
+        """
+        payload = {"model": model, "messages": messages, "stream": True,
+                   "stream_options": {"include_usage": True}, **params}
+        recorder = TraceRecorder(timings if timings is not None else RequestTimings())
+        try:
+            async with self._async_client().stream("POST", "/chat/completions", json=payload,
+                                                   extensions={"trace": recorder.atrace}) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise OpenAIError(f"{self.base_url} {response.status_code}: {_error_text(response)}",
+                                      status_code=response.status_code)
+
+                async for data in sse_data(response.aiter_lines()):
+                    if data == "[DONE]":
+                        continue  # no se corta: agotar el cuerpo deja la conexión reutilizable
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    if event.get("error"):
+                        # OpenRouter y otros avisan de los fallos a mitad de stream así
+                        raise OpenAIError(_error_message(event["error"]))
+                    yield event
+        finally:
+            recorder.timings.total_s = recorder.elapsed()
+
+    async def aclose(self):
+        await self._aclients.aclose()
+
+
+async def sse_data(lines):
+    """Campo `data` de cada evento SSE (varias líneas data se unen con \\n); ignora comentarios y event/id."""
+    data = []
+    async for line in lines:
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue  # keep-alive (": OPENROUTER PROCESSING")
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        yield "\n".join(data)
+
+
+def usage_metadata(usage: dict) -> dict:
+    """`usage` de OpenAI con el formato de usage_metadata de LangChain (el que leen las métricas)."""
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached is None:
+        cached = usage.get("prompt_cache_hit_tokens")  # DeepSeek
+    result = {"input_tokens": usage.get("prompt_tokens", 0), "output_tokens": usage.get("completion_tokens", 0),
+              "total_tokens": usage.get("total_tokens", 0)}
+    if cached is not None:
+        result["input_token_details"] = {"cache_read": cached}
+    return result
+
+
+def openai_endpoint(llm) -> tuple[str, str | None] | None:
+    """(base_url, api_key) si el llm es un chat model de langchain_openai (ChatOpenAI, ChatDeepSeek...)."""
+    # Sin importar langchain_openai: si no está cargado, el llm no puede ser uno de los suyos.
+    module = sys.modules.get("langchain_openai.chat_models.base")
+    if module is None or not isinstance(llm, module.BaseChatOpenAI):
+        return None
+    if getattr(llm, "azure_endpoint", None):
+        return None  # Azure usa otras rutas (deployments, api-version)
+    base_url = getattr(llm, "api_base", None) or llm.openai_api_base or DEFAULT_BASE_URL  # api_base: DeepSeek
+    api_key = llm.openai_api_key.get_secret_value() if llm.openai_api_key else None
+    return base_url, api_key
+
+
+# Atributos del chat model que pasan tal cual al cuerpo de la petición
+_REQUEST_PARAMS = ("temperature", "max_tokens", "top_p", "stop", "frequency_penalty", "presence_penalty", "seed")
+
+
+def request_params(llm) -> dict:
+    params = {name: getattr(llm, name) for name in _REQUEST_PARAMS if getattr(llm, name, None) is not None}
+    params.update(getattr(llm, "model_kwargs", None) or {})
+    params.update(getattr(llm, "extra_body", None) or {})
+    return params
+
+
+def _error_message(error) -> str:
+    return error.get("message", str(error)) if isinstance(error, dict) else str(error)
+
+
+def _error_text(response: httpx.Response) -> str:
+    try:
+        return _error_message(response.json().get("error", response.text))
+    except ValueError:
+        return response.text
+
+
+# --- Registro de clientes compartidos (uno por base_url, clave y cabeceras, por proceso) ---
+_clients: dict[tuple, OpenAICompatClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(base_url: str | None = None, api_key: str | None = None,
+                      headers: dict | None = None) -> OpenAICompatClient:
+    key = ((base_url or DEFAULT_BASE_URL).rstrip("/"), api_key, tuple(sorted((headers or {}).items())))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAICompatClient(key[0], api_key, headers)
+            _clients[key] = client
+        return client
+
+
+async def aclose_all_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.aclose()
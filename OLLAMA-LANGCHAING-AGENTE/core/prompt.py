@@ -0,0 +1,53 @@
+# OLLAMA-LANGCHAING-AGENTE/core/prompt.py
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from core.history import estimate_tokens
+
+
+class PromptAssembler:
+    """
+    Arma los mensajes de cada petición en un orden fijo para aprovechar la caché de prefijo
+    (KV cache de Ollama, prompt cache de DeepSeek):
+      1. system prompt + contexto fijado (un único SystemMessage construido una sola vez)
+      2. historial, que solo crece por el final
+      3. mensaje del usuario y, detrás, el contenido volátil del turno
+    Todo lo que cambia entre peticiones queda al final, así el prefijo es idéntico byte a byte
+    mientras el historial no se recorte ni se pliegue (ConversationHistory lo hace por bloques).
+    """
+
+    def __init__(self, system_prompt: str | None = None, pinned=()):
+        sections = [text.strip() for text in [system_prompt or "", *pinned] if text and text.strip()]
+        self._prefix = [SystemMessage(content="\n\n".join(sections))] if sections else []
+        self._previous: list = []
+        self.stable_prefix_tokens = 0  # tokens iniciales idénticos a la petición anterior
+        self.grown_tokens = 0  # tokens (estimados) a partir de donde se desvía de la anterior
+
+    @classmethod
+    def from_files(cls, system_prompt: str | None = None, pin_paths=()):
+        pinned = []
+        for path in pin_paths:
+            with open(path, "r", encoding="utf-8") as f:
+                pinned.append(f"Contexto fijado ({path}):\n{f.read()}")
+        return cls(system_prompt, pinned)
+
+    @property
+    def prefix_tokens(self) -> int:
+        return sum(estimate_tokens(m.content) for m in self._prefix)
+
+    def build(self, history_messages, user_input: str, volatile: str | None = None) -> list:
+        # El historial guarda el mensaje sin la parte volátil: solo este turno se desvía del prefijo
+        content = f"{user_input}\n\n{volatile}" if volatile else user_input
+        messages = [*self._prefix, *history_messages, HumanMessage(content=content)]
+        self.stable_prefix_tokens = _common_prefix_tokens(self._previous, messages)
+        self.grown_tokens = sum(estimate_tokens(m.content) for m in messages) - self.stable_prefix_tokens
+        self._previous = messages
+        return messages
+
+
+def _common_prefix_tokens(previous: list, current: list) -> int:
+    tokens = 0
+    for old, new in zip(previous, current):
+        if type(old) is not type(new) or old.content != new.content:
+            break
+        tokens += estimate_tokens(new.content)
+    return tokens
@@ -0,0 +1,97 @@
+# OLLAMA-LANGCHAING-AGENTE/core/providers.py
+import importlib
+import os
+from importlib.metadata import entry_points
+
+# Grupo de entry points para proveedores de terceros, p. ej. en su pyproject.toml:
+#   [project.entry-points."tron.providers"]
+#   miproveedor = "mi_paquete.modulo:crear_llm"
+# La fábrica recibe el bloque `config` del modelo (dict) y devuelve un chat model de LangChain.
+ENTRY_POINT_GROUP = "tron.providers"
+
+# Proveedores incluidos: "módulo:función", importados solo en el primer uso.
+BUILTIN_PROVIDERS = {
+    "ollama": "core.providers:build_ollama",
+    "deepseek": "core.providers:build_deepseek",
+    "openrouter": "core.providers:build_openrouter",
+}
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+_factories = {}
+
+
+def build_ollama(config: dict):
+    if config.get("base_urls"):
+        # Varios hosts: se reparte por peticiones en curso (core/endpoints.py)
+        from core.routed_ollama import RoutedChatOllama
+        return RoutedChatOllama(**{"base_url": config["base_urls"][0], **config})
+    from langchain_ollama.chat_models import ChatOllama
+    return ChatOllama(**config)
+
+
+def build_deepseek(config: dict):
+    from langchain_deepseek.chat_models import ChatDeepSeek
+    deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not deepseek_api_key:
+        raise ValueError("DEEPSEEK_API_KEY no encontrada.")
+    # stream_usage: el último chunk trae usage (incluidos los prompt_cache_hit_tokens)
+    return ChatDeepSeek(**{"stream_usage": True, **config, "api_key": deepseek_api_key})
+
+
+def build_openrouter(config: dict):
+    # Modelos de OpenRouter (como en OLD/core/factory.py) a través de su API compatible con OpenAI
+    from langchain_openai.chat_models import ChatOpenAI
+    openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+    if not openrouter_api_key:
+        raise ValueError("OPENROUTER_API_KEY no encontrada.")
+    return ChatOpenAI(**{"base_url": OPENROUTER_BASE_URL, **config, "api_key": openrouter_api_key})
+
+
+def register_provider(name: str, factory):
+    """Registra (o reemplaza) la fábrica de un proveedor en tiempo de ejecución."""
+    _factories[name] = factory
+
+
+def _load_target(target: str):
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_provider(name: str):
+    """Devuelve la fábrica del proveedor, importándola la primera vez que se pide."""
+    factory = _factories.get(name)
+    if factory is not None:
+        return factory
+
+    if name in BUILTIN_PROVIDERS:
+        factory = _load_target(BUILTIN_PROVIDERS[name])
+    else:
+        matches = [ep for ep in entry_points(group=ENTRY_POINT_GROUP) if ep.name == name]
+        if not matches:
+            raise ValueError(f"Proveedor '{name}' no soportado.")
+        factory = matches[0].load()
+
+    _factories[name] = factory
+    return factory
+
+
+def available_providers() -> list[str]:
+    names = set(BUILTIN_PROVIDERS) | set(_factories)
+    names |= {ep.name for ep in entry_points(group=ENTRY_POINT_GROUP)}
+    return sorted(names)
+
+
+def create_llm(provider: str, config: dict):
+    return get_provider(provider)(dict(config))
+
+
+def with_generation_params(llm, temperature: float | None = None, max_tokens: int | None = None):
+    """Copia del llm con otra temperatura o máximo de tokens (num_predict en Ollama); el mismo si no cambia nada."""
+    from core.engine import is_ollama
+    update = {}
+    if temperature is not None:
+        update["temperature"] = temperature
+    if max_tokens is not None:
+        update["num_predict" if is_ollama(llm) else "max_tokens"] = max_tokens
+    return llm.model_copy(update=update) if update else llm
@@ -0,0 +1,122 @@
+# OLLAMA-LANGCHAING-AGENTE/core/render.py
+import json
+import sys
+import threading
+import time
+
+
+class JsonlEventSink:
+    """Sink que registra cada frame (y marcas de turno) como eventos JSONL con timestamp."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, text: str):
+        self.mark("text", text=text)
+
+    def mark(self, event_type: str, **fields):
+        self._file.write(json.dumps({"ts": time.time(), "type": event_type, **fields},
+                                    ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class StreamRenderer:
+    """
+    Salida del streaming por frames: feed() solo añade el chunk a una lista y un hilo
+    escritor vuelca lo acumulado a la terminal como mucho `max_fps` veces por segundo,
+    o en cuanto llega un salto de línea. Así un stdout lento (p. ej. un pipe) no frena
+    la lectura de la red, y se evita un write+flush por token.
+    Los `sinks` (objetos con write/flush: transcript, JsonlEventSink...) reciben los mismos frames.
+    """
+
+    def __init__(self, out=None, max_fps: float = 30.0, sinks=()):
+        self.out = out if out is not None else sys.stdout
+        self.sinks = list(sinks)
+        self.interval = 1.0 / max_fps
+        self.chunks: list[str] = []
+        self._pending: list[str] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_frames, daemon=True)
+        self._writer.start()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, text: str):
+        self.chunks.append(text)
+        with self._lock:
+            self._pending.append(text)
+        if "\n" in text:
+            self._wake.set()
+
+    def close(self) -> str:
+        """Vuelca lo pendiente, detiene el hilo escritor y devuelve el texto completo."""
+        if not self._closed:
+            with self._lock:
+                self._closed = True
+            self._wake.set()
+            self._writer.join()
+        return self.text
+
+    def _write_frames(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                frame = "".join(self._pending)
+                self._pending.clear()
+                closing = self._closed
+            if frame:
+                for target in [self.out, *self.sinks]:
+                    try:
+                        target.write(frame)
+                        target.flush()
+                    except (OSError, ValueError):
+                        pass  # terminal o sink cerrado: no debe tumbar la generación
+            if closing:
+                return
+
+
+class TranscriptSink:
+    """Transcript legible de la sesión: los frames tal cual y las marcas de turno como texto."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, text: str):
+        self._file.write(text)
+
+    def mark(self, event_type: str, **fields):
+        if event_type == "user":
+            self._file.write(f"\n\nTú: {fields.get('text', '')}\nAgente: ")
+        elif event_type == "cancelled":
+            self._file.write("\n[interrumpido]")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_sinks(transcript_path: str | None = None, events_path: str | None = None) -> list:
+    sinks = []
+    if transcript_path:
+        sinks.append(TranscriptSink(transcript_path))
+    if events_path:
+        sinks.append(JsonlEventSink(events_path))
+    return sinks
+
+
+def mark_sinks(sinks, event_type: str, **fields):
+    for sink in sinks:
+        sink.mark(event_type, **fields)
+        sink.flush()
@@ -0,0 +1,201 @@
+# OLLAMA-LANGCHAING-AGENTE/core/response_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import aclosing
+
+from core.engine import ChatStream
+from core.ollama_client import RequestTimings
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "tron", "respuestas.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+REPLAY_MODES = ("instant", "native")
+
+# Claves de `config` que no cambian la respuesta y no deben acabar en la clave (ni en disco)
+_IGNORED_CONFIG_KEYS = {"api_key", "base_url"}
+
+
+def cache_key(model_id: str, config: dict, messages, options: dict | None = None) -> str:
+    """Hash canónico del modelo, su configuración resuelta, las opciones de la petición y los mensajes."""
+    payload = {
+        "model": model_id,
+        "config": {k: v for k, v in (config or {}).items() if k not in _IGNORED_CONFIG_KEYS},
+        "options": options or {},
+        "messages": [[type(m).__name__, m.content] for m in messages],
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caché persistente de respuestas exactas (SQLite), opt-in para one-shot y lote.
+    Se expulsan las entradas usadas hace más tiempo cuando el total supera `max_bytes`.
+    Solo se cachean generaciones deterministas (temperature == 0) salvo `allow_nondeterministic`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 allow_nondeterministic: bool = False, replay: str = "instant"):
+        if replay not in REPLAY_MODES:
+            raise ValueError(f"Modo de reproducción '{replay}' no válido ({', '.join(REPLAY_MODES)})")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.allow_nondeterministic = allow_nondeterministic
+        self.replay = replay
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL: varios jobs nocturnos pueden leer mientras otro escribe
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+            "entry TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    def cacheable(self, llm) -> bool:
+        return self.allow_nondeterministic or getattr(llm, "temperature", None) == 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, model_id: str, entry: dict):
+        data = json.dumps(entry, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, entry, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, model_id, data, size, now, now))
+            self.stats["stored"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats["evicted"] += len(victims)
+
+    def stream(self, model_id: str, model_info: dict | None, llm, messages, options: dict | None = None):
+        """
+        Devuelve un objeto con la interfaz de ChatStream: la reproducción de la respuesta
+        guardada si hay acierto, o un ChatStream que la guarda al terminar sin cancelación.
+        """
+        if not self.cacheable(llm):
+            self.stats["bypassed"] += 1
+            return ChatStream(llm, messages, options)
+        key = cache_key(model_id, (model_info or {}).get("config", {}), messages, options)
+        entry = self.get(key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return ReplayStream(entry, messages, options, native=self.replay == "native")
+        self.stats["misses"] += 1
+        return RecordingChatStream(llm, messages, options,
+                                   on_complete=lambda done: self.put(key, model_id, _entry_from(done)))
+
+    @property
+    def hit_rate(self) -> float | None:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else None
+
+    def format_stats(self) -> str:
+        s = self.stats
+        rate = f"{self.hit_rate * 100:.0f}%" if self.hit_rate is not None else "-"
+        return (f"Caché de respuestas: {s['hits']} aciertos, {s['misses']} fallos ({rate}), "
+                f"{s['bypassed']} sin cachear (temperature > 0), {s['evicted']} expulsadas")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _entry_from(chat_stream) -> dict:
+    return {"chunks": chat_stream.chunks, "chunk_times": chat_stream.chunk_times,
+            "final": chat_stream.final, "usage": chat_stream.usage}
+
+
+class RecordingChatStream(ChatStream):
+    """ChatStream que entrega el resultado a `on_complete` solo si la generación termina entera."""
+
+    def __init__(self, llm, messages, options=None, on_complete=None):
+        super().__init__(llm, messages, options)
+        self._on_complete = on_complete
+
+    async def _generate(self):
+        async with aclosing(super()._generate()) as chunks:
+            async for text in chunks:
+                yield text
+        if self._on_complete:
+            self._on_complete(self)
+
+
+class ReplayStream:
+    """
+    Reproduce una respuesta cacheada con la interfaz de ChatStream. Con `native` respeta
+    los tiempos de llegada originales de cada chunk; si no, la entrega de inmediato.
+    Los contadores del servidor no se copian: la telemetría refleja la reproducción.
+    """
+
+    cached = True
+
+    def __init__(self, entry: dict, messages, options: dict | None = None, native: bool = False):
+        self.llm = None
+        self.messages = messages
+        self.options = dict(options or {})
+        self.entry = entry
+        self.native = native
+        self.chunks: list[str] = []
+        self.chunk_times: list[float] = []
+        self.final: dict | None = None
+        self.usage: dict | None = None
+        self.timings = RequestTimings()
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def _generate(self):
+        start = time.perf_counter()
+        try:
+            for text, at in zip(self.entry["chunks"], self.entry["chunk_times"]):
+                if self.native:
+                    await asyncio.sleep(max(at - (time.perf_counter() - start), 0))
+                elapsed = time.perf_counter() - start
+                if self.timings.ttft_s is None:
+                    self.timings.ttft_s = elapsed
+                self.chunk_times.append(elapsed)
+                self.chunks.append(text)
+                yield text
+        finally:
+            self.timings.total_s = time.perf_counter() - start
+
+    async def collect(self) -> str:
+        async for _ in self:
+            pass
+        return self.content
@@ -0,0 +1,158 @@
+# OLLAMA-LANGCHAING-AGENTE/core/routed_ollama.py
+import httpx
+from langchain_ollama.chat_models import ChatOllama
+from pydantic import model_validator
+
+from core.endpoints import DEFAULT_HEALTH_CHECK_S, EndpointPool, get_endpoint_pool, is_host_failure
+
+
+def _route(request: httpx.Request, url: str):
+    """Reescribe la petición (construida contra base_url) para que vaya al host elegido."""
+    target = httpx.URL(url)
+    request.url = request.url.copy_with(scheme=target.scheme, host=target.host, port=target.port)
+    request.headers["Host"] = request.url.netloc.decode("ascii")
+
+
+class _LeasedStream(httpx.SyncByteStream):
+    """Cuerpo de la respuesta que devuelve el host al pool cuando se termina de leer o se cierra."""
+
+    def __init__(self, stream, pool: EndpointPool, url: str, failed: bool):
+        self.stream, self.pool, self.url, self.failed = stream, pool, url, failed
+        self._released = False
+
+    def __iter__(self):
+        try:
+            yield from self.stream
+        except Exception as e:
+            self.failed = self.failed or is_host_failure(e)
+            raise
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self.pool.checkin(self.url, self.failed)
+
+
+class _AsyncLeasedStream(httpx.AsyncByteStream):
+    def __init__(self, stream, pool: EndpointPool, url: str, failed: bool):
+        self.stream, self.pool, self.url, self.failed = stream, pool, url, failed
+        self._released = False
+
+    async def __aiter__(self):
+        try:
+            async for part in self.stream:
+                yield part
+        except Exception as e:
+            self.failed = self.failed or is_host_failure(e)
+            raise
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self.pool.checkin(self.url, self.failed)
+
+
+class RoutedTransport(httpx.BaseTransport):
+    """
+    Transporte de httpx que reparte cada petición entre los hosts de un EndpointPool.
+    Si el host falla antes de responder (red caída o 5xx) se reintenta en otro; una vez
+    llegan las cabeceras la respuesta se queda en ese host hasta cerrarse.
+    """
+
+    def __init__(self, pool: EndpointPool, transport: httpx.BaseTransport | None = None):
+        self.pool = pool
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tried = []
+        while True:
+            url = self.pool.checkout(exclude=tried)
+            tried.append(url)
+            last = len(tried) >= len(self.pool.urls)
+            _route(request, url)
+            try:
+                response = self.transport.handle_request(request)
+            except Exception as e:
+                self.pool.checkin(url, failed=is_host_failure(e))
+                if last or not is_host_failure(e):
+                    raise
+                continue
+            failed = response.status_code >= 500
+            if failed and not last:
+                response.close()
+                self.pool.checkin(url, failed=True)
+                continue
+            return httpx.Response(response.status_code, headers=response.headers, request=request,
+                                  stream=_LeasedStream(response.stream, self.pool, url, failed),
+                                  extensions=response.extensions)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRoutedTransport(httpx.AsyncBaseTransport):
+    """Versión asíncrona de RoutedTransport."""
+
+    def __init__(self, pool: EndpointPool, transport: httpx.AsyncBaseTransport | None = None):
+        self.pool = pool
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tried = []
+        while True:
+            url = self.pool.checkout(exclude=tried)
+            tried.append(url)
+            last = len(tried) >= len(self.pool.urls)
+            _route(request, url)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except Exception as e:
+                self.pool.checkin(url, failed=is_host_failure(e))
+                if last or not is_host_failure(e):
+                    raise
+                continue
+            failed = response.status_code >= 500
+            if failed and not last:
+                await response.aclose()
+                self.pool.checkin(url, failed=True)
+                continue
+            return httpx.Response(response.status_code, headers=response.headers, request=request,
+                                  stream=_AsyncLeasedStream(response.stream, self.pool, url, failed),
+                                  extensions=response.extensions)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class RoutedChatOllama(ChatOllama):
+    """
+    ChatOllama repartido entre varios hosts (`base_urls` en models.yaml).
+    `base_url` queda apuntando al primero; los clientes de ollama que crea ChatOllama reciben
+    un transporte de httpx que toma el host del EndpointPool compartido con ChatStream, así
+    cada llamada de LangChain (invoke/stream, p. ej. el resumen del historial) se reparte y,
+    si el host falla antes de responder, se reintenta en otro. Solo se usan opciones públicas
+    (sync_client_kwargs/async_client_kwargs), nada interno de ChatOllama.
+    """
+
+    base_urls: list[str]
+    health_check_s: float = DEFAULT_HEALTH_CHECK_S
+
+    @model_validator(mode="before")
+    @classmethod
+    def _routed_transports(cls, values: dict) -> dict:
+        if not isinstance(values, dict) or not values.get("base_urls"):
+            return values
+        pool = get_endpoint_pool(values["base_urls"],
+                                 health_check_s=values.get("health_check_s", DEFAULT_HEALTH_CHECK_S))
+        return {
+            **values,
+            "sync_client_kwargs": {**(values.get("sync_client_kwargs") or {}), "transport": RoutedTransport(pool)},
+            "async_client_kwargs": {**(values.get("async_client_kwargs") or {}),
+                                    "transport": AsyncRoutedTransport(pool)},
+        }
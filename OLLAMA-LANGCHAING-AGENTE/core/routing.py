@@ -0,0 +1,217 @@
+# OLLAMA-LANGCHAING-AGENTE/core/routing.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from core.ollama_client import RequestTimings
+
+
+@dataclass
+class RoutingPolicy:
+    """
+    Bloque `routing` de models.yaml:
+      primary           modelo que atiende normalmente (p. ej. el Ollama local)
+      fallbacks         modelos a los que pasar, en orden
+      ttft_deadline_ms  sin primer token en este tiempo se abandona el intento y se pasa al siguiente
+      hedge_after_ms    sin primer token en este tiempo se lanza ya el siguiente en paralelo;
+                        gana el primero que emite un token y el otro se cancela
+    """
+    primary: str
+    fallbacks: list[str] = field(default_factory=list)
+    ttft_deadline_s: float | None = None
+    hedge_after_s: float | None = None
+
+    @classmethod
+    def from_config(cls, all_configs: dict):
+        settings = (all_configs or {}).get("routing")
+        if not settings or not settings.get("primary"):
+            return None
+
+        def seconds(key):
+            value = settings.get(key)
+            return value / 1000 if value else None
+
+        return cls(primary=settings["primary"], fallbacks=list(settings.get("fallbacks", [])),
+                   ttft_deadline_s=seconds("ttft_deadline_ms"), hedge_after_s=seconds("hedge_after_ms"))
+
+    @property
+    def chain(self) -> list[str]:
+        return [self.primary, *self.fallbacks]
+
+
+class _Attempt:
+    def __init__(self, model_id: str, stream):
+        self.model_id = model_id
+        self.stream = stream
+        self.iterator = stream.__aiter__()
+        self.launched_at = time.perf_counter()
+        self.first = asyncio.ensure_future(self.iterator.__anext__())
+
+    async def cancel(self):
+        # Cancelar la espera del primer chunk cierra el generador y con él su conexión HTTP
+        self.first.cancel()
+        await asyncio.gather(self.first, return_exceptions=True)
+        await self.iterator.aclose()
+
+
+class RoutedStream:
+    """
+    Iterador con la interfaz de ChatStream que aplica un RoutingPolicy.
+    `attempts` es una lista de (model_id, fábrica) en orden de preferencia; la fábrica
+    devuelve el ChatStream de ese modelo (o None si no se puede usar) y solo se llama
+    al lanzar el intento. Una vez llega el primer token no hay más cambios de modelo.
+    Tras consumirlo, model_id dice quién respondió y events por qué.
+    """
+
+    def __init__(self, attempts, policy: RoutingPolicy):
+        self.attempts = list(attempts)
+        self.policy = policy
+        self.events: list[str] = []
+        self.model_id: str | None = None
+        self.stream = None  # ChatStream ganador (o el último lanzado)
+        self.timings = RequestTimings()
+
+    # --- Interfaz de ChatStream, delegada en el intento ganador ---
+    @property
+    def llm(self):
+        return self.stream.llm if self.stream else None
+
+    @property
+    def messages(self):
+        return self.stream.messages if self.stream else []
+
+    @property
+    def options(self):
+        return self.stream.options if self.stream else {}
+
+    @property
+    def cached(self):
+        return self.stream.cached if self.stream else False
+
+    @property
+    def chunks(self):
+        return self.stream.chunks if self.stream else []
+
+    @property
+    def chunk_times(self):
+        return self.stream.chunk_times if self.stream else []
+
+    @property
+    def final(self):
+        return self.stream.final if self.stream else None
+
+    @property
+    def usage(self):
+        return self.stream.usage if self.stream else None
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    @property
+    def rerouted(self) -> bool:
+        return self.model_id is not None and self.model_id != self.policy.primary
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def collect(self) -> str:
+        async for _ in self:
+            pass
+        return self.content
+
+    def _launch(self, pending: list, queue: list, reason: str | None = None) -> bool:
+        while queue:
+            model_id, factory = queue.pop(0)
+            stream = factory()
+            if stream is None:
+                self.events.append(f"{model_id}: no disponible")
+                continue
+            if reason:
+                self.events.append(f"{reason} -> {model_id}")
+            self.stream = stream
+            pending.append(_Attempt(model_id, stream))
+            return True
+        return False
+
+    def _next_timer(self, pending: list, queue: list, hedged: bool) -> float | None:
+        if not queue:
+            return None
+        timers = []
+        if self.policy.hedge_after_s and not hedged and len(pending) == 1:
+            timers.append(pending[0].launched_at + self.policy.hedge_after_s)
+        if self.policy.ttft_deadline_s:
+            timers.extend(a.launched_at + self.policy.ttft_deadline_s for a in pending)
+        return min(timers) if timers else None
+
+    async def _generate(self):
+        start = time.perf_counter()
+        queue = list(self.attempts)
+        pending: list[_Attempt] = []
+        winner, first_text, last_error = None, None, None
+        hedged = False
+        self._launch(pending, queue)
+        try:
+            while winner is None:
+                if not pending:
+                    if last_error is not None:
+                        raise last_error
+                    raise RuntimeError("Ningún modelo de la política de routing está disponible")
+
+                timer = self._next_timer(pending, queue, hedged)
+                timeout = max(timer - time.perf_counter(), 0) if timer is not None else None
+                done, _ = await asyncio.wait([a.first for a in pending], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                for attempt in [a for a in pending if a.first in done]:
+                    pending.remove(attempt)
+                    try:
+                        first_text = attempt.first.result()
+                    except StopAsyncIteration:
+                        first_text = ""  # respuesta vacía: también es una respuesta
+                    except Exception as e:
+                        last_error = e
+                        self.events.append(f"{attempt.model_id}: error ({e})")
+                        if not pending:
+                            self._launch(pending, queue, "fallo")
+                        continue
+                    winner = attempt
+                    break
+
+                if winner is None and not done:
+                    now = time.perf_counter()
+                    expired = [a for a in pending if self.policy.ttft_deadline_s
+                               and now - a.launched_at >= self.policy.ttft_deadline_s]
+                    if expired and queue:
+                        for attempt in expired:
+                            pending.remove(attempt)
+                            await attempt.cancel()
+                        self._launch(pending, queue,
+                                     f"{expired[0].model_id} sin primer token en "
+                                     f"{self.policy.ttft_deadline_s * 1000:.0f} ms")
+                    elif self.policy.hedge_after_s and not hedged and len(pending) == 1 and queue:
+                        hedged = True
+                        self._launch(pending, queue, f"hedge tras {self.policy.hedge_after_s * 1000:.0f} ms")
+        finally:
+            for attempt in pending:
+                if attempt is not winner:
+                    await attempt.cancel()
+            if winner is None:
+                self.timings.total_s = time.perf_counter() - start
+
+        self.model_id = winner.model_id
+        self.stream = winner.stream
+        self.timings.connect_s = winner.stream.timings.connect_s
+        if self.rerouted:
+            self.events.append(f"respondió {winner.model_id}")
+        try:
+            if first_text:
+                self.timings.ttft_s = time.perf_counter() - start
+                yield first_text
+            async for text in winner.iterator:
+                if self.timings.ttft_s is None and text:
+                    self.timings.ttft_s = time.perf_counter() - start
+                yield text
+        finally:
+            await winner.iterator.aclose()
+            self.timings.total_s = time.perf_counter() - start
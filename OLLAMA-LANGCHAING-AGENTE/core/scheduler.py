@@ -0,0 +1,245 @@
+# OLLAMA-LANGCHAING-AGENTE/core/scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import aclosing, asynccontextmanager
+from contextvars import ContextVar, copy_context
+
+DEFAULT_MAX_QUEUE = 64
+# De mayor a menor prioridad
+PRIORITIES = ("interactive", "normal", "batch")
+
+
+class QueueFull(RuntimeError):
+    def __init__(self, model_id: str):
+        super().__init__(f"Cola llena para '{model_id}', reintenta más tarde")
+        self.model_id = model_id
+
+
+class SlotLost(RuntimeError):
+    """Un stream enganchado a una generación ajena (coalescencia) se quedó sin ella al expulsar a su dueño."""
+
+    def __init__(self):
+        super().__init__("La generación compartida perdió su hueco")
+
+
+class Lease:
+    """Hueco concedido a una petición en un modelo."""
+
+    def __init__(self, model_id: str, priority: str, preemptible: bool):
+        self.model_id = model_id
+        self.priority = priority
+        self.rank = PRIORITIES.index(priority)
+        self.preemptible = preemptible
+        self.preempted = False
+        self.started_at: float | None = None
+        self.task: asyncio.Task | None = None  # la generación, para poder expulsarla
+
+
+# Hueco de la generación que se ejecuta en esta tarea (lo fija run() en la tarea que crea)
+current_lease: ContextVar[Lease | None] = ContextVar("current_lease", default=None)
+
+
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.running: list[Lease] = []
+        self.waiters: list[tuple] = []  # heap de (rank, seq, future, lease)
+
+
+class PriorityScheduler:
+    """
+    Reparto de los huecos de cada modelo entre clases de prioridad (interactive > normal > batch):
+      - cada modelo ejecuta a la vez como mucho su límite de concurrencia;
+      - al liberarse un hueco pasa la petición en espera de más prioridad (FIFO dentro de la clase);
+      - `class_caps` limita cuántos huecos de un modelo puede ocupar una clase (p. ej. batch: 1),
+        así el trabajo de fondo nunca ocupa toda la capacidad;
+      - con `preempt`, una petición que espera expulsa a la de menor prioridad en curso si es
+        expulsable: se cancela su generación (lo que cierra la respuesta HTTP) y vuelve a la cola;
+      - solo `max_waiting` peticiones pueden esperar; las demás reciben QueueFull;
+      - run_stream() entrega los chunks según llegan y, si lo expulsan, continúa desde lo emitido
+        (solo con streams que saben continuar, hoy los de Ollama; el resto no es expulsable).
+    Lo comparten el servidor HTTP (core/server.py) y el demonio (core/daemon.py); en proceso lo usan
+    el chat, el one-shot y el lote (agents/general.py, core/batch.py).
+    """
+
+    def __init__(self, max_waiting: int = DEFAULT_MAX_QUEUE, class_caps: dict | None = None,
+                 preempt: bool = False):
+        unknown = set(class_caps or {}) - set(PRIORITIES)
+        if unknown:
+            raise ValueError(f"Clases de prioridad desconocidas: {', '.join(sorted(unknown))}")
+        self.max_waiting = max_waiting
+        self.class_caps = dict(class_caps or {})
+        self.preempt = preempt
+        self.waiting = 0
+        self._models: dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._requeue_seq = itertools.count(-1, -1)  # los expulsados vuelven por delante de su clase
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "preempted": 0, "max_waiting_seen": 0,
+                      "wait_s": {p: 0.0 for p in PRIORITIES}, "by_class": {p: 0 for p in PRIORITIES}}
+
+    @classmethod
+    def from_config(cls, all_configs: dict, max_waiting: int = DEFAULT_MAX_QUEUE):
+        """Bloque `scheduler` de models.yaml (class_caps, preempt); sin él, sin límites por clase."""
+        settings = (all_configs or {}).get("scheduler") or {}
+        return cls(max_waiting, class_caps=settings.get("class_caps"), preempt=settings.get("preempt", False))
+
+    def register(self, model_id: str, limit: int):
+        self._models.setdefault(model_id, _ModelQueue(limit))
+
+    async def acquire(self, model_id: str, priority: str = "normal", preemptible: bool = False,
+                      requeued: bool = False) -> Lease:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridad '{priority}' no válida ({', '.join(PRIORITIES)})")
+        queue = self._models[model_id]
+        lease = Lease(model_id, priority, preemptible)
+        future = asyncio.get_running_loop().create_future()
+        seq = next(self._requeue_seq) if requeued else next(self._seq)
+        heapq.heappush(queue.waiters, (lease.rank, seq, future, lease))
+        self._dispatch(queue)
+        if future.done():
+            return lease
+
+        if self.waiting >= self.max_waiting and not requeued:
+            self._remove_waiter(queue, future)
+            self.stats["rejected"] += 1
+            raise QueueFull(model_id)
+        self.stats["queued"] += 1
+        self.waiting += 1
+        self.stats["max_waiting_seen"] = max(self.stats["max_waiting_seen"], self.waiting)
+        start = time.perf_counter()
+        self._maybe_preempt(queue, lease)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(lease)  # concedido justo cuando se cancelaba la espera
+            else:
+                self._remove_waiter(queue, future)
+            raise
+        finally:
+            self.waiting -= 1
+        self.stats["wait_s"][priority] += time.perf_counter() - start
+        return lease
+
+    def release(self, lease: Lease):
+        queue = self._models[lease.model_id]
+        if lease in queue.running:
+            queue.running.remove(lease)
+        self._dispatch(queue)
+
+    @asynccontextmanager
+    async def slot(self, model_id: str, priority: str = "normal"):
+        """Hueco no expulsable durante el bloque (trabajo que no se puede cortar ni continuar)."""
+        lease = await self.acquire(model_id, priority)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    async def run(self, model_id: str, make_coro, priority: str = "normal", preemptible: bool = True):
+        """
+        Ejecuta make_coro() en un hueco del modelo. Si la expulsan, vuelve a la cola por delante
+        de su clase y se repite desde el principio (make_coro debe crear una generación nueva).
+        """
+        requeued = False
+        while True:
+            lease = await self.acquire(model_id, priority, preemptible, requeued)
+            context = copy_context()
+            context.run(current_lease.set, lease)
+            lease.task = asyncio.get_running_loop().create_task(make_coro(), context=context)
+            try:
+                return await lease.task
+            except asyncio.CancelledError:
+                if not lease.preempted or asyncio.current_task().cancelling():
+                    raise
+                requeued = True
+            finally:
+                lease.task.cancel()
+                self.release(lease)
+
+    async def run_stream(self, model_id: str, make_stream, emit=None, priority: str = "normal",
+                         preemptible: bool = True, on_stream=None) -> str:
+        """
+        Consume una generación en un hueco del modelo pasando cada chunk a `await emit(texto)`
+        y devuelve el texto completo. `make_stream(prefijo)` crea la generación; con prefijo
+        (lo ya emitido) debe continuar esa respuesta (ver core.engine.continue_messages), así una
+        expulsión no repite ni contradice lo que el cliente ya recibió.
+        Los streams de caché o enganchados a una generación en curso no ocupan hueco; si esa
+        generación pierde el suyo (SlotLost), se continúa por la cola como cualquier otra.
+        `on_stream(stream)` se llama al empezar a consumir cada generación (métricas).
+        Solo se expulsa si además el stream lo admite (`resumable`, p. ej. ChatStream de Ollama):
+        los demás proveedores no continúan el prefijo, responderían otra vez desde el principio.
+        """
+        emitted: list[str] = []
+        pending = None
+
+        async def consume():
+            nonlocal pending
+            stream, pending = pending or make_stream("".join(emitted)), None
+            if on_stream:
+                on_stream(stream)
+            # aclosing: si la expulsión llega mientras se entrega un chunk, la generación se cierra igual
+            async with aclosing(aiter(stream)) as chunks:
+                async for text in chunks:
+                    emitted.append(text)
+                    if emit:
+                        await emit(text)
+
+        while True:
+            pending = make_stream("".join(emitted))
+            resumable = getattr(pending, "resumable", False)
+            try:
+                if getattr(pending, "cached", False) or getattr(pending, "coalesced", False):
+                    await consume()
+                else:
+                    await self.run(model_id, consume, priority, preemptible and resumable)
+                return "".join(emitted)
+            except SlotLost:
+                continue
+
+    def _dispatch(self, queue: _ModelQueue):
+        blocked = []
+        while queue.waiters and len(queue.running) < queue.limit:
+            entry = heapq.heappop(queue.waiters)
+            rank, _, future, lease = entry
+            if future.done():
+                continue  # espera cancelada
+            cap = self.class_caps.get(lease.priority)
+            if cap is not None and sum(1 for r in queue.running if r.priority == lease.priority) >= cap:
+                blocked.append(entry)
+                continue
+            lease.started_at = time.monotonic()
+            queue.running.append(lease)
+            self.stats["admitted"] += 1
+            self.stats["by_class"][lease.priority] += 1
+            future.set_result(lease)
+        for entry in blocked:
+            heapq.heappush(queue.waiters, entry)
+
+    def _maybe_preempt(self, queue: _ModelQueue, waiter: Lease):
+        if not self.preempt or len(queue.running) < queue.limit:
+            return
+        if any(r.preempted for r in queue.running):
+            return  # ya se está liberando un hueco
+        victims = [r for r in queue.running if r.preemptible and r.task is not None and r.rank > waiter.rank]
+        if not victims:
+            return
+        # La de menor prioridad y, entre ellas, la que menos trabajo perdería
+        victim = max(victims, key=lambda r: (r.rank, r.started_at))
+        victim.preempted = True
+        victim.task.cancel()
+        self.stats["preempted"] += 1
+
+    def _remove_waiter(self, queue: _ModelQueue, future):
+        queue.waiters = [entry for entry in queue.waiters if entry[2] is not future]
+        heapq.heapify(queue.waiters)
+
+    def format_stats(self) -> str:
+        s = self.stats
+        waits = ", ".join(f"{p} {s['by_class'][p]} (espera media "
+                          f"{s['wait_s'][p] / s['by_class'][p] * 1000 if s['by_class'][p] else 0:.0f} ms)"
+                          for p in PRIORITIES)
+        return (f"Planificador: {s['admitted']} admitidas, {s['queued']} encoladas, {s['rejected']} rechazadas, "
+                f"{s['preempted']} expulsadas | {waits}")
@@ -0,0 +1,373 @@
+# OLLAMA-LANGCHAING-AGENTE/core/server.py
+import asyncio
+import json
+import time
+import uuid
+from http import HTTPStatus
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.batch import provider_concurrency
+from core.context_window import ContextSizer
+from core.engine import ChatStream, continue_messages
+from core.metrics import TurnMetrics, describe_llm
+from core.providers import with_generation_params
+from core.scheduler import DEFAULT_MAX_QUEUE, PRIORITIES, PriorityScheduler, QueueFull
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+_ROLES = {"system": SystemMessage, "developer": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, error_type: str = "invalid_request_error",
+                 headers: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.error_type = error_type
+        self.headers = headers or {}
+
+
+def from_openai_messages(messages) -> list:
+    """Convierte los mensajes de /v1/chat/completions a mensajes LangChain."""
+    if not isinstance(messages, list) or not messages:
+        raise HttpError(400, "'messages' debe ser una lista no vacía")
+    converted = []
+    for message in messages:
+        role = message.get("role") if isinstance(message, dict) else None
+        if role not in _ROLES:
+            raise HttpError(400, f"Rol de mensaje no soportado: {role!r}")
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            # Partes de contenido: solo se usa el texto
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        converted.append(_ROLES[role](content=content))
+    return converted
+
+
+async def _wait_for_eof(reader: asyncio.StreamReader, interval: float = 0.1):
+    # Sin leer del buffer: el cliente puede haber enviado ya su siguiente petición (pipelining).
+    # Un reset de la conexión no marca EOF sino una excepción en el reader
+    while not reader.at_eof() and reader.exception() is None:
+        await asyncio.sleep(interval)
+
+
+async def run_until_disconnect(reader: asyncio.StreamReader, coro) -> bool:
+    """
+    Ejecuta `coro` mientras el cliente siga conectado; si cierra la conexión se cancela
+    (y con ella la petición al backend). Devuelve True si hubo que cancelarla.
+    Solo cuenta el cierre (EOF): los bytes que lleguen mientras tanto se quedan en el buffer para
+    la siguiente petición. Si cierra dejando bytes sin leer, el cierre no se ve y la generación termina igual.
+    """
+    task = asyncio.ensure_future(coro)
+    disconnect = asyncio.ensure_future(_wait_for_eof(reader))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            task.result()  # propaga los errores de la generación
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return True
+    finally:
+        disconnect.cancel()
+        task.cancel()
+
+
+class ChatServer:
+    """
+    Servidor HTTP compatible con la API de OpenAI sobre el registro de models.yaml:
+      GET  /v1/models
+      POST /v1/chat/completions  (con "stream": true responde por SSE)
+    HTTP/1.1 mínimo sobre asyncio (sin dependencias); los mismos clientes calientes
+    atienden a todas las herramientas que se conecten. La prioridad de cada petición
+    (interactive, normal, batch) va en la cabecera X-Priority o en el campo "priority".
+    """
+
+    def __init__(self, resolve_model, models: list[dict], default_model: str | None = None,
+                 max_queue: int | None = None, metrics=None, scheduler: PriorityScheduler = None,
+                 coalescer=None):
+        # resolve_model(identificador) -> (model_id, model_info, llm) o None si no existe
+        self.resolve_model = resolve_model
+        self.models = models
+        self.default_model = default_model
+        if scheduler is not None and max_queue is not None:
+            # El límite de la cola es del planificador: con uno compartido se fija al crearlo
+            raise ValueError("max_queue no se aplica a un planificador compartido; pásalo a PriorityScheduler")
+        self.scheduler = scheduler or PriorityScheduler(DEFAULT_MAX_QUEUE if max_queue is None else max_queue)
+        self.metrics = metrics  # MetricsRecorder opcional
+        self.coalescer = coalescer  # SingleFlight opcional
+        self._sizers: dict[str, ContextSizer | None] = {}
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int | None:
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def format_stats(self) -> str:
+        if self.coalescer:
+            return f"{self.scheduler.format_stats()}\n{self.coalescer.format_stats()}"
+        return self.scheduler.format_stats()
+
+    # --- HTTP ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    await _send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    keep_alive = await self._dispatch(method, path, headers, body, reader, writer) and keep_alive
+                except HttpError as e:
+                    await _send_error(writer, e, keep_alive)
+                except Exception as e:
+                    await _send_error(writer, HttpError(500, str(e), "api_error"), keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # el cliente se fue
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, headers: dict, body: bytes, reader, writer) -> bool:
+        """Atiende una petición; devuelve False si la conexión no puede reutilizarse."""
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/v1/models":
+            if method != "GET":
+                raise HttpError(405, "Método no permitido")
+            await _send_json(writer, 200, self._list_models())
+            return True
+        if path == "/v1/chat/completions":
+            if method != "POST":
+                raise HttpError(405, "Método no permitido")
+            request = _parse_json(body)
+            priority = headers.get("x-priority") or request.get("priority") or "normal"
+            if priority not in PRIORITIES:
+                raise HttpError(400, f"Prioridad '{priority}' no válida ({', '.join(PRIORITIES)})")
+            return await self._chat_completions(request, priority, reader, writer)
+        raise HttpError(404, f"Ruta no encontrada: {path}", "not_found_error")
+
+    def _list_models(self) -> dict:
+        return {"object": "list", "data": [
+            {"id": m["id"], "object": "model", "created": 0, "owned_by": m.get("provider", "local")}
+            for m in self.models
+        ]}
+
+    # --- /v1/chat/completions ---
+    def _prepare(self, request: dict):
+        """(model_id, fábrica de ChatStream): cada intento tras una expulsión empieza de cero."""
+        identifier = request.get("model") or self.default_model
+        resolved = self.resolve_model(identifier) if identifier else None
+        if resolved is None:
+            raise HttpError(404, f"Modelo '{identifier}' no encontrado", "not_found_error")
+        model_id, model_info, llm = resolved
+        self.scheduler.register(model_id, provider_concurrency(model_info))
+        if model_id not in self._sizers:
+            self._sizers[model_id] = ContextSizer.from_model_info(model_info)
+        messages = from_openai_messages(request.get("messages"))
+        llm = with_generation_params(llm, request.get("temperature"),
+                                     request.get("max_completion_tokens") or request.get("max_tokens"))
+        sizer = self._sizers[model_id]
+
+        def make_stream(prefix: str = ""):
+            # Con prefijo (tras una expulsión) se continúa la respuesta que el cliente ya tiene a medias
+            request_messages = continue_messages(messages, prefix)
+            options = sizer.options_for(request_messages) if sizer else None
+            if self.coalescer:
+                return self.coalescer.stream(model_id, model_info, llm, request_messages, options)
+            return ChatStream(llm, request_messages, options)
+        return model_id, make_stream
+
+    async def _chat_completions(self, request: dict, priority: str, reader, writer) -> bool:
+        model_id, make_stream = self._prepare(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        try:
+            if request.get("stream"):
+                include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                await self._stream_completion(make_stream, model_id, completion_id, include_usage, priority,
+                                              reader, writer)
+                return False
+
+            chat_stream, content = None, None
+
+            def started(stream):
+                nonlocal chat_stream
+                chat_stream = stream
+
+            async def generate():
+                nonlocal content
+                # Si lo expulsan vuelve a la cola y continúa desde lo ya generado
+                content = await self.scheduler.run_stream(model_id, make_stream, priority=priority,
+                                                          on_stream=started)
+
+            cancelled = False
+            try:
+                # Como en SSE: si el cliente se va, se cancela la generación (y se libera el hueco)
+                cancelled = await run_until_disconnect(reader, generate())
+            except QueueFull:
+                raise
+            except Exception as e:
+                raise HttpError(502, f"Error del modelo: {e}", "api_error")
+            finally:
+                if chat_stream is not None:
+                    self._record(chat_stream, cancelled=cancelled)
+            if cancelled:
+                return False
+        except QueueFull as e:
+            raise HttpError(429, str(e), "overloaded_error", {"Retry-After": "1"})
+        await _send_json(writer, 200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model_id,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": _finish_reason(chat_stream)}],
+            "usage": _usage(chat_stream),
+        })
+        return True
+
+    async def _stream_completion(self, make_stream, model_id, completion_id, include_usage, priority,
+                                 reader, writer):
+        created = int(time.time())
+        chat_stream, headers_sent = None, False
+
+        def started(stream):
+            # Las cabeceras salen al conseguir hueco: si la cola está llena aún se puede responder 429
+            nonlocal chat_stream, headers_sent
+            chat_stream = stream
+            if not headers_sent:
+                headers_sent = True
+                writer.write(_head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                         "Connection": "close"}))
+                writer.write(_sse(chunk({"role": "assistant", "content": ""})))
+
+        def chunk(delta: dict, finish_reason=None) -> dict:
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model_id,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        async def send(text):
+            writer.write(_sse(chunk({"content": text})))
+            await writer.drain()
+
+        async def pump():
+            # Si lo expulsan, al recuperar el hueco continúa desde el último chunk enviado
+            await self.scheduler.run_stream(model_id, make_stream, send, priority, on_stream=started)
+            writer.write(_sse(chunk({}, _finish_reason(chat_stream))))
+            if include_usage:
+                writer.write(_sse({**chunk({}), "choices": [], "usage": _usage(chat_stream)}))
+            writer.write(b"data: [DONE]\n\n")
+            await writer.drain()
+
+        cancelled = False
+        try:
+            cancelled = await run_until_disconnect(reader, pump())
+        except Exception as e:
+            if not headers_sent:
+                raise
+            # Las cabeceras ya se enviaron: el error va como evento SSE
+            writer.write(_sse({"error": {"message": f"Error del modelo: {e}", "type": "api_error"}}))
+        finally:
+            if chat_stream is not None:
+                self._record(chat_stream, cancelled=cancelled)
+
+    def _record(self, chat_stream, cancelled: bool):
+        if self.metrics:
+            self.metrics.record(TurnMetrics.from_stream(chat_stream, *describe_llm(chat_stream.llm),
+                                                        cancelled=cancelled))
+
+
+def _finish_reason(chat_stream) -> str:
+    final = chat_stream.final or {}
+    return "length" if final.get("done_reason") == "length" else "stop"
+
+
+def _usage(chat_stream) -> dict:
+    final, usage = chat_stream.final or {}, chat_stream.usage or {}
+    prompt = final.get("prompt_eval_count", usage.get("input_tokens")) or 0
+    completion = final.get("eval_count", usage.get("output_tokens")) or 0
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _sse(data: dict) -> bytes:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _parse_json(body: bytes) -> dict:
+    try:
+        request = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HttpError(400, f"JSON inválido: {e}")
+    if not isinstance(request, dict):
+        raise HttpError(400, "El cuerpo debe ser un objeto JSON")
+    return request
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """(método, ruta, cabeceras, cuerpo) de la siguiente petición, o None si el cliente cerró."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Cabeceras demasiado grandes")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Línea de petición inválida")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        raise HttpError(411, "Se requiere Content-Length")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Content-Length inválido")
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Cuerpo demasiado grande")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def _head(status: int, headers: dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer, status: int, body: dict, keep_alive: bool = True, headers: dict | None = None):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    writer.write(_head(status, {"Content-Type": "application/json", "Content-Length": str(len(data)),
+                                "Connection": "keep-alive" if keep_alive else "close", **(headers or {})}))
+    writer.write(data)
+    await writer.drain()
+
+
+async def _send_error(writer, error: HttpError, keep_alive: bool = True):
+    body = {"error": {"message": str(error), "type": error.error_type, "code": error.status}}
+    await _send_json(writer, error.status, body, keep_alive, error.headers)
@@ -0,0 +1,202 @@
+# OLLAMA-LANGCHAING-AGENTE/core/tier_router.py
+import asyncio
+import json
+import re
+import time
+import weakref
+from dataclasses import dataclass, field
+
+from langchain_core.messages import HumanMessage
+
+from core.engine import ChatStream
+from core.history import estimate_tokens
+from core.providers import with_generation_params
+
+# Señales de la heurística (español e inglés)
+_CODE = re.compile(r"```|\bdef |\bclass |\bimport |traceback|exception|stack ?trace|[{};]\s*$|=>|\w+\(\)",
+                   re.IGNORECASE | re.MULTILINE)
+_COMPLEX = re.compile(
+    r"\b(explica|por qu[eé]|analiza|compara|dise[ñn]a|implementa|optimiza|demuestra|razona|paso a paso|"
+    r"arquitectura|refactoriza|depura|estrategia|ventajas|desventajas|eval[uú]a|plan|algoritmo|"
+    r"explain|why|analy[sz]e|compare|design|implement|optimi[sz]e|prove|step by step|refactor|debug)\b",
+    re.IGNORECASE)
+_READ = re.compile(r"\b(resume|resumen|extrae|lista|enumera|traduce|qu[eé] dice|busca|summari[sz]e|extract|"
+                   r"list|translate)\b", re.IGNORECASE)
+_WRITE = re.compile(r"\b(escribe|redacta|genera|crea|reescribe|write|draft|generate|create|rewrite)\b", re.IGNORECASE)
+_TRIVIAL = re.compile(r"^\s*(hola|buenas|gracias|ok|vale|s[ií]|no|adi[oó]s|hello|hi|thanks|bye)\b[\s!.?]*$",
+                      re.IGNORECASE)
+
+CLASSIFIER_PROMPT = (
+    "Clasifica la dificultad de la petición del usuario. Responde solo con el número del nivel.\n"
+    "{levels}\n\nPetición:\n{text}\n\nNivel:"
+)
+
+
+@dataclass
+class Tier:
+    """Nivel de tarea: modelo (id o alias de models.yaml) y parámetros de generación."""
+    name: str
+    model: str
+    max_score: float = 1.0  # puntuación de complejidad máxima que atiende este nivel
+    temperature: float | None = None
+    max_tokens: int | None = None
+    description: str = ""
+
+    def params(self) -> dict:
+        """Parámetros de generación que el nivel fija (los que no son None)."""
+        return {k: v for k, v in (("temperature", self.temperature), ("max_tokens", self.max_tokens))
+                if v is not None}
+
+
+@dataclass
+class TierDecision:
+    tier: Tier
+    score: float
+    source: str  # "heurística", "clasificador" o "manual"
+    elapsed_ms: float
+    reasons: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        reasons = f", {', '.join(self.reasons)}" if self.reasons else ""
+        return (f"{self.tier.name} → {self.tier.model} ({self.source}, puntuación {self.score:.2f}{reasons}, "
+                f"{self.elapsed_ms:.1f} ms)")
+
+
+class TierRouter:
+    """
+    Decide en cada petición el nivel más barato que basta (`tier_routing` en models.yaml).
+    Los niveles van del más barato al más caro y cada uno atiende hasta su `max_score`.
+    La heurística (longitud, código, palabras de razonamiento...) tarda microsegundos; solo
+    si la puntuación cae a menos de `margin` de una frontera y hay un clasificador configurado
+    (un modelo local pequeño) se le pregunta, con un tiempo máximo tras el que gana la heurística.
+    """
+
+    def __init__(self, tiers: list[Tier], classifier_llm=None, classifier_timeout_s: float = 0.5,
+                 margin: float = 0.08, log_path: str | None = None):
+        if not tiers:
+            raise ValueError("tier_routing.tiers no puede estar vacío")
+        self.tiers = sorted(tiers, key=lambda t: t.max_score)
+        self.classifier_llm = classifier_llm
+        self.classifier_timeout_s = classifier_timeout_s
+        self.margin = margin
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+        self._applied: dict[tuple, object] = {}
+
+    @classmethod
+    def from_config(cls, all_configs: dict, load_llm=None):
+        """TierRouter del bloque `tier_routing`, o None si no existe. load_llm(id) construye el clasificador."""
+        settings = (all_configs or {}).get("tier_routing")
+        if not settings or not settings.get("tiers"):
+            return None
+        tiers = [Tier(**tier) for tier in settings["tiers"]]
+        classifier = settings.get("classifier") or {}
+        classifier_llm = load_llm(classifier["model"]) if classifier.get("model") and load_llm else None
+        return cls(tiers, classifier_llm=classifier_llm,
+                   classifier_timeout_s=classifier.get("timeout_ms", 500) / 1000,
+                   margin=settings.get("margin", 0.08), log_path=settings.get("log"))
+
+    def get_tier(self, name: str) -> Tier | None:
+        return next((t for t in self.tiers if t.name == name), None)
+
+    def score(self, text: str) -> tuple[float, list[str]]:
+        """Puntuación de complejidad entre 0 y 1 y las señales que la explican."""
+        if _TRIVIAL.match(text):
+            return 0.0, ["trivial"]
+        reasons = []
+        tokens = estimate_tokens(text)
+        score = min(tokens / 400, 0.35)
+        if tokens > 100:
+            reasons.append(f"{tokens} tokens")
+        if _CODE.search(text):
+            score += 0.3
+            reasons.append("código")
+        complex_hits = len(_COMPLEX.findall(text))
+        if complex_hits:
+            score += min(0.15 * complex_hits, 0.45)
+            reasons.append(f"razonamiento x{complex_hits}")
+        elif _READ.search(text):
+            reasons.append("lectura")
+        if _WRITE.search(text):
+            score += 0.2
+            reasons.append("redacción")
+        if text.count("?") >= 2 or text.count("\n") >= 5:
+            score += 0.1
+            reasons.append("varias partes")
+        return min(score, 1.0), reasons
+
+    def _tier_for(self, score: float) -> Tier:
+        return next((t for t in self.tiers if score <= t.max_score), self.tiers[-1])
+
+    def _ambiguous(self, score: float) -> bool:
+        return any(abs(score - t.max_score) < self.margin for t in self.tiers[:-1])
+
+    def route(self, text: str, override: str | None = None) -> TierDecision:
+        """Decisión solo con la heurística (o el nivel forzado)."""
+        start = time.perf_counter()
+        if override:
+            tier = self.get_tier(override)
+            if tier is None:
+                raise ValueError(f"Nivel '{override}' no definido en tier_routing")
+            return self._record(TierDecision(tier, 0.0, "manual", (time.perf_counter() - start) * 1000), text)
+        score, reasons = self.score(text)
+        decision = TierDecision(self._tier_for(score), score, "heurística",
+                                (time.perf_counter() - start) * 1000, reasons)
+        return self._record(decision, text) if not self._wants_classifier(decision) else decision
+
+    def _wants_classifier(self, decision: TierDecision) -> bool:
+        return (decision.source == "heurística" and self.classifier_llm is not None
+                and self._ambiguous(decision.score))
+
+    async def aroute(self, text: str, override: str | None = None) -> TierDecision:
+        """Como route(), consultando al clasificador en los casos dudosos."""
+        start = time.perf_counter()
+        decision = self.route(text, override)
+        if not self._wants_classifier(decision):
+            return decision
+        try:
+            tier = await asyncio.wait_for(self._classify(text), self.classifier_timeout_s)
+        except Exception:
+            tier = None  # el clasificador no llega a tiempo o falla: vale la heurística
+        if tier is not None:
+            decision.tier = tier
+            decision.source = "clasificador"
+        decision.elapsed_ms = (time.perf_counter() - start) * 1000
+        return self._record(decision, text)
+
+    async def _classify(self, text: str) -> Tier | None:
+        levels = "\n".join(f"{i}. {t.description or t.name}" for i, t in enumerate(self.tiers, start=1))
+        prompt = CLASSIFIER_PROMPT.format(levels=levels, text=text[:2000])
+        answer = await ChatStream(self.classifier_llm, [HumanMessage(content=prompt)],
+                                  options={"temperature": 0, "num_predict": 3}).collect()
+        match = re.search(r"\d+", answer)
+        if match and 1 <= int(match.group()) <= len(self.tiers):
+            return self.tiers[int(match.group()) - 1]
+        return None
+
+    def apply(self, llm, tier: Tier):
+        """
+        Copia del llm con la temperatura y el máximo de tokens del nivel (cacheada mientras viva el llm).
+        Los modelos de LangChain no son hashables, así que la clave es su id; con una referencia débil
+        la entrada se borra al recogerse el llm y un objeto nuevo con el mismo id no hereda su copia.
+        """
+        key = (id(llm), tier.name)
+        entry = self._applied.get(key)
+        if entry is None or entry[0]() is not llm:
+            ref = weakref.ref(llm, lambda _, key=key: self._applied.pop(key, None))
+            entry = self._applied[key] = (ref, with_generation_params(llm, tier.temperature, tier.max_tokens))
+        return entry[1]
+
+    def _record(self, decision: TierDecision, text: str) -> TierDecision:
+        if self._log:
+            entry = {"ts": time.time(), "tier": decision.tier.name, "model": decision.tier.model,
+                     "score": round(decision.score, 3), "source": decision.source,
+                     "elapsed_ms": round(decision.elapsed_ms, 3), "reasons": decision.reasons,
+                     "chars": len(text)}
+            self._log.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._log.flush()
+        return decision
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
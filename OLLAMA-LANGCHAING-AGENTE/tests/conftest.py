@@ -0,0 +1,8 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/conftest.py
+import os
+import sys
+
+# Los tests importan `core.*` y `agents.*` desde la raíz del proyecto
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
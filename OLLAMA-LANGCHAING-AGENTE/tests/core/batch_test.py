@@ -0,0 +1,126 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/batch_test.py
+import asyncio
+import io
+import json
+
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from core.batch import BatchRunner, completed_indices, pending_jobs, provider_concurrency, read_jobs
+
+
+def test_read_jobs_assigns_positional_indices(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text('{"prompt": "a"}\n\n{"prompt": "b", "model": "deepseek"}\n', encoding="utf-8")
+
+    jobs = read_jobs(str(path))
+    assert [job["index"] for job in jobs] == [0, 1]
+    assert jobs[1]["model"] == "deepseek"
+
+
+def test_read_jobs_rejects_missing_prompt(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text('{"system_prompt": "x"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=":1:"):
+        read_jobs(str(path))
+
+
+def test_completed_indices_skips_errors_and_truncated_lines(tmp_path):
+    path = tmp_path / "out.jsonl"
+    lines = [
+        json.dumps({"index": 0, "content": "ok"}),
+        json.dumps({"index": 1, "error": "boom"}),
+        '{"index": 2, "cont',
+    ]
+    path.write_text("\n".join(lines), encoding="utf-8")
+    assert completed_indices(str(path)) == {0}
+    assert completed_indices(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_provider_concurrency_follows_ollama_num_parallel(monkeypatch):
+    monkeypatch.setenv("OLLAMA_NUM_PARALLEL", "3")
+    assert provider_concurrency({"provider": "ollama"}) == 3
+    assert provider_concurrency({"provider": "ollama", "max_concurrency": 2}) == 2
+
+
+def make_resolver(fake, limits: dict):
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    calls = []
+
+    def resolve(identifier):
+        calls.append(identifier)
+        if identifier not in limits:
+            raise ValueError(f"Modelo '{identifier}' no encontrado")
+        info = {"id": identifier, "provider": "ollama", "max_concurrency": limits[identifier]}
+        return identifier, info, chat_models.ChatOllama(model=identifier, base_url=fake.base_url)
+    return resolve, calls
+
+
+def run_batch(resolve, jobs, concurrency, sink=None):
+    sink = sink or io.StringIO()
+    runner = BatchRunner(resolve, sink, concurrency=concurrency)
+    asyncio.run(runner.run(jobs, "lento"))
+    return runner, sink
+
+
+def jobs_for(models):
+    return [{"index": i, "prompt": f"pregunta {i}", "model": model} for i, model in enumerate(models)]
+
+
+def test_per_model_limit_is_respected():
+    with FakeOllama(models=("lento",), token_rate=200, tokens_per_reply=10) as fake:
+        resolve, _ = make_resolver(fake, {"lento": 2})
+        runner, _ = run_batch(resolve, jobs_for(["lento"] * 6), concurrency=8)
+        assert runner.completed == 6
+        assert fake.peak_active["lento"] == 2
+
+
+def test_saturated_model_does_not_hold_global_slots():
+    with FakeOllama(models=("lento", "rapido"), token_rate=100, tokens_per_reply=10) as fake:
+        resolve, _ = make_resolver(fake, {"lento": 1, "rapido": 2})
+        _, sink = run_batch(resolve, jobs_for(["lento"] * 4 + ["rapido"] * 2), concurrency=2)
+    finished = [json.loads(line)["model"] for line in sink.getvalue().splitlines()]
+    # Los trabajos de "rapido" no esperan a que se vacíe la cola de "lento" (antes terminaban los últimos)
+    assert max(i for i, model in enumerate(finished) if model == "rapido") < 4
+    assert fake.peak_active["lento"] == 1
+
+
+
+def test_job_priority_orders_the_model_queue():
+    jobs = jobs_for(["lento"] * 4)
+    jobs[3]["priority"] = "interactive"
+    with FakeOllama(models=("lento",), token_rate=200, tokens_per_reply=5) as fake:
+        resolve, _ = make_resolver(fake, {"lento": 1})
+        sink = io.StringIO()
+        runner = BatchRunner(resolve, sink, concurrency=4, priority="batch")
+        asyncio.run(runner.run(jobs, "lento"))
+    finished = [json.loads(line)["index"] for line in sink.getvalue().splitlines()]
+    # El primero ya tenía el hueco; el interactivo adelanta a los demás aunque llegó el último
+    assert finished == [0, 3, 1, 2]
+    assert runner.scheduler.stats["by_class"] == {"interactive": 1, "normal": 0, "batch": 3}
+
+def test_unknown_model_is_resolved_once():
+    with FakeOllama(models=("lento",)) as fake:
+        resolve, calls = make_resolver(fake, {"lento": 1})
+        runner, sink = run_batch(resolve, jobs_for(["otro"] * 3 + ["lento"]), concurrency=2)
+    assert calls.count("otro") == 1
+    assert (runner.completed, runner.failed) == (1, 3)
+    errors = [json.loads(line).get("error") for line in sink.getvalue().splitlines()]
+    assert errors.count("Modelo 'otro' no encontrado") == 3
+
+
+def test_resume_only_runs_missing_and_failed_jobs(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"index": 0, "content": "ya"}) + "\n"
+                      + json.dumps({"index": 1, "error": "boom"}) + "\n", encoding="utf-8")
+    jobs = jobs_for(["lento"] * 3)
+    pending = pending_jobs(jobs, str(output), resume=True)
+    assert [job["index"] for job in pending] == [1, 2]
+    assert pending_jobs(jobs, str(output), resume=False) == jobs
+
+    with FakeOllama(models=("lento",)) as fake:
+        resolve, _ = make_resolver(fake, {"lento": 1})
+        with open(output, "a", encoding="utf-8") as sink:
+            run_batch(resolve, pending, concurrency=2, sink=sink)
+        assert fake.stats["requests"] == 2
+    assert completed_indices(str(output)) == {0, 1, 2}
@@ -0,0 +1,210 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/coalesce_test.py
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_ollama import FakeOllama
+from core.coalesce import SingleFlight
+from core.engine import continue_messages
+from core.scheduler import PriorityScheduler
+from core.server import ChatServer
+
+MESSAGES = [HumanMessage(content="hola")]
+
+
+class FakeSource:
+    """Generación de prueba: `tokens` chunks separados por `delay` segundos."""
+
+    def __init__(self, log: dict, tokens: int = 5, delay: float = 0.01, fail_at: int | None = None):
+        self.llm = SimpleNamespace(temperature=0)
+        self.final = None
+        self.usage = None
+        self.log = log
+        self.tokens = tokens
+        self.delay = delay
+        self.fail_at = fail_at
+        log["started"] = log.get("started", 0) + 1
+
+    async def __aiter__(self):
+        self.log["active"] = self.log.get("active", 0) + 1
+        self.log["peak"] = max(self.log.get("peak", 0), self.log["active"])
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.delay)
+                if i == self.fail_at:
+                    raise RuntimeError("se cayó el backend")
+                yield f"t{i} "
+            self.final = {"eval_count": self.tokens}
+        except asyncio.CancelledError:
+            self.log["cancelled"] = True
+            raise
+        finally:
+            self.log["active"] -= 1
+
+
+def shared(flight: SingleFlight, log: dict, llm=None, **kwargs):
+    llm = llm or SimpleNamespace(temperature=0)
+    return flight.stream("m", None, llm, MESSAGES, make_source=lambda: FakeSource(log, **kwargs))
+
+
+def test_identical_requests_share_one_generation():
+    async def main():
+        flight, log = SingleFlight(), {}
+        first = shared(flight, log)
+        task = asyncio.ensure_future(first.collect())
+        await asyncio.sleep(0)
+        others = [shared(flight, log) for _ in range(2)]
+        results = await asyncio.gather(task, *(s.collect() for s in others))
+        return flight, log, first, others, results
+
+    flight, log, first, others, results = asyncio.run(main())
+    assert log["started"] == 1
+    assert results == ["t0 t1 t2 t3 t4 "] * 3
+    assert not first.coalesced and all(s.coalesced for s in others)
+    assert others[0].final == {"eval_count": 5}
+    assert flight.stats == {"leaders": 1, "coalesced": 2, "bypassed": 0}
+
+
+def test_late_joiner_gets_the_buffered_prefix():
+    async def main():
+        flight, log = SingleFlight(), {}
+        first = shared(flight, log, tokens=6)
+        received = []
+
+        async def consume():
+            async for text in first:
+                received.append(text)
+        task = asyncio.ensure_future(consume())
+        while len(received) < 3:
+            await asyncio.sleep(0.005)
+        late = shared(flight, log)
+        content = await late.collect()
+        await task
+        return log, late, content
+
+    log, late, content = asyncio.run(main())
+    assert log["started"] == 1 and late.coalesced
+    assert content == "t0 t1 t2 t3 t4 t5 "
+    assert late.timings.ttft_s < 0.01  # el prefijo llega sin esperar al modelo
+
+
+def test_cancelling_one_subscriber_keeps_the_generation():
+    async def main():
+        flight, log = SingleFlight(), {}
+        first = shared(flight, log, tokens=8)
+        leader = asyncio.ensure_future(first.collect())
+        await asyncio.sleep(0.02)
+        follower = shared(flight, log)
+        other = asyncio.ensure_future(follower.collect())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return log, await other
+
+    log, content = asyncio.run(main())
+    assert "cancelled" not in log
+    assert content.split() == [f"t{i}" for i in range(8)]
+
+
+def test_last_subscriber_leaving_cancels_the_generation():
+    async def main():
+        flight, log = SingleFlight(), {}
+        task = asyncio.ensure_future(shared(flight, log, tokens=50).collect())
+        await asyncio.sleep(0.03)
+        task.cancel()
+        await asyncio.sleep(0.02)
+        return flight, log
+
+    flight, log = asyncio.run(main())
+    assert log["cancelled"] is True
+    assert not flight._flights
+
+
+def test_errors_reach_every_subscriber_and_finished_flights_are_not_reused():
+    async def main():
+        flight, log = SingleFlight(), {}
+        first = shared(flight, log, fail_at=2)
+        task = asyncio.ensure_future(first.collect())
+        await asyncio.sleep(0)
+        second = shared(flight, log, fail_at=2)
+        results = await asyncio.gather(task, second.collect(), return_exceptions=True)
+        again = await shared(flight, log).collect()
+        return log, results, again
+
+    log, results, again = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert log["started"] == 2 and again == "t0 t1 t2 t3 t4 "
+
+
+def test_preempting_the_slot_holder_aborts_the_shared_generation():
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    # Solo los streams de Ollama saben continuar un prefijo, y solo esos se expulsan
+    llm = chat_models.ChatOllama(model="m", temperature=0)
+
+    async def main():
+        scheduler = PriorityScheduler(preempt=True)
+        scheduler.register("m", 1)
+        flight, log = SingleFlight(), {}
+
+        def make_stream(text, prefix=""):
+            messages = continue_messages([HumanMessage(content=text)], prefix)
+            return flight.stream("m", None, llm, messages,
+                                 make_source=lambda: FakeSource(log, tokens=6, delay=0.02))
+
+        leader = asyncio.ensure_future(scheduler.run_stream("m", lambda p: make_stream("lote", p), priority="batch"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(scheduler.run_stream("m", lambda p: make_stream("lote", p)))
+        await asyncio.sleep(0.03)
+        urgent = await scheduler.run_stream("m", lambda p: make_stream("urgente", p), priority="interactive")
+        return urgent, await leader, await follower, scheduler.stats["preempted"], log
+
+    urgent, leader, follower, preempted, log = asyncio.run(main())
+    assert preempted == 1
+    # Sin hueco, la generación compartida no sigue ocupando el modelo junto a la urgente
+    assert log["peak"] == 1
+    assert urgent == "t0 t1 t2 t3 t4 t5 "
+    # Ambos continúan desde lo que ya tenían (FakeSource no ve el prefijo y vuelve a empezar)
+    assert leader.startswith("t0 ") and leader.endswith("t5 ") and len(leader) > len(urgent)
+    assert follower.startswith("t0 ") and follower.endswith("t5 ")
+
+
+def test_sampling_requests_are_not_coalesced_by_default():
+    sampling = SimpleNamespace(temperature=0.7)
+    log = {}
+    stream = shared(SingleFlight(), log, llm=sampling)
+    assert isinstance(stream, FakeSource)
+    assert not isinstance(shared(SingleFlight(allow_nondeterministic=True), log, llm=sampling), FakeSource)
+
+
+def test_server_coalesces_identical_streams():
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    with FakeOllama(token_rate=200, tokens_per_reply=10) as fake:
+        info = {"id": "gemma-ollama", "provider": "ollama", "max_concurrency": 1}
+        llm = chat_models.ChatOllama(model="gemma3:4b", base_url=fake.base_url)
+        server = ChatServer(lambda _: ("gemma-ollama", info, llm), [info], "gemma-ollama",
+                            max_queue=0, coalescer=SingleFlight())  # sin coalescencia habría 429
+        request = {"messages": [{"role": "user", "content": "hola"}], "temperature": 0, "stream": True}
+
+        async def one(client):
+            async with client.stream("POST", "/v1/chat/completions", json=request) as response:
+                lines = [line[6:] async for line in response.aiter_lines() if line.startswith("data: {")]
+            return response.status_code, "".join(
+                json.loads(line)["choices"][0]["delta"].get("content", "") for line in lines)
+
+        async def main():
+            await server.start("127.0.0.1", 0)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}", timeout=5) as client:
+                    first = asyncio.ensure_future(one(client))
+                    await asyncio.sleep(0.02)
+                    return await asyncio.gather(first, one(client), one(client))
+            finally:
+                await server.close()
+
+        results = asyncio.run(main())
+        assert [status for status, _ in results] == [200, 200, 200]
+        assert len({content for _, content in results}) == 1 and len(results[0][1].split()) == 10
+        assert fake.stats["requests"] == 1
@@ -0,0 +1,42 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/context_window_test.py
+import pytest
+from langchain_core.messages import HumanMessage
+
+from core.context_window import ContextSizer
+
+
+def prompt(tokens: int):
+    return [HumanMessage(content="x" * (tokens - 4) * 4)]
+
+
+def test_from_model_info_requires_context_block():
+    assert ContextSizer.from_model_info({"id": "deepseek-chat"}) is None
+    sizer = ContextSizer.from_model_info({"context": {"buckets": [4096, 2048], "expected_output": 256}})
+    assert sizer.buckets == [2048, 4096]
+    assert sizer.initial == 2048
+
+
+def test_grows_immediately_and_shrinks_only_after_streak():
+    sizer = ContextSizer(buckets=[2048, 4096, 8192], expected_output=512, shrink_after=3)
+    assert sizer.choose(prompt(1000)) == 2048
+    assert sizer.choose(prompt(3000)) == 4096
+    # Prompts pequeños: se mantiene el bucket hasta completar la racha
+    assert [sizer.choose(prompt(500)) for _ in range(3)] == [4096, 4096, 2048]
+    assert sizer.stats["changes"] == 2
+    assert sizer.stats["by_bucket"] == {2048: 2, 4096: 3}
+
+
+def test_overflow_uses_largest_bucket():
+    sizer = ContextSizer(buckets=[2048, 4096])
+    assert sizer.options_for(prompt(10_000)) == {"num_ctx": 4096}
+    assert sizer.stats["overflows"] == 1
+
+
+def test_reload_time_is_counted_only_after_a_change():
+    sizer = ContextSizer(buckets=[2048, 4096], expected_output=0)
+    sizer.choose(prompt(100))
+    sizer.observe({"load_duration": 3_000_000_000})
+    sizer.choose(prompt(3000))
+    sizer.observe({"load_duration": 2_000_000_000})
+    assert sizer.stats["reload_s"] == pytest.approx(2.0)
+    assert "cambios de bucket 1" in sizer.format_stats()
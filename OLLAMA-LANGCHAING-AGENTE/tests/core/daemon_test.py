@@ -0,0 +1,130 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/daemon_test.py
+import asyncio
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+import pytest
+
+from agents import cliente
+from benchmarks.fake_ollama import FakeOllama
+from core.daemon import AgentDaemon
+from core.scheduler import PriorityScheduler
+
+chat_models = pytest.importorskip("langchain_ollama.chat_models")
+
+
+@pytest.fixture
+def socket_path():
+    # Los sockets unix no admiten rutas largas como las de tmp_path
+    directory = tempfile.mkdtemp(prefix="tron")
+    yield os.path.join(directory, "agente.sock")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def daemon(socket_path):
+    with FakeOllama(tokens_per_reply=4) as fake:
+        llm = chat_models.ChatOllama(model="gemma3:4b", base_url=fake.base_url)
+        info = {"id": "gemma-ollama", "provider": "ollama"}
+
+        def resolve(identifier):
+            return ("gemma-ollama", info, llm) if identifier == "gemma-ollama" else None
+
+        agent = AgentDaemon(resolve, "gemma-ollama")
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(agent.start(socket_path))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        yield agent
+        asyncio.run_coroutine_threadsafe(agent.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+
+def ask(socket_path, *argv):
+    args = cliente.parse_args(["-sc", "-m", "hola", "--socket", socket_path, *argv])
+    out = io.StringIO()
+    code = cliente.ask(cliente.connect(socket_path), args, out)
+    return code, out.getvalue()
+
+
+def test_client_gets_the_answer_from_the_daemon(daemon, socket_path):
+    code, output = ask(socket_path, "-s")
+    assert code == 0
+    answer = output.split("--- Respuesta ---\n", 1)[1]
+    assert len(answer.split()) == 4
+    assert daemon.stats["requests"] == 1
+
+
+def test_daemon_errors_reach_the_client(daemon, socket_path):
+    code, output = ask(socket_path, "--model", "gpt-9")
+    assert code == 1 and "gpt-9" in output
+
+
+def test_client_falls_back_when_daemon_cannot_serve(socket_path):
+    assert cliente.connect(socket_path) is None
+    assert cliente.parse_args(["--model", "gemma-ollama"]) is None  # chat interactivo
+    assert cliente.parse_args(["-sc", "-m", "hola", "--batch", "x.jsonl"]) is None
+
+
+def test_socket_is_created_private(socket_path, monkeypatch):
+    seen = {}
+    start_unix_server = asyncio.start_unix_server
+
+    async def spy(*args, **kwargs):
+        # Sin ventana entre crear el socket y restringirlo: ya nace sin permisos para otros
+        seen["umask"] = os.umask(0o077)
+        os.umask(seen["umask"])
+        return await start_unix_server(*args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "start_unix_server", spy)
+    agent = AgentDaemon(lambda _: None)
+    previous = os.umask(0o022)
+    try:
+        async def start_and_check():
+            await agent.start(socket_path)
+            mode = os.stat(socket_path).st_mode & 0o777
+            await agent.close()
+            return mode
+        assert asyncio.run(start_and_check()) == 0o600
+        assert seen["umask"] == 0o077 and os.umask(0o022) == 0o022
+    finally:
+        os.umask(previous)
+
+def test_stale_socket_is_replaced_but_live_one_is_refused(daemon, socket_path):
+    with pytest.raises(RuntimeError):
+        asyncio.run(AgentDaemon(lambda _: None).start(socket_path))
+    stale = socket_path + ".old"
+    open(stale, "w").close()
+    other = AgentDaemon(lambda _: None)
+
+    async def start_and_close():
+        await other.start(stale)
+        await other.close()
+    asyncio.run(start_and_close())
+    assert not os.path.exists(stale)
+
+
+def test_client_import_is_light():
+    code = ("import sys; sys.argv = ['x']; import agents.cliente; "
+            "print(any(m.split('.')[0] in ('langchain_core', 'yaml', 'httpx') for m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.join(os.path.dirname(__file__), "..", ".."))
+    assert result.stdout.strip() == "False"
+
+
+def test_batch_priority_goes_through_the_scheduler(daemon, socket_path):
+    code, output = ask(socket_path, "--priority", "batch")
+    assert code == 0
+    assert len(output.split("--- Respuesta ---\n", 1)[1].split()) == 4
+    assert daemon.scheduler.stats["by_class"]["batch"] == 1
+
+
+def test_max_queue_is_rejected_with_a_shared_scheduler():
+    with pytest.raises(ValueError, match="max_queue"):
+        AgentDaemon(lambda _: None, max_queue=4, scheduler=PriorityScheduler())
@@ -0,0 +1,89 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/endpoints_test.py
+import asyncio
+import socket
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_ollama import FakeOllama
+from core.endpoints import EndpointPool, endpoint_pool_for
+from core.engine import ChatStream
+from core.providers import build_ollama
+
+URLS = ["http://a:1", "http://b:2", "http://c:3"]
+
+
+def dead_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_least_outstanding_and_session_stickiness():
+    pool = EndpointPool(URLS, health_check_s=None)
+    with pool.lease() as first, pool.lease() as second:
+        assert {first, second} == {"http://a:1", "http://b:2"}
+        assert pool.pick() == "http://c:3"
+
+    sticky = pool.pick(session="chat-1")
+    with pool.lease() as busy:
+        pass
+    assert all(pool.pick(session="chat-1") == sticky for _ in range(5))
+
+
+def test_failing_host_is_ejected_and_sessions_move():
+    pool = EndpointPool(URLS, eject_after=2, health_check_s=None)
+    url = pool.pick(session="chat-1")
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            with pool.lease(session="chat-1"):
+                raise httpx.ConnectError("caído")
+    assert url not in {pool.pick() for _ in range(3)}
+    assert pool.pick(session="chat-1") != url
+    assert "EXPULSADO" in pool.format_stats()
+
+
+def test_request_errors_do_not_eject():
+    pool = EndpointPool(URLS[:1], eject_after=1, health_check_s=None)
+    with pytest.raises(ValueError):
+        with pool.lease():
+            raise ValueError("modelo inexistente")
+    assert "EXPULSADO" not in pool.format_stats()
+
+
+def test_stream_retries_on_another_host_before_first_token():
+    with FakeOllama(tokens_per_reply=4) as server:
+        llm = build_ollama({"model": "gemma3:4b", "base_urls": [dead_url(), server.base_url],
+                            "health_check_s": 0})
+        streams = [ChatStream(llm, [HumanMessage(content="hola")]) for _ in range(2)]
+        for stream in streams:
+            asyncio.run(stream.collect())
+
+        assert all(len(s.chunks) == 4 and s.endpoint == server.base_url for s in streams)
+        # La ruta de LangChain (p. ej. el resumen del historial) usa el mismo pool
+        assert llm.invoke([HumanMessage(content="hola")]).content
+        assert server.stats["requests"] == 3
+
+
+def test_langchain_async_path_is_routed_and_releases_the_host():
+    with FakeOllama(tokens_per_reply=4) as server:
+        llm = build_ollama({"model": "gemma3:4b", "base_urls": [dead_url(), server.base_url],
+                            "health_check_s": 0})
+
+        async def run():
+            return [chunk.content async for chunk in llm.astream([HumanMessage(content="hola")])]
+
+        assert "".join(asyncio.run(run()))
+        pool = endpoint_pool_for(llm)
+        assert [e.outstanding for e in pool.endpoints] == [0, 0]
+        assert [e.failures for e in pool.endpoints] == [1, 0]
+
+
+def test_session_affinity_is_bounded():
+    pool = EndpointPool(URLS, health_check_s=None, max_sessions=2)
+    first = pool.pick(session="chat-1")
+    pool.pick(session="chat-2")
+    pool.pick(session="chat-1")  # uso reciente: chat-2 es el más antiguo
+    pool.pick(session="chat-3")
+    assert list(pool._sessions) == ["chat-1", "chat-3"] and pool._sessions["chat-1"] == first
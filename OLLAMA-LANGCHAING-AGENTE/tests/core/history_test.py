@@ -0,0 +1,108 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/history_test.py
+import threading
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.history import ConversationHistory, estimate_tokens, make_summarizer
+
+
+def fill(history, turns, size=200):
+    for i in range(turns):
+        history.add_turn(f"pregunta {i} " + "x" * size, f"respuesta {i} " + "y" * size)
+
+
+def test_messages_fit_budget_and_keep_newest_turns():
+    history = ConversationHistory(token_budget=300, keep_recent_turns=2)
+    fill(history, 10)
+
+    messages = history.messages()
+    assert sum(estimate_tokens(m.content) for m in messages) <= 300
+    assert isinstance(messages[0], HumanMessage)
+    assert isinstance(messages[-1], AIMessage)
+    assert messages[-1].content.startswith("respuesta 9")
+
+
+def test_background_compaction_folds_old_turns_into_summary():
+    history = ConversationHistory(token_budget=300, keep_recent_turns=2)
+    fill(history, 10)
+    folded = []
+
+    def summarize(previous, messages, cancelled):
+        folded.extend(messages)
+        return "resumen corto"
+
+    history.compact_in_background(summarize).join()
+
+    assert len(folded) == 16
+    assert history.summary == "resumen corto"
+    messages = history.messages()
+    assert isinstance(messages[0], SystemMessage)
+    assert "resumen corto" in messages[0].content
+    assert len(messages) == 1 + 4
+    assert not history.needs_compaction()
+
+
+def test_clear_discards_in_flight_compaction():
+    history = ConversationHistory(token_budget=300, keep_recent_turns=2)
+    fill(history, 10)
+
+    def summarize(previous, messages, cancelled):
+        history.clear()
+        return "obsoleto"
+
+    history.compact_in_background(summarize).join()
+    assert history.summary == ""
+    assert history.messages() == []
+
+
+def test_summarizer_failure_is_reported_to_the_caller():
+    history = ConversationHistory(token_budget=300, keep_recent_turns=2)
+    fill(history, 10)
+
+    def summarize(previous, messages, cancelled):
+        raise ConnectionError("Ollama caído")
+
+    history.compact_in_background(summarize).join()
+    assert isinstance(history.take_compaction_error(), ConnectionError)
+    assert history.take_compaction_error() is None
+    assert history.summary == "" and history.needs_compaction()
+
+
+def test_cancelled_compaction_leaves_history_untouched():
+    history = ConversationHistory(token_budget=300, keep_recent_turns=2)
+    fill(history, 10)
+    started, release = threading.Event(), threading.Event()
+
+    def summarize(previous, messages, cancelled):
+        started.set()
+        release.wait()
+        return None if cancelled.is_set() else "resumen"
+
+    thread = history.compact_in_background(summarize)
+    started.wait()
+    history.cancel_compaction()
+    release.set()
+    thread.join()
+    assert history.summary == "" and history.take_compaction_error() is None
+
+
+def test_summarizer_streams_and_stops_when_cancelled():
+    chunks = [SimpleNamespace(content=part) for part in ("uno ", "dos ", "tres")]
+    cancelled = threading.Event()
+
+    class Llm:
+        def stream(self, messages):
+            for chunk in chunks:
+                yield chunk
+                cancelled.set()  # el usuario envía otro turno tras la primera parte
+
+    summarize = make_summarizer(Llm())
+    assert summarize("", [HumanMessage(content="hola")], threading.Event()) == "uno dos tres"
+    assert summarize("", [HumanMessage(content="hola")], cancelled) is None
+
+
+def test_budget_is_read_from_model_info():
+    history = ConversationHistory.from_model_info({"history": {"token_budget": 1234, "keep_recent_turns": 3}})
+    assert history.token_budget == 1234
+    assert history.keep_recent_turns == 3
@@ -0,0 +1,53 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/metrics_test.py
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.metrics import MetricsRecorder, TurnMetrics, percentile
+from core.ollama_client import RequestTimings
+
+
+def fake_stream(final=None, usage=None, chunk_times=(0.5, 0.6, 0.8)):
+    return SimpleNamespace(timings=RequestTimings(connect_s=0.01, ttft_s=0.5, total_s=1.0),
+                           chunk_times=list(chunk_times), final=final, usage=usage)
+
+
+def test_ollama_server_counters_are_joined_with_client_timings():
+    final = {"done": True, "prompt_eval_count": 20, "prompt_eval_duration": 200_000_000,
+             "eval_count": 50, "eval_duration": 2_000_000_000, "load_duration": 1_500_000_000}
+    metrics = TurnMetrics.from_stream(fake_stream(final=final), "gemma3:4b", "ollama")
+
+    assert metrics.ttft_s == 0.5
+    assert metrics.itl_mean_s == pytest.approx(0.15)
+    assert metrics.itl_max_s == pytest.approx(0.2)
+    assert metrics.load_s == 1.5
+    assert metrics.prompt_eval_s == 0.2
+    assert metrics.tokens_per_s == 25.0
+
+
+def test_usage_metadata_is_used_for_other_providers():
+    metrics = TurnMetrics.from_stream(fake_stream(usage={"input_tokens": 10, "output_tokens": 5}),
+                                      "deepseek-chat", "ChatDeepSeek")
+    assert metrics.prompt_tokens == 10
+    assert metrics.tokens_per_s == pytest.approx(10.0)  # 5 tokens en 0.5 s tras el primer token
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([0, 10], 95) == pytest.approx(9.5)
+
+
+def test_recorder_writes_jsonl_and_skips_cancelled_in_aggregates(tmp_path):
+    sink = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(str(sink))
+    recorder.record(TurnMetrics(model="m", ttft_s=1.0))
+    recorder.record(TurnMetrics(model="m", ttft_s=3.0))
+    recorder.record(TurnMetrics(model="m", ttft_s=99.0, cancelled=True))
+    recorder.close()
+
+    lines = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert [line["ttft_s"] for line in lines] == [1.0, 3.0, 99.0]
+    assert recorder.aggregates()["ttft_s"] == {"n": 2, "p50": 2.0, "p95": pytest.approx(2.9)}
+    assert "p95" in recorder.format_stats()
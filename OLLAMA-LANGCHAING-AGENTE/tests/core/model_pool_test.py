@@ -0,0 +1,81 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/model_pool_test.py
+import pytest
+
+from core import model_pool
+from core.model_pool import ModelPool, normalize_model_name
+
+
+class StubClient:
+    def __init__(self, names):
+        self.names = names
+        self.tag_calls = 0
+        self.loaded = []
+
+    def tags(self):
+        self.tag_calls += 1
+        return self.names
+
+    def load_model(self, model, keep_alive=None, options=None):
+        self.loaded.append((model, keep_alive, options))
+        return {"done": True}
+
+
+def test_clients_are_built_once_per_model():
+    built = []
+    pool = ModelPool(lambda model_id: built.append(model_id) or object())
+    assert pool.get("a") is pool.get("a")
+    assert built == ["a"]
+
+
+def test_normalize_model_name_adds_latest_tag():
+    assert normalize_model_name("gemma3") == "gemma3:latest"
+    assert normalize_model_name("gemma3:4b") == "gemma3:4b"
+
+
+def test_unknown_ollama_model_is_rejected_with_cached_tags(monkeypatch):
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    client = StubClient(["gemma3:4b"])
+    monkeypatch.setattr(model_pool, "get_ollama_client", lambda base_url=None: client)
+    pool = ModelPool(lambda model_id: None)
+
+    assert pool.check_available(chat_models.ChatOllama(model="gemma3:4b")) is None
+    assert pool.check_available(chat_models.ChatOllama(model="gemma3:4b")) is None
+    assert client.tag_calls == 1
+    assert "ollama pull" in pool.check_available(chat_models.ChatOllama(model="llama9"))
+
+
+def test_every_host_is_probed_when_the_model_has_several(monkeypatch):
+    routed = pytest.importorskip("core.routed_ollama")
+    clients = {"http://a:11434": StubClient(["gemma3:4b"]), "http://b:11434": StubClient([])}
+    monkeypatch.setattr(model_pool, "get_ollama_client", lambda base_url=None: clients[base_url])
+    pool = ModelPool(lambda model_id: None)
+    llm = routed.RoutedChatOllama(model="gemma3:4b", base_url="http://a:11434", base_urls=list(clients))
+
+    error = pool.check_available(llm)
+    assert "http://b:11434" in error and "http://a:11434" not in error
+    clients["http://b:11434"].names = ["gemma3:4b"]
+    assert pool.check_available(llm) is None
+
+def test_preload_issues_zero_token_request_with_keep_alive(monkeypatch):
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    client = StubClient([])
+    monkeypatch.setattr(model_pool, "get_ollama_client", lambda base_url=None: client)
+    pool = ModelPool(lambda model_id: chat_models.ChatOllama(model="gemma3:4b", keep_alive="30m"))
+
+    pool.preload("gemma-ollama", {"num_ctx": 4096}).join()
+    assert client.loaded == [("gemma3:4b", "30m", {"num_ctx": 4096})]
+
+
+def test_failed_preload_is_reported_to_the_caller(monkeypatch):
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+
+    class DownClient:
+        def load_model(self, model, keep_alive=None, options=None):
+            raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(model_pool, "get_ollama_client", lambda base_url=None: DownClient())
+    pool = ModelPool(lambda model_id: chat_models.ChatOllama(model="gemma3:4b"))
+    pool.preload("gemma-ollama").join()
+    errors = pool.take_errors()
+    assert len(errors) == 1 and "Connection refused" in errors[0]
+    assert pool.take_errors() == []
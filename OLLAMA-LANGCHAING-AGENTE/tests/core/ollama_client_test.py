@@ -0,0 +1,111 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/ollama_client_test.py
+import asyncio
+
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from core.ollama_client import OllamaClient, OllamaError, RequestTimings
+
+
+@pytest.fixture
+def server():
+    with FakeOllama(tokens_per_reply=8) as fake:
+        yield fake
+
+
+async def chat(client, **kwargs):
+    return [e async for e in client.achat_stream("gemma3:4b", [{"role": "user", "content": "hola"}], **kwargs)]
+
+
+def test_connections_are_reused_between_requests(server):
+    client = OllamaClient(server.base_url)
+    first, second = RequestTimings(), RequestTimings()
+
+    async def run():
+        events = await chat(client, timings=first)
+        await chat(client, timings=second)
+        await client.aclose()
+        return events
+
+    events = asyncio.run(run())
+    assert events[-1]["done"] and events[-1]["eval_count"] == 8
+    assert not first.reused_connection
+    assert second.reused_connection
+    assert first.ttft_s is not None and first.total_s >= first.ttft_s
+    assert server.stats["connections"] == 1
+    client.close()
+
+
+def test_cancelling_one_stream_keeps_the_pool_usable():
+    with FakeOllama(token_rate=200, tokens_per_reply=100) as server:
+        client = OllamaClient(server.base_url)
+
+        async def run():
+            received = []
+
+            async def consume():
+                async for event in client.achat_stream("gemma3:4b", [{"role": "user", "content": "hola"}]):
+                    received.append(event)
+
+            task = asyncio.create_task(consume())
+            while len(received) < 3:
+                await asyncio.sleep(0.005)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            server.token_rate = 0
+            events = await chat(client)
+            await client.aclose()
+            return len(received), events
+
+        received, events = asyncio.run(run())
+        assert 3 <= received < 100 and events[-1]["done"]
+        client.close()
+
+
+def test_server_errors_raise_ollama_error(server):
+    client = OllamaClient(server.base_url)
+
+    async def run():
+        try:
+            return [e async for e in client.achat_stream("no-existe", [])]
+        finally:
+            await client.aclose()
+
+    with pytest.raises(OllamaError, match="not found"):
+        asyncio.run(run())
+    client.close()
+
+
+def test_each_event_loop_gets_its_own_async_client(server):
+    client = OllamaClient(server.base_url)
+
+    async def leave_open():
+        await chat(client)
+        return client._async_client()
+
+    first = asyncio.run(leave_open())  # el loop termina sin aclose()
+    second = asyncio.run(leave_open())
+    assert first is not second
+
+    # Un loop parado pero sin cerrar (como el del motor) se cierra al salir
+    loop = asyncio.new_event_loop()
+    third = loop.run_until_complete(leave_open())
+    client.close()
+    assert third.is_closed
+    loop.close()
+
+
+def test_async_stream_and_tags(server):
+    client = OllamaClient(server.base_url)
+
+    async def run():
+        events = [e async for e in client.achat_stream("gemma3:4b", [{"role": "user", "content": "hola"}])]
+        await client.aclose()
+        return events
+
+    events = asyncio.run(run())
+    assert "".join(e["message"]["content"] for e in events).count(" ") == 8
+    assert client.tags() == ["gemma3:4b"]
+    assert client.load_model("gemma3:4b")["done_reason"] == "load"
+    client.close()
@@ -0,0 +1,74 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/openai_client_test.py
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_ollama import FakeOllama
+from core.engine import ChatStream
+from core.openai_client import OpenAIError, openai_endpoint, sse_data, usage_metadata
+
+chat_openai = pytest.importorskip("langchain_openai.chat_models")
+
+
+def make_llm(fake, **kwargs):
+    # Ollama sirve también la API compatible con OpenAI en /v1
+    return chat_openai.ChatOpenAI(**{"model": "gemma3:4b", "base_url": f"{fake.base_url}/v1", "api_key": "x",
+                                     "temperature": 0, **kwargs})
+
+
+def test_sse_data_joins_lines_and_skips_comments():
+    async def lines():
+        for line in [": keep-alive", "", "event: x", "data: {\"a\":", "data: 1}", "", "data: [DONE]"]:
+            yield line
+
+    async def collect():
+        return [data async for data in sse_data(lines())]
+    assert asyncio.run(collect()) == ['{"a":\n1}', "[DONE]"]
+
+
+def test_usage_metadata_reads_openai_and_deepseek_cache_hits():
+    openai = usage_metadata({"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13,
+                             "prompt_tokens_details": {"cached_tokens": 8}})
+    deepseek = usage_metadata({"prompt_tokens": 10, "completion_tokens": 3, "prompt_cache_hit_tokens": 6})
+    assert openai["input_token_details"]["cache_read"] == 8 and openai["output_tokens"] == 3
+    assert deepseek["input_token_details"]["cache_read"] == 6
+    assert "input_token_details" not in usage_metadata({"prompt_tokens": 1})
+
+
+def test_chat_stream_uses_the_native_client_for_openai_compatible_models():
+    with FakeOllama(tokens_per_reply=32) as fake:
+        llm = make_llm(fake, max_tokens=6)
+        assert openai_endpoint(llm) == (f"{fake.base_url}/v1", "x")
+        stream = ChatStream(llm, [HumanMessage(content="hola")])
+        content = asyncio.run(stream.collect())
+    assert len(content.split()) == 6
+    assert stream.usage["output_tokens"] == 6 and stream.usage["input_tokens"] == 1
+    assert stream.timings.ttft_s is not None and stream.endpoint == f"{fake.base_url}/v1"
+
+
+def test_cancelling_closes_the_connection():
+    with FakeOllama(token_rate=100, tokens_per_reply=500) as fake:
+        stream = ChatStream(make_llm(fake), [HumanMessage(content="hola")])
+
+        async def main():
+            task = asyncio.ensure_future(stream.collect())
+            while len(stream.chunks) < 3:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            for _ in range(100):
+                if fake.stats["cancelled"]:
+                    break
+                await asyncio.sleep(0.01)
+        asyncio.run(main())
+        assert fake.stats["cancelled"] == 1
+        assert len(stream.chunks) < 10
+
+
+def test_errors_raise_openai_error():
+    with FakeOllama() as fake:
+        stream = ChatStream(make_llm(fake, model="no-existe"), [HumanMessage(content="hola")])
+        with pytest.raises(OpenAIError, match="not found") as error:
+            asyncio.run(stream.collect())
+    assert error.value.status_code == 404
@@ -0,0 +1,82 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/prompt_test.py
+from types import SimpleNamespace
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from core.history import ConversationHistory
+from core.metrics import MetricsRecorder, TurnMetrics
+from core.ollama_client import RequestTimings
+from core.prompt import PromptAssembler
+
+
+def test_prefix_is_byte_stable_and_volatile_goes_last():
+    assembler = PromptAssembler("Eres TRON.", ["Contexto A"])
+    history = ConversationHistory(token_budget=10_000)
+
+    first = assembler.build(history.messages(), "hola", volatile="hora: 10:00")
+    history.add_turn("hola", "buenas")
+    second = assembler.build(history.messages(), "¿y ahora?", volatile="hora: 10:01")
+
+    assert isinstance(first[0], SystemMessage)
+    assert first[0].content == second[0].content == "Eres TRON.\n\nContexto A"
+    assert first[-1].content == "hola\n\nhora: 10:00"
+    # El segundo prompt comparte el system prompt; el mensaje con la parte volátil ya no coincide
+    assert [m.content for m in second[:2]] == ["Eres TRON.\n\nContexto A", "hola"]
+    assert assembler.stable_prefix_tokens == assembler.prefix_tokens
+
+
+def test_model_switch_keeps_turns_with_new_budget():
+    history = ConversationHistory(token_budget=3000, keep_recent_turns=4)
+    history.add_turn("pregunta", "respuesta")
+    history.apply_model_info({"history": {"token_budget": 32000, "keep_recent_turns": 8}})
+    assert history.token_budget == 32000
+    assert [m.content for m in history.messages()] == ["pregunta", "respuesta"]
+
+
+def ollama_turn(prompt_eval_count, previous=None, prompt_growth=None):
+    stream = SimpleNamespace(timings=RequestTimings(), chunk_times=[], usage=None,
+                             final={"prompt_eval_count": prompt_eval_count, "eval_count": 1})
+    return TurnMetrics.from_stream(stream, "gemma3:4b", "ollama", previous=previous, prompt_growth=prompt_growth)
+
+
+def test_ollama_cache_hits_come_from_prompt_growth():
+    first = ollama_turn(100)
+    assert (first.cache_hit_tokens, first.prompt_total_tokens) == (None, 100)
+
+    hit = ollama_turn(30, previous=first, prompt_growth=25)  # solo se evaluó lo que creció
+    assert (hit.cache_hit_tokens, hit.prompt_total_tokens) == (100, 130)
+    miss = ollama_turn(160, previous=hit, prompt_growth=25)  # más que todo el prompt anterior
+    assert (miss.cache_hit_tokens, miss.prompt_total_tokens) == (0, 160)
+    unknown = ollama_turn(90, previous=miss, prompt_growth=25)
+    assert (unknown.cache_hit_tokens, unknown.prompt_total_tokens) == (None, None)
+    assert ollama_turn(10, previous=unknown, prompt_growth=25).cache_hit_tokens is None
+
+
+def test_cache_hits_for_ollama_and_deepseek():
+    ollama = ollama_turn(3, previous=ollama_turn(100), prompt_growth=5)
+    deepseek = TurnMetrics.from_stream(
+        SimpleNamespace(timings=RequestTimings(), chunk_times=[], final=None,
+                        usage={"input_tokens": 100, "output_tokens": 5, "input_token_details": {"cache_read": 80}}),
+        "deepseek-chat", "ChatDeepSeek")
+
+    assert ollama.cache_hit_tokens == 100
+    assert deepseek.cache_hit_tokens == 80
+    recorder = MetricsRecorder()
+    recorder.record(ollama_turn(100))  # sin turno anterior: no suma aciertos ni total
+    recorder.record(ollama)
+    recorder.record(deepseek)
+    assert recorder.format_cache() == "Caché de prompt: 180 de 203 tokens reutilizados (89%)"
+
+
+def test_history_trims_in_blocks_so_the_prefix_stays_put():
+    assembler = PromptAssembler("Eres TRON.")
+    history = ConversationHistory(token_budget=200, keep_recent_turns=1)
+    firsts = []
+    for i in range(12):
+        messages = assembler.build(history.messages(), f"pregunta {i}")
+        firsts.append(messages[1].content if len(messages) > 2 else None)
+        history.add_turn(f"pregunta {i} " + "x" * 100, f"respuesta {i} " + "y" * 100)
+    # El primer mensaje del historial solo cambia cuando se recorta un bloque, no en cada turno
+    changes = sum(1 for a, b in zip(firsts, firsts[1:]) if a and b and a != b)
+    assert 0 < changes <= 4
+    assert assembler.grown_tokens > 0
@@ -0,0 +1,32 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/providers_test.py
+import pytest
+
+from core import providers
+
+
+def test_registered_provider_receives_a_copy_of_config():
+    received = {}
+
+    def factory(config):
+        config["mutated"] = True
+        received.update(config)
+        return "llm"
+
+    providers.register_provider("fake", factory)
+    original = {"model": "x"}
+    assert providers.create_llm("fake", original) == "llm"
+    assert received == {"model": "x", "mutated": True}
+    assert original == {"model": "x"}
+    assert "fake" in providers.available_providers()
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError, match="no soportado"):
+        providers.get_provider("no-existe")
+
+
+def test_deepseek_requires_api_key(monkeypatch):
+    pytest.importorskip("langchain_deepseek")
+    monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="DEEPSEEK_API_KEY"):
+        providers.create_llm("deepseek", {"model": "deepseek-chat"})
@@ -0,0 +1,68 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/render_test.py
+import io
+import json
+import time
+
+from core.render import JsonlEventSink, StreamRenderer, TranscriptSink, mark_sinks
+
+
+class CountingWriter(io.StringIO):
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def test_chunks_are_coalesced_into_frames():
+    out = CountingWriter()
+    renderer = StreamRenderer(out=out, max_fps=10)
+    for i in range(500):
+        renderer.feed(f"t{i} ")
+    text = renderer.close()
+
+    assert out.getvalue() == text == "".join(f"t{i} " for i in range(500))
+    assert out.writes < 10
+
+
+def test_newline_flushes_without_waiting_for_the_frame():
+    out = CountingWriter()
+    renderer = StreamRenderer(out=out, max_fps=0.5)
+    renderer.feed("línea completa\n")
+    deadline = time.monotonic() + 1.0
+    while not out.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert out.getvalue() == "línea completa\n"
+    renderer.close()
+
+
+def test_slow_terminal_does_not_block_feed():
+    renderer = StreamRenderer(out=CountingWriter(delay=0.05), max_fps=1000)
+    start = time.perf_counter()
+    for i in range(200):
+        renderer.feed("x\n")
+    assert time.perf_counter() - start < 0.5
+    assert renderer.close() == "x\n" * 200
+
+
+def test_sinks_receive_frames_and_turn_marks(tmp_path):
+    transcript = TranscriptSink(str(tmp_path / "chat.txt"))
+    events = JsonlEventSink(str(tmp_path / "events.jsonl"))
+    sinks = [transcript, events]
+
+    mark_sinks(sinks, "user", text="hola")
+    renderer = StreamRenderer(out=io.StringIO(), sinks=sinks)
+    renderer.feed("buenas ")
+    renderer.feed("tardes")
+    renderer.close()
+    transcript.close()
+    events.close()
+
+    assert (tmp_path / "chat.txt").read_text(encoding="utf-8").endswith("Tú: hola\nAgente: buenas tardes")
+    lines = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert lines[0]["type"] == "user"
+    assert "".join(e["text"] for e in lines if e["type"] == "text") == "buenas tardes"
@@ -0,0 +1,61 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/response_cache_test.py
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.fake_ollama import FakeOllama
+from core.response_cache import ResponseCache, cache_key
+
+chat_models = pytest.importorskip("langchain_ollama.chat_models")
+
+MESSAGES = [HumanMessage(content="hola")]
+MODEL_INFO = {"id": "gemma-ollama", "config": {"model": "gemma3:4b", "temperature": 0}}
+
+
+def test_key_is_canonical_and_sensitive_to_inputs():
+    key = cache_key("gemma-ollama", {"temperature": 0, "model": "gemma3:4b"}, MESSAGES, {"num_ctx": 2048})
+    assert key == cache_key("gemma-ollama", {"model": "gemma3:4b", "temperature": 0, "api_key": "x"},
+                            MESSAGES, {"num_ctx": 2048})
+    assert key != cache_key("gemma-ollama", {"temperature": 0, "model": "gemma3:4b"}, MESSAGES, {"num_ctx": 4096})
+    assert key != cache_key("gemma-ollama", {"temperature": 0, "model": "gemma3:4b"},
+                            [SystemMessage(content="hola")], {"num_ctx": 2048})
+
+
+def test_second_request_is_replayed_from_disk(tmp_path):
+    with FakeOllama(tokens_per_reply=8) as server:
+        llm = chat_models.ChatOllama(model="gemma3:4b", base_url=server.base_url, temperature=0)
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+        first = cache.stream("gemma-ollama", MODEL_INFO, llm, MESSAGES)
+        content = asyncio.run(first.collect())
+        second = cache.stream("gemma-ollama", MODEL_INFO, llm, MESSAGES)
+        replayed = asyncio.run(second.collect())
+
+        assert replayed == content
+        assert second.cached and not first.cached
+        assert server.stats["requests"] == 1
+        assert cache.hit_rate == 0.5
+        cache.close()
+
+
+def test_nondeterministic_models_bypass_the_cache(tmp_path):
+    llm = chat_models.ChatOllama(model="gemma3:4b", temperature=0.7)
+    assert ResponseCache(str(tmp_path / "a.sqlite")).stream("gemma-ollama", MODEL_INFO, llm, MESSAGES).cached is False
+    assert ResponseCache(str(tmp_path / "b.sqlite"), allow_nondeterministic=True).cacheable(llm)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=250)
+    entry = {"chunks": ["x" * 50], "chunk_times": [0.0], "final": None, "usage": None}
+    cache.put("a", "m", entry)
+    time.sleep(0.01)
+    cache.put("b", "m", entry)
+    time.sleep(0.01)
+    cache.get("a")  # "a" pasa a ser la más reciente
+    cache.put("c", "m", entry)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats["evicted"] == 1
@@ -0,0 +1,71 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/routing_test.py
+import asyncio
+import socket
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_ollama import FakeOllama
+from core.engine import ChatStream
+from core.routing import RoutedStream, RoutingPolicy
+
+chat_models = pytest.importorskip("langchain_ollama.chat_models")
+MESSAGES = [HumanMessage(content="hola")]
+
+
+def factory(base_url):
+    llm = chat_models.ChatOllama(model="gemma3:4b", base_url=base_url)
+    return lambda: ChatStream(llm, MESSAGES)
+
+
+def dead_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def route(attempts, **policy):
+    stream = RoutedStream(attempts, RoutingPolicy(primary=attempts[0][0], **policy))
+    content = asyncio.run(stream.collect())
+    return stream, content
+
+
+def test_policy_from_config():
+    policy = RoutingPolicy.from_config({"routing": {"primary": "gemma-ollama", "fallbacks": ["deepseek-chat"],
+                                                    "ttft_deadline_ms": 4000, "hedge_after_ms": 1500}})
+    assert policy.chain == ["gemma-ollama", "deepseek-chat"]
+    assert policy.ttft_deadline_s == 4.0 and policy.hedge_after_s == 1.5
+    assert RoutingPolicy.from_config({"models": []}) is None
+
+
+def test_fast_primary_answers_without_events():
+    with FakeOllama(tokens_per_reply=4) as local, FakeOllama(tokens_per_reply=4) as remote:
+        stream, content = route([("local", factory(local.base_url)), ("remote", factory(remote.base_url))],
+                                ttft_deadline_s=2.0, hedge_after_s=1.0)
+        assert stream.model_id == "local" and not stream.events
+        assert len(stream.chunks) == 4 and remote.stats["requests"] == 0
+
+
+def test_ttft_deadline_fails_over_to_the_fallback():
+    with FakeOllama(first_token_delay=1.0) as local, FakeOllama(tokens_per_reply=4) as remote:
+        stream, content = route([("local", factory(local.base_url)), ("remote", factory(remote.base_url))],
+                                ttft_deadline_s=0.2)
+        assert stream.model_id == "remote" and stream.rerouted
+        assert stream.timings.ttft_s < 0.8
+        assert "sin primer token" in stream.events[0]
+
+
+def test_hedge_keeps_the_first_to_answer():
+    with FakeOllama(first_token_delay=1.0) as local, FakeOllama(tokens_per_reply=4) as remote:
+        stream, content = route([("local", factory(local.base_url)), ("remote", factory(remote.base_url))],
+                                hedge_after_s=0.1)
+        assert stream.model_id == "remote"
+        assert stream.events[0].startswith("hedge tras 100 ms")
+        assert stream.timings.total_s < 0.8
+
+
+def test_error_before_first_token_fails_over():
+    with FakeOllama(tokens_per_reply=4) as remote:
+        stream, content = route([("local", factory(dead_url())), ("remote", factory(remote.base_url))])
+        assert stream.model_id == "remote"
+        assert stream.events[0].startswith("local: error")
@@ -0,0 +1,176 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/scheduler_test.py
+import asyncio
+
+import pytest
+
+from core.engine import ChatStream, continue_messages
+from core.scheduler import PriorityScheduler, QueueFull
+
+
+def test_limits_are_per_model_and_queue_is_bounded():
+    async def scenario():
+        scheduler = PriorityScheduler(max_waiting=0)
+        scheduler.register("a", 1)
+        scheduler.register("b", 1)
+        async with scheduler.slot("a"):
+            async with scheduler.slot("b"):  # otro modelo: su propio límite
+                with pytest.raises(QueueFull):
+                    async with scheduler.slot("a"):
+                        pass
+        assert scheduler.stats["rejected"] == 1
+    asyncio.run(scenario())
+
+
+def test_higher_priority_waiter_goes_first():
+    async def scenario():
+        scheduler = PriorityScheduler()
+        scheduler.register("m", 1)
+        order = []
+
+        async def job(name, priority):
+            async with scheduler.slot("m", priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.create_task(job("primero", "normal"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(job("lote", "batch")), asyncio.create_task(job("normal", "normal")),
+                   asyncio.create_task(job("chat", "interactive"))]
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(scenario()) == ["primero", "chat", "normal", "lote"]
+
+
+def test_class_cap_keeps_capacity_for_other_classes():
+    async def scenario():
+        scheduler = PriorityScheduler(class_caps={"batch": 1})
+        scheduler.register("m", 2)
+        started = []
+
+        async def job(name, priority):
+            async with scheduler.slot("m", priority):
+                started.append(name)
+                await asyncio.sleep(0.05)
+
+        batch = [asyncio.create_task(job(f"lote{i}", "batch")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        chat = asyncio.create_task(job("chat", "interactive"))
+        await asyncio.sleep(0.01)
+        snapshot = list(started)
+        await asyncio.gather(*batch, chat)
+        return snapshot
+
+    # El segundo lote espera aunque quede un hueco: es para las otras clases
+    assert asyncio.run(scenario()) == ["lote0", "chat"]
+
+
+def test_preemption_cancels_and_requeues_low_priority_work():
+    async def scenario():
+        scheduler = PriorityScheduler(preempt=True)
+        scheduler.register("m", 1)
+        events = []
+
+        async def batch_work():
+            events.append("lote empieza")
+            await asyncio.sleep(0.2)
+            events.append("lote termina")
+            return "lote"
+
+        async def chat_work():
+            events.append("chat")
+            return "chat"
+
+        batch = asyncio.create_task(scheduler.run("m", batch_work, "batch"))
+        await asyncio.sleep(0.02)
+        chat = await scheduler.run("m", chat_work, "interactive")
+        return chat, await batch, events, scheduler.stats["preempted"]
+
+    chat, batch, events, preempted = asyncio.run(scenario())
+    assert (chat, batch, preempted) == ("chat", "lote", 1)
+    assert events == ["lote empieza", "chat", "lote empieza", "lote termina"]
+
+
+
+def test_preempted_stream_continues_from_what_it_emitted():
+    words = ["uno ", "dos ", "tres ", "cuatro "]
+
+    async def scenario():
+        scheduler = PriorityScheduler(preempt=True)
+        scheduler.register("m", 1)
+        prefixes, received = [], []
+
+        class Continuing:
+            # Como un ChatStream de Ollama, que continúa el mensaje del asistente tras lo ya escrito
+            resumable = True
+
+            def __init__(self, prefix):
+                prefixes.append(prefix)
+                self.prefix = prefix
+
+            async def __aiter__(self):
+                for word in words[len(self.prefix.split()):]:
+                    await asyncio.sleep(0.03)
+                    yield word
+
+        async def emit(text):
+            received.append(text)
+
+        batch = asyncio.create_task(scheduler.run_stream("m", Continuing, emit, "batch"))
+        await asyncio.sleep(0.05)
+        chat = await scheduler.run_stream("m", Continuing, priority="interactive")
+        return await batch, chat, prefixes, received, scheduler.stats["preempted"]
+
+    batch, chat, prefixes, received, preempted = asyncio.run(scenario())
+    assert preempted == 1 and chat == "".join(words)
+    # Lo emitido no se repite: la segunda generación recibe "uno " como prefijo y sigue desde ahí
+    assert batch == "".join(words) and "".join(received) == batch
+    assert prefixes == ["", "", "uno "]
+
+
+def test_streams_that_cannot_continue_are_not_preempted():
+    fake_chat_models = pytest.importorskip("langchain_core.language_models.fake_chat_models")
+    # llm.astream() (como los compatibles con OpenAI) no continúa un AIMessage final: respondería de nuevo
+    llm = fake_chat_models.FakeListChatModel(responses=["respuesta larga"], sleep=0.01)
+    messages = [("human", "hola")]
+
+    async def scenario():
+        scheduler = PriorityScheduler(preempt=True)
+        scheduler.register("m", 1)
+        received, prefixes = [], []
+
+        async def emit(text):
+            received.append(text)
+
+        def make_stream(prefix):
+            prefixes.append(prefix)
+            return ChatStream(llm, continue_messages(messages, prefix))
+
+        batch = asyncio.create_task(scheduler.run_stream("m", make_stream, emit, "batch"))
+        await asyncio.sleep(0.05)
+        chat = await scheduler.run_stream("m", make_stream, priority="interactive")
+        return await batch, chat, "".join(received), prefixes, scheduler.stats["preempted"]
+
+    batch, chat, received, prefixes, preempted = asyncio.run(scenario())
+    # El interactivo espera a que termine: el cliente del lote recibe una sola respuesta, sin prefijo repetido
+    assert preempted == 0 and prefixes == ["", ""]
+    assert batch == received == chat == "respuesta larga"
+
+def test_non_preemptible_slots_are_never_cancelled():
+    async def scenario():
+        scheduler = PriorityScheduler(preempt=True)
+        scheduler.register("m", 1)
+        async with scheduler.slot("m", "batch"):
+            waiter = asyncio.create_task(scheduler.run("m", lambda: asyncio.sleep(0, "chat"), "interactive"))
+            await asyncio.sleep(0.02)
+            assert not waiter.done() and scheduler.stats["preempted"] == 0
+        return await waiter
+
+    assert asyncio.run(scenario()) == "chat"
+
+
+def test_from_config_validates_classes():
+    scheduler = PriorityScheduler.from_config({"scheduler": {"class_caps": {"batch": 1}, "preempt": True}})
+    assert scheduler.preempt and scheduler.class_caps == {"batch": 1}
+    with pytest.raises(ValueError):
+        PriorityScheduler.from_config({"scheduler": {"class_caps": {"urgente": 1}}})
@@ -0,0 +1,184 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/server_test.py
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from core.scheduler import PriorityScheduler
+from core.server import ChatServer
+
+chat_models = pytest.importorskip("langchain_ollama.chat_models")
+
+
+def make_server(fake, max_queue=8, max_concurrency=None):
+    info = {"id": "gemma-ollama", "alias": "gemma", "provider": "ollama", "max_concurrency": max_concurrency}
+    llm = chat_models.ChatOllama(model="gemma3:4b", base_url=fake.base_url)
+
+    def resolve(identifier):
+        return ("gemma-ollama", info, llm) if identifier in ("gemma-ollama", "gemma") else None
+
+    return ChatServer(resolve, [info], "gemma-ollama", max_queue=max_queue)
+
+
+def run_with_server(server, scenario):
+    async def main():
+        await server.start("127.0.0.1", 0)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}", timeout=5) as client:
+                return await scenario(client)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+BODY = {"model": "gemma", "messages": [{"role": "user", "content": "hola"}], "max_tokens": 4}
+
+
+def test_models_and_non_streaming_completion():
+    with FakeOllama() as fake:
+        async def scenario(client):
+            models = (await client.get("/v1/models")).json()
+            completion = (await client.post("/v1/chat/completions", json=BODY)).json()
+            return models, completion
+
+        models, completion = run_with_server(make_server(fake), scenario)
+        assert [m["id"] for m in models["data"]] == ["gemma-ollama"]
+        assert completion["object"] == "chat.completion" and completion["model"] == "gemma-ollama"
+        assert completion["choices"][0]["message"]["content"]
+        assert completion["usage"]["completion_tokens"] == 4
+
+
+def test_streaming_completion_sends_sse_and_done():
+    with FakeOllama() as fake:
+        async def scenario(client):
+            request = {**BODY, "stream": True, "stream_options": {"include_usage": True}}
+            async with client.stream("POST", "/v1/chat/completions", json=request) as response:
+                lines = [line async for line in response.aiter_lines() if line.startswith("data: ")]
+            return response.headers["content-type"], lines
+
+        content_type, lines = run_with_server(make_server(fake), scenario)
+        assert content_type == "text/event-stream"
+        assert lines[-1] == "data: [DONE]"
+        events = [json.loads(line[6:]) for line in lines[:-1]]
+        text = "".join(e["choices"][0]["delta"].get("content", "") for e in events if e["choices"])
+        assert len(text.split()) == 4
+        assert events[-1]["usage"]["completion_tokens"] == 4
+
+
+def test_errors_follow_openai_format():
+    with FakeOllama() as fake:
+        async def scenario(client):
+            unknown = await client.post("/v1/chat/completions", json={**BODY, "model": "gpt-9"})
+            invalid = await client.post("/v1/chat/completions", content=b"{no json")
+
+            bad_priority = await client.post("/v1/chat/completions", json=BODY, headers={"X-Priority": "urgente"})
+            return unknown, invalid, bad_priority
+
+        unknown, invalid, bad_priority = run_with_server(make_server(fake), scenario)
+        assert unknown.status_code == 404 and "gpt-9" in unknown.json()["error"]["message"]
+        assert invalid.status_code == 400 and bad_priority.status_code == 400
+
+
+def test_full_queue_answers_429():
+    with FakeOllama(first_token_delay=0.5) as fake:
+        async def scenario(client):
+            return await asyncio.gather(*(client.post("/v1/chat/completions", json=BODY) for _ in range(3)))
+
+        server = make_server(fake, max_queue=1, max_concurrency=1)
+        responses = run_with_server(server, scenario)
+        codes = sorted(r.status_code for r in responses)
+        assert codes == [200, 200, 429]
+        rejected = next(r for r in responses if r.status_code == 429)
+        assert rejected.headers["retry-after"] == "1"
+        assert server.scheduler.stats["rejected"] == 1
+
+
+def test_client_disconnect_cancels_the_generation():
+    with FakeOllama(token_rate=20, tokens_per_reply=200) as fake:
+        async def scenario(client):
+            async with client.stream("POST", "/v1/chat/completions", json={**BODY, "stream": True,
+                                                                           "max_tokens": None}) as response:
+                async for line in response.aiter_lines():
+                    if '"content": "' in line and '""' not in line:
+                        break
+            for _ in range(50):
+                if fake.stats["cancelled"]:
+                    break
+                await asyncio.sleep(0.05)
+
+        run_with_server(make_server(fake), scenario)
+        assert fake.stats["cancelled"] == 1
+
+
+def test_pipelined_request_does_not_cancel_a_stream():
+    with FakeOllama(token_rate=50, tokens_per_reply=20) as fake:
+        server = make_server(fake)
+
+        async def scenario(_):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            body = json.dumps({**BODY, "stream": True, "max_tokens": None}).encode()
+            writer.write(b"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+            await reader.readuntil(b"\r\n\r\n")
+            await reader.readuntil(b"\n\n")  # chunk del rol
+            await reader.readuntil(b"\n\n")  # primer token: la generación ya está en marcha
+            # Siguiente petición en la misma conexión mientras llega el stream
+            writer.write(b"GET /v1/models HTTP/1.1\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        response = run_with_server(server, scenario)
+        assert b"data: [DONE]" in response
+        assert fake.stats["cancelled"] == 0
+
+
+def test_max_queue_is_rejected_with_a_shared_scheduler():
+    with pytest.raises(ValueError, match="max_queue"):
+        ChatServer(lambda _: None, [], max_queue=4, scheduler=PriorityScheduler())
+
+
+def raw_request(server, data: bytes) -> bytes:
+    async def scenario(_):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    return run_with_server(server, scenario)
+
+
+def test_invalid_content_length_answers_400():
+    with FakeOllama() as fake:
+        for length in (b"abc", b"-5"):
+            response = raw_request(make_server(fake), b"POST /v1/chat/completions HTTP/1.1\r\n"
+                                                      b"Content-Length: " + length + b"\r\n\r\n{}")
+            assert response.startswith(b"HTTP/1.1 400 ") and "Content-Length".encode() in response
+
+
+def test_client_disconnect_cancels_a_non_streaming_generation():
+    with FakeOllama(token_rate=20, tokens_per_reply=200) as fake:
+        server = make_server(fake)
+
+        async def scenario(_):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            body = json.dumps({**BODY, "max_tokens": None}).encode()
+            writer.write(b"POST /v1/chat/completions HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+            for _ in range(50):
+                if fake.active.get("gemma3:4b"):
+                    break
+                await asyncio.sleep(0.05)
+            writer.close()
+            for _ in range(50):
+                if fake.stats["cancelled"]:
+                    break
+                await asyncio.sleep(0.05)
+
+        run_with_server(server, scenario)
+        assert fake.stats["cancelled"] == 1
+        assert server.scheduler._models["gemma-ollama"].running == []  # el hueco quedó libre
@@ -0,0 +1,99 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/core/tier_router_test.py
+import asyncio
+import gc
+import json
+import time
+
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from core.tier_router import Tier, TierRouter
+
+CONFIG = {"tier_routing": {"tiers": [
+    {"name": "complex_task", "model": "deepseek-chat", "max_score": 1.0, "temperature": 0.1, "max_tokens": 8192},
+    {"name": "simple_read", "model": "gemma-ollama", "max_score": 0.15, "temperature": 0.0, "max_tokens": 1024},
+    {"name": "simple_task", "model": "gemma-ollama", "max_score": 0.45, "temperature": 0.7, "max_tokens": 4096},
+]}}
+
+
+def test_from_config_orders_tiers_and_needs_the_block():
+    router = TierRouter.from_config(CONFIG)
+    assert [t.name for t in router.tiers] == ["simple_read", "simple_task", "complex_task"]
+    assert TierRouter.from_config({"models": []}) is None
+
+
+def test_heuristic_picks_cheapest_adequate_tier():
+    router = TierRouter.from_config(CONFIG)
+    assert router.route("hola!").tier.name == "simple_read"
+    assert router.route("¿Cuál es la capital de Francia?").tier.name == "simple_read"
+    assert router.route("Escribe un correo corto para aplazar la reunión del lunes").tier.name == "simple_task"
+    code = "Explica por qué falla y optimiza esto:\n```python\ndef f(x):\n    return x / 0\n```"
+    decision = router.route(code)
+    assert decision.tier.name == "complex_task" and decision.source == "heurística"
+    assert "código" in decision.reasons
+
+
+def test_decision_is_fast():
+    router = TierRouter.from_config(CONFIG)
+    text = "Analiza y compara estas dos arquitecturas paso a paso. " * 40
+    start = time.perf_counter()
+    for _ in range(100):
+        router.route(text)
+    assert (time.perf_counter() - start) / 100 < 0.005
+
+
+def test_override_and_unknown_tier():
+    router = TierRouter.from_config(CONFIG)
+    decision = router.route("hola", override="complex_task")
+    assert decision.tier.name == "complex_task" and decision.source == "manual"
+    with pytest.raises(ValueError):
+        router.route("hola", override="enorme")
+
+
+def test_decisions_are_logged(tmp_path):
+    log = tmp_path / "tiers.jsonl"
+    router = TierRouter([Tier("simple_read", "gemma-ollama", 0.15), Tier("complex_task", "deepseek-chat")],
+                        log_path=str(log))
+    router.route("hola")
+    router.close()
+    entry = json.loads(log.read_text().splitlines()[0])
+    assert entry["tier"] == "simple_read" and entry["source"] == "heurística" and "elapsed_ms" in entry
+
+
+def test_apply_sets_tier_parameters_per_provider():
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    router = TierRouter.from_config(CONFIG)
+    llm = chat_models.ChatOllama(model="gemma3:4b", temperature=0.7)
+    tiered = router.apply(llm, router.get_tier("simple_read"))
+    assert tiered.temperature == 0.0 and tiered.num_predict == 1024
+    assert llm.num_predict is None
+    assert router.apply(llm, router.get_tier("simple_read")) is tiered
+
+
+def test_apply_cache_is_dropped_with_the_base_llm():
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    router = TierRouter.from_config(CONFIG)
+    tier = router.get_tier("simple_read")
+    llm = chat_models.ChatOllama(model="gemma3:4b")
+    router.apply(llm, tier)
+    del llm
+    gc.collect()
+    # Sin la entrada, otro llm que reciba el mismo id no puede llevarse la copia de un modelo distinto
+    assert router._applied == {}
+    other = chat_models.ChatOllama(model="qwen3:8b")
+    assert router.apply(other, tier).model == "qwen3:8b"
+
+
+def test_classifier_only_for_ambiguous_scores_and_bounded_by_timeout():
+    chat_models = pytest.importorskip("langchain_ollama.chat_models")
+    with FakeOllama(first_token_delay=1.0) as slow:
+        classifier = chat_models.ChatOllama(model="tiny", base_url=slow.base_url)
+        router = TierRouter([Tier("simple", "gemma-ollama", 0.3), Tier("complex", "deepseek-chat")],
+                            classifier_llm=classifier, classifier_timeout_s=0.1, margin=0.15)
+        assert asyncio.run(router.aroute("hola")).source == "heurística"
+        assert slow.stats["requests"] == 0
+
+        start = time.perf_counter()
+        decision = asyncio.run(router.aroute("Explica la diferencia entre una lista y una tupla en Python"))
+        assert time.perf_counter() - start < 0.8
+        assert decision.source == "heurística" and decision.tier.name == "simple"
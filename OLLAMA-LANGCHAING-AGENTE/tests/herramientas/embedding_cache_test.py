@@ -0,0 +1,54 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/herramientas/embedding_cache_test.py
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agents.herramientas.vectorial.embedding_cache import EmbeddingCache, text_key
+from benchmarks.fake_ollama import fake_embedding
+
+
+class CountingEmbedder:
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls: list[list[str]] = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [fake_embedding(text, self.dim) for text in texts]
+
+
+def test_only_new_text_is_embedded_and_repeats_once(tmp_path):
+    cache, embedder = EmbeddingCache(str(tmp_path)), CountingEmbedder()
+    first = cache.embed("m", ["menú", "uno", "menú"], embedder)
+    assert embedder.calls == [["menú", "uno"]]
+    second = cache.embed("m", ["uno", "dos", "menú  "], embedder)
+    assert embedder.calls[1] == ["dos"]
+    np.testing.assert_allclose(second[0], first[1], atol=1e-3)  # float16 en disco
+    np.testing.assert_allclose(second[2], first[0], atol=1e-3)
+    assert cache.stats == {"hits": 2, "misses": 4, "stored": 3}
+    assert "aciertos" in cache.format_stats()
+
+
+def test_keys_depend_on_model_and_normalized_text(tmp_path):
+    assert text_key("hola   mundo\n") == text_key("hola mundo")
+    cache, embedder = EmbeddingCache(str(tmp_path)), CountingEmbedder()
+    cache.embed("a", ["hola"], embedder)
+    cache.embed("b", ["hola"], embedder)
+    assert len(embedder.calls) == 2
+
+
+def test_cache_is_shared_between_instances_and_stored_compactly(tmp_path):
+    writer = EmbeddingCache(str(tmp_path))
+    writer.put_many("m", ["x", "y"], [fake_embedding("x", 16), fake_embedding("y", 16)])
+    writer.close()
+
+    reader = EmbeddingCache(str(tmp_path))
+    vectors = reader.get_many("m", ["y", "z"])
+    np.testing.assert_allclose(vectors[0], fake_embedding("y", 16), atol=1e-3)
+    assert vectors[1] is None and reader.hit_rate == 0.5
+    data = [f for f in os.listdir(tmp_path) if f.startswith("vectors-")]
+    assert os.path.getsize(tmp_path / data[0]) == 2 * 16 * 2  # 2 filas de float16
+    with pytest.raises(ValueError, match="float16"):
+        EmbeddingCache(str(tmp_path), dtype="float32").put_many("m", ["w"], [fake_embedding("w", 16)])
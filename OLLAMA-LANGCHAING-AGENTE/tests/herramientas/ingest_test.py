@@ -0,0 +1,134 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/herramientas/ingest_test.py
+import os
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agents.herramientas.vectorial.chunker import ChunkerSettings
+from agents.herramientas.vectorial.ingest import chunk_corpus, ingest, read_corpus, watch
+from agents.herramientas.vectorial.store import VectorStore
+from benchmarks.fake_ollama import FakeOllama, fake_embedding
+
+SETTINGS = ChunkerSettings(chunk_size=60, overlap=0)
+PARAGRAPHS = [f"Párrafo {i} sobre agentes, memoria y embeddings." for i in range(6)]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "a.md").write_text("\n\n".join(PARAGRAPHS[:3]), encoding="utf-8")
+    (docs / "sub" / "b.txt").write_text("\n\n".join(PARAGRAPHS[3:]), encoding="utf-8")
+    (docs / "c.md").write_text("Documento que se borrará.", encoding="utf-8")
+    return docs
+
+
+@pytest.fixture
+def fake():
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as server:
+        yield server
+
+
+def run(docs, index, fake, **kwargs):
+    return ingest(str(docs), str(index), "fake-embed", fake.base_url, SETTINGS, **kwargs)
+
+
+def assert_matches_full_build(docs, index):
+    """El índice incremental es idéntico al que saldría de construirlo desde cero."""
+    store = VectorStore.load(str(index), embedding_model="fake-embed")
+    expected = list(chunk_corpus(read_corpus(str(docs)), SETTINGS))
+    assert store.records == expected
+    assert np.allclose(store.vectors, [v / np.linalg.norm(v) for v in
+                                       (np.array(fake_embedding(r["text"], 8)) for r in expected)], atol=1e-6)
+    assert sorted(store.files) == sorted({r["source"] for r in expected})
+
+
+def test_second_run_without_changes_reads_nothing_and_keeps_the_index(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    first = run(corpus, index, fake)
+    assert first.added == 3 and first.saved
+    data_dir = VectorStore.read_manifest(str(index)).data_dir
+
+    second = run(corpus, index, fake)
+    assert (second.unchanged, second.embedded, second.saved) == (3, 0, False)
+    assert VectorStore.read_manifest(str(index)).data_dir == data_dir
+    assert fake.stats["requests"] == 1
+
+
+def test_only_new_and_changed_chunks_are_embedded(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    run(corpus, index, fake)
+    (corpus / "a.md").write_text("\n\n".join([PARAGRAPHS[0], "Párrafo nuevo del documento A.", PARAGRAPHS[2]]),
+                                 encoding="utf-8")
+    (corpus / "d.md").write_text("Un documento nuevo.", encoding="utf-8")
+    (corpus / "c.md").unlink()
+
+    report = run(corpus, index, fake)
+    assert (report.added, report.changed, report.removed, report.unchanged) == (1, 1, 1, 1)
+    assert report.embedded == 2  # el párrafo nuevo de a.md y d.md
+    assert report.stale == 2  # el párrafo sustituido de a.md y el chunk de c.md
+    assert_matches_full_build(corpus, index)
+
+
+def test_touched_file_with_same_content_is_not_resplit(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    run(corpus, index, fake)
+    stat = os.stat(corpus / "a.md")
+    os.utime(corpus / "a.md", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    report = run(corpus, index, fake)
+    assert (report.changed, report.touched, report.embedded, report.saved) == (0, 1, 0, True)
+    assert VectorStore.load(str(index)).files["a.md"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+    # La fecha nueva quedó guardada: la siguiente ingesta ya no vuelve a leer el archivo
+    again = run(corpus, index, fake)
+    assert (again.touched, again.saved) == (0, False)
+
+
+def test_incompatible_index_is_rebuilt(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    run(corpus, index, fake)
+    report = ingest(str(corpus), str(index), "fake-embed", fake.base_url, ChunkerSettings(chunk_size=30, overlap=0))
+    assert report.added == 3 and report.reused == 0
+    assert VectorStore.read_manifest(str(index)).chunker["chunk_size"] == 30
+
+
+def test_watch_picks_up_changes_until_stopped(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    reports, stop = [], threading.Event()
+
+    def on_report(report):
+        reports.append(report)
+        if len(reports) == 1:
+            (corpus / "e.md").write_text("Añadido mientras se vigila.", encoding="utf-8")
+        else:
+            stop.set()
+
+    thread = threading.Thread(target=watch, args=(str(corpus), str(index), "fake-embed", 0.01),
+                              kwargs={"stop_event": stop, "on_report": on_report,
+                                      "base_url": fake.base_url, "settings": SETTINGS})
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert [r.added for r in reports] == [3, 1]
+    assert "e.md" in VectorStore.load(str(index)).files
+
+
+def test_watch_survives_a_failed_ingestion(corpus, tmp_path, fake):
+    index = tmp_path / "indice"
+    errors, reports, stop = [], [], threading.Event()
+    fake.models = ["otro-modelo"]  # el modelo de embeddings aún no está: 404 en cada ingesta
+
+    def on_error(error):
+        errors.append(error)
+        if len(errors) == 2:
+            fake.models.append("fake-embed")
+
+    def on_report(report):
+        reports.append(report)
+        stop.set()
+
+    watch(str(corpus), str(index), "fake-embed", 0.01, stop_event=stop, on_report=on_report,
+          on_error=on_error, base_url=fake.base_url, settings=SETTINGS)
+    assert len(errors) == 2 and [r.added for r in reports] == [3]
@@ -0,0 +1,108 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/herramientas/pipeline_test.py
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agents.herramientas.vectorial.embedding_cache import EmbeddingCache
+from agents.herramientas.vectorial.pipeline import EmbeddingPipeline, load_tuning, save_tuning, tune
+from benchmarks.fake_ollama import FakeOllama, fake_embedding
+from core.ollama_client import OllamaClient, OllamaError
+
+TEXTS = [f"chunk número {i}" for i in range(50)]
+
+
+def run_pipeline(base_url, texts, **kwargs):
+    client = OllamaClient(base_url)
+
+    async def main():
+        pipeline = EmbeddingPipeline(client, "fake-embed", **kwargs)
+        try:
+            return await pipeline.embed(texts), pipeline.meter
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_batches_run_concurrently_and_keep_the_input_order():
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as fake:
+        vectors, meter = run_pipeline(fake.base_url, iter(TEXTS), batch_size=8, concurrency=3)
+        assert fake.stats["requests"] == 7  # ceil(50 / 8)
+    assert vectors.shape == (50, 8)
+    assert np.allclose(vectors, [fake_embedding(t, 8) for t in TEXTS], atol=1e-6)
+    assert meter.chunks == 50 and meter.requests == 7 and meter.tokens > 0
+
+
+def test_cached_chunks_are_not_sent_again(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as fake:
+        run_pipeline(fake.base_url, TEXTS[:20], batch_size=10, cache=cache)
+        vectors, meter = run_pipeline(fake.base_url, TEXTS[:30], batch_size=10, cache=cache)
+        assert fake.stats["requests"] == 3  # 2 de la primera ingesta y 1 con los 10 nuevos
+    cache.close()
+    assert meter.cached == 20 and vectors.shape == (30, 8)
+
+
+def test_transient_failures_are_retried_with_backoff():
+    with FakeOllama(models=("fake-embed",), embedding_dim=8, failure_rate=0.3) as fake:
+        vectors, meter = run_pipeline(fake.base_url, TEXTS, batch_size=5, concurrency=2,
+                                      max_retries=10, backoff_s=0.001)
+        assert meter.retries == fake.stats["failures"] > 0
+    assert vectors.shape == (50, 8)
+
+
+def test_permanent_errors_stop_the_ingestion():
+    with FakeOllama(models=("otro",), embedding_dim=8) as fake:
+        with pytest.raises(OllamaError, match="not found"):
+            run_pipeline(fake.base_url, TEXTS, batch_size=5, backoff_s=0.001)
+        assert fake.stats["requests"] <= 4  # ni reintentos ni el resto del corpus
+
+
+def test_the_chunker_is_consumed_only_as_fast_as_batches_are_embedded():
+    produced = []
+
+    def chunks():
+        for text in TEXTS:
+            produced.append(text)
+            yield text
+
+    class SlowClient(OllamaClient):
+        async def aembed(self, model, inputs, keep_alive=None):
+            # Al llegar el primer lote solo puede haber troceados los lotes que caben en la cola
+            peak.append(len(produced))
+            await asyncio.sleep(0.01)
+            return await super().aembed(model, inputs, keep_alive)
+
+    peak = []
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as fake:
+        client = SlowClient(fake.base_url)
+
+        async def main():
+            try:
+                return await EmbeddingPipeline(client, "fake-embed", batch_size=5, concurrency=1).embed(chunks())
+            finally:
+                await client.aclose()
+        vectors = asyncio.run(main())
+    assert vectors.shape == (50, 8)
+    assert peak[0] <= 5 * 4  # cola de 2 lotes + el del trabajador + el que espera hueco
+
+
+def test_tune_picks_a_measured_setting_and_persists_it(tmp_path):
+    path = str(tmp_path / "tuning.json")
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as fake:
+        client = OllamaClient(fake.base_url)
+
+        async def main():
+            try:
+                return await tune(client, "fake-embed", TEXTS, batch_sizes=(4, 16), concurrencies=(1, 2))
+            finally:
+                await client.aclose()
+        result = asyncio.run(main())
+    assert (result["batch_size"], result["concurrency"]) in {(t["batch_size"], t["concurrency"]) for t in result["trials"]}
+    assert {t["batch_size"] for t in result["trials"]} == {4, 16}
+
+    assert load_tuning("fake-embed", fake.base_url, path) is None
+    save_tuning("fake-embed", fake.base_url, result, path)
+    saved = load_tuning("fake-embed", fake.base_url, path)
+    assert saved["batch_size"] == result["batch_size"] and saved["concurrency"] == result["concurrency"]
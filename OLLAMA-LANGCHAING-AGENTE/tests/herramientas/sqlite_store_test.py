@@ -0,0 +1,110 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/herramientas/sqlite_store_test.py
+import sqlite3
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from agents.herramientas.sqlite_store.markdown import split_front_matter, split_sections
+from agents.herramientas.sqlite_store.store import ChunkStore, match_query
+from agents.herramientas.vectorial.chunker import ChunkerSettings
+
+SESSION_DOC = """---
+title: Sesiones
+tags: [orm, sesiones]
+---
+Introducción al ORM.
+
+# Session
+
+## Transacciones
+
+Session.commit() confirma y Session.rollback() deshace la transacción.
+
+```python
+# Esto es un comentario, no un título
+session.rollback()
+```
+
+## Carga perezosa
+
+La relación se carga con lazy loading al acceder al atributo.
+"""
+ENGINE_DOC = "# Engine\n\nEl engine gestiona el pool de conexiones y la transacción de cada conexión.\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite"), ChunkerSettings(chunk_size=200, overlap=0))
+    yield store
+    store.close()
+
+
+def test_sections_follow_headings_but_not_code_comments():
+    front, body = split_front_matter(SESSION_DOC)
+    assert front == {"title": "Sesiones", "tags": ["orm", "sesiones"]}
+    parts = split_sections(body)
+    assert [(s.level, s.path) for s in parts] == [
+        (0, ""), (1, "Session"), (2, "Session > Transacciones"), (2, "Session > Carga perezosa")]
+    assert "# Esto es un comentario" in parts[2].text
+    assert split_front_matter("sin cabecera") == ({}, "sin cabecera")
+
+
+def test_ingest_normalizes_documents_sections_chunks_and_metadata(store):
+    stats = store.ingest([("orm/session.md", SESSION_DOC), ("core/engine.md", ENGINE_DOC)])
+    assert stats.deferred and (stats.documents, stats.sections) == (2, 5)
+    assert store.counts() == {"documents": 2, "sections": 5, "chunks": 4, "metadata": 2}  # "# Session" no tiene texto propio
+    assert store.document_metadata("orm/session.md") == {"title": "Sesiones", "tags": ["orm", "sesiones"]}
+
+
+def test_search_ranks_with_bm25_and_weights_headings(store):
+    store.ingest([("orm/session.md", SESSION_DOC), ("core/engine.md", ENGINE_DOC)])
+    results = store.search("rollback")
+    assert results[0]["path"] == "orm/session.md" and results[0]["heading"] == "Session > Transacciones"
+    assert "[rollback]" in results[0]["snippet"].lower()
+    # "transacción" está en los dos documentos; sin tildes también encuentra (remove_diacritics)
+    assert {r["path"] for r in store.search("transaccion")} == {"orm/session.md", "core/engine.md"}
+    assert [r["heading"] for r in store.search("engine")][0] == "Engine"
+    assert store.search("carga", k=1)[0]["heading"] == "Session > Carga perezosa"
+    scores = [r["score"] for r in store.search("transacción conexión", any_term=True)]
+    assert scores == sorted(scores)
+
+
+def test_free_text_is_escaped_and_falls_back_to_any_term(store):
+    store.ingest([("core/engine.md", ENGINE_DOC)])
+    assert match_query('¿qué es "pool"?') == '"qué" "es" "pool"'
+    assert store.search("¿Qué es el pool de conexiones?")[0]["path"] == "core/engine.md"
+    assert store.search('"pool de conexiones"', raw=True)
+    assert store.search("¿?") == []
+    with pytest.raises(sqlalchemy.exc.OperationalError, match="unterminated string"):
+        store.search('"sin cerrar', raw=True)
+
+
+def test_reingest_skips_unchanged_replaces_changed_and_prunes(store):
+    store.ingest([("orm/session.md", SESSION_DOC), ("core/engine.md", ENGINE_DOC)])
+    stats = store.ingest([("orm/session.md", SESSION_DOC.replace("lazy loading", "selectin loading"))], prune=True)
+    assert (stats.documents, stats.skipped, stats.removed, stats.deferred) == (1, 0, 1, False)
+    assert store.search("selectin")[0]["path"] == "orm/session.md"
+    assert store.search("lazy") == [] and store.search("pool") == []
+    assert store.counts()["documents"] == 1
+
+    assert store.ingest([("orm/session.md", SESSION_DOC.replace("lazy loading", "selectin loading"))]).skipped == 1
+
+
+def test_fts_index_stays_consistent_after_incremental_changes(store, tmp_path):
+    store.ingest([("core/engine.md", ENGINE_DOC)])
+    store.ingest([("orm/session.md", SESSION_DOC)])
+    store.ingest([("core/engine.md", ENGINE_DOC + "\nNuevo párrafo.\n")])
+    conn = sqlite3.connect(tmp_path / "chunks.sqlite")
+    conn.execute("INSERT INTO chunks_fts(chunks_fts, rank) VALUES ('integrity-check', 1)")
+    conn.close()
+
+
+def test_ingest_folder_reads_markdown_tree(store, tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "orm").mkdir(parents=True)
+    (docs / "orm" / "session.md").write_text(SESSION_DOC, encoding="utf-8")
+    (docs / "notas.txt").write_text("Apuntes sueltos sobre el dialecto.", encoding="utf-8")
+    (docs / "imagen.png").write_bytes(b"\x89PNG")
+    assert store.ingest_folder(str(docs)).documents == 2
+    assert store.search("dialecto")[0]["path"] == "notas.txt"
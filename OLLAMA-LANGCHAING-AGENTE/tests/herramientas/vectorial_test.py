@@ -0,0 +1,86 @@
+# OLLAMA-LANGCHAING-AGENTE/tests/herramientas/vectorial_test.py
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agents.herramientas.vectorial.__main__ import build, chunk_corpus, read_corpus
+from agents.herramientas.vectorial.chunker import ChunkerSettings, split_text
+from agents.herramientas.vectorial.store import MANIFEST, IndexMismatch, VectorStore
+from benchmarks.fake_ollama import FakeOllama, fake_embedding
+
+CHUNKER = ChunkerSettings(chunk_size=40, overlap=10).as_dict()
+
+
+def make_store(texts, model="fake-embed", dim=16):
+    records = [{"id": f"doc#{i}", "source": "doc", "text": text} for i, text in enumerate(texts)]
+    return VectorStore.from_embeddings(model, CHUNKER, records, [fake_embedding(t, dim) for t in texts])
+
+
+def test_split_text_respects_size_and_overlaps():
+    text = " ".join(f"palabra{i}" for i in range(60))
+    chunks = split_text(text, ChunkerSettings(chunk_size=80, overlap=20))
+    assert all(len(c) <= 80 for c in chunks)
+    assert chunks[0].split()[-1] in chunks[1]  # el final de uno abre el siguiente
+    assert split_text("corto") == ["corto"]
+
+
+def test_saved_index_loads_memory_mapped_and_finds_the_same_text(tmp_path):
+    texts = ["gatos y perros", "bases de datos sqlite", "embeddings con ollama"]
+    make_store(texts).save(str(tmp_path))
+
+    store = VectorStore.load(str(tmp_path), embedding_model="fake-embed", dimension=16, chunker=CHUNKER)
+    assert isinstance(store.vectors, np.memmap)
+    score, record = store.search(fake_embedding("bases de datos sqlite", 16), k=1)[0]
+    assert record["text"] == "bases de datos sqlite" and score == pytest.approx(1.0, abs=1e-5)
+    assert [r["text"] for _, r in store.search(fake_embedding("gatos y perros", 16), k=3)][0] == "gatos y perros"
+
+
+def test_mismatched_index_is_refused(tmp_path):
+    store = make_store(["uno", "dos"])
+    store.save(str(tmp_path))
+    with pytest.raises(IndexMismatch, match="embedding_model"):
+        VectorStore.load(str(tmp_path), embedding_model="otro-modelo")
+    with pytest.raises(IndexMismatch, match="chunker"):
+        VectorStore.load(str(tmp_path), chunker={**CHUNKER, "chunk_size": 999})
+    with pytest.raises(IndexMismatch, match="corpus_hash"):
+        VectorStore.load(str(tmp_path), corpus="0" * 64)
+    assert len(VectorStore.load(str(tmp_path), corpus=store.manifest.corpus_hash)) == 2
+    with pytest.raises(FileNotFoundError):
+        VectorStore.load(str(tmp_path / "vacio"))
+
+
+def test_saving_a_new_version_swaps_the_manifest_and_keeps_only_the_previous_one(tmp_path):
+    make_store(["uno"]).save(str(tmp_path))
+    first = VectorStore.read_manifest(str(tmp_path))
+    old = VectorStore.load(str(tmp_path))
+    make_store(["uno", "dos"]).save(str(tmp_path))
+
+    with open(tmp_path / MANIFEST, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["count"] == 2 and manifest["data_dir"] != first.data_dir
+    assert old.search(fake_embedding("uno", 16), k=1)[0][1]["text"] == "uno"  # el mmap abierto sigue valiendo
+    # Un lector que leyó el manifiesto anterior y aún no abrió sus archivos sigue pudiendo hacerlo
+    assert sorted(e for e in os.listdir(tmp_path) if e.startswith("data-")) == sorted([first.data_dir,
+                                                                                        manifest["data_dir"]])
+    assert os.path.exists(tmp_path / first.data_dir / "records.json")
+
+    make_store(["tres"]).save(str(tmp_path))
+    current = VectorStore.read_manifest(str(tmp_path)).data_dir
+    assert sorted(e for e in os.listdir(tmp_path) if e.startswith("data-")) == sorted([manifest["data_dir"], current])
+
+
+def test_build_embeds_the_corpus_through_ollama(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("# Título\n\nPrimer párrafo sobre agentes.\n\nSegundo párrafo.", encoding="utf-8")
+    (docs / "ignorado.bin").write_text("x", encoding="utf-8")
+    settings = ChunkerSettings(chunk_size=40, overlap=10)
+    assert [source for source, _ in read_corpus(str(docs))] == ["a.md"]
+
+    with FakeOllama(models=("fake-embed",), embedding_dim=8) as fake:
+        build(str(docs), str(tmp_path / "indice"), "fake-embed", fake.base_url, settings)
+    store = VectorStore.load(str(tmp_path / "indice"), embedding_model="fake-embed", dimension=8)
+    assert [r["id"] for r in store.records] == [r["id"] for r in chunk_corpus(read_corpus(str(docs)), settings)]